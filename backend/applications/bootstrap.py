@@ -1,6 +1,14 @@
 # applications/bootstrap.py
 
-from applications.model import db, User, Role, Page, Permission
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateColumn
+from applications.model import db, User, Role, Page, Permission, Transaction, CompanyAccountBalance
+from applications.sequences import seed_ref_sequences
+from applications.ledger import seed_balance_heads, backfill_posted_at
+from applications.rollups import seed_daily_financials, seed_balance_summary
+from applications.idempotency import purge_expired_keys
+from applications.transaction_api import backfill_flag_columns
 
 # Map URL segments to SQLAlchemy models for generic CRUD routing
 from applications.model import User as UserModel, Role as RoleModel, Page as PageModel
@@ -10,6 +18,11 @@ RESOURCE_MODELS = {
     'pages': PageModel
 }
 
+# Indexes no longer declared on the models, dropped from existing databases
+RETIRED_INDEXES = (
+    'ix_company_balance_mode_updated',   # replaced by ix_company_balance_mode_posted
+)
+
 
 def init_pages():
     """
@@ -79,10 +92,118 @@ def init_admin_user():
             print("✘ failed to create ADMIN")
 
 
+def add_missing_columns(model):
+    """
+    ALTER TABLE in columns added to `model` after its table was created.
+    db.create_all() never changes existing tables. Returns the added names.
+    """
+    table = model.__table__
+    existing = {c['name'] for c in inspect(db.engine).get_columns(table.name)}
+    table_name = db.engine.dialect.identifier_preparer.format_table(table)
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+        db.session.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+        added.append(column.name)
+    db.session.commit()
+    return added
+
+
+def init_transaction_flags():
+    """
+    Add the transaction flag columns to existing databases and fill them
+    from extra_data.
+    """
+    added = add_missing_columns(Transaction)
+    if added:
+        count = backfill_flag_columns()
+        print(f"✔ transaction columns added ({', '.join(added)}), {count} rows backfilled")
+
+
+def init_ledger_posted_at():
+    """
+    Add posted_at to an existing company ledger and fill it, before the
+    (mode, posted_at) index is created.
+    """
+    add_missing_columns(CompanyAccountBalance)
+    count = backfill_posted_at()
+    if count:
+        print(f"✔ company ledger posted_at backfilled: {count} rows "
+              f"(from credited_date; rows from transactions may carry the server start time)")
+
+
+def init_indexes():
+    """
+    Create model indexes missing from an existing database and drop retired
+    ones. db.create_all() only creates indexes together with brand new tables.
+    """
+    for name in RETIRED_INDEXES:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.commit()
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except SQLAlchemyError as e:
+                # e.g. duplicate ref_no values blocking a unique index
+                print(f"✘ failed to create index {index.name}: {getattr(e, 'orig', e)}")
+
+
+def init_ref_sequences():
+    """
+    Seed this year's reference number counters from existing records.
+    """
+    seed_ref_sequences()
+
+
+def init_balance_heads():
+    """
+    Seed the cached company balances from the last ledger row of each mode.
+    """
+    seed_balance_heads()
+
+
+def init_daily_financials():
+    """
+    Backfill the dashboard rollup for databases created before it existed.
+    """
+    count = seed_daily_financials()
+    if count is not None:
+        print(f"✔ daily_financials backfilled: {count} rows")
+
+
+def init_balance_summary():
+    """
+    Create the wallet/credit totals row per entity kind if missing.
+    """
+    if seed_balance_summary():
+        print("✔ balance_summary seeded")
+
+
+def init_idempotency_keys():
+    """
+    Drop Idempotency-Key responses that expired while the app was down.
+    """
+    count = purge_expired_keys()
+    if count:
+        print(f"✔ {count} expired idempotency keys removed")
+
+
 def initialize_system():
     """
     Call all initialization routines.
     """
+    init_transaction_flags()
+    init_ledger_posted_at()
+    init_indexes()
+    init_ref_sequences()
+    init_balance_heads()
+    init_daily_financials()
+    init_balance_summary()
+    init_idempotency_keys()
     init_pages()
     init_permissions()
     init_roles()
@@ -1,12 +1,14 @@
 # applications/dashboard_resources.py
 from flask_restful import Resource
-from flask import jsonify, request, send_file
+from flask import request, send_file, current_app, Response, stream_with_context
 from datetime import datetime, timedelta
-from sqlalchemy import func, case, and_, or_
+from sqlalchemy import func, and_
 from io import BytesIO
 from fpdf import FPDF
 
-from .model import db, CompanyAccountBalance, Ticket, Transaction, Service, Particular, Agent, Customer, Partner
+from .model import db, DailyFinancial, Particular, Agent, Customer, Partner, BalanceSummary
+from .export_utils import EXPORT_CHUNK_SIZE
+from .ledger import get_company_balance, get_company_balance_as_of
 
 # from .utils import check_permission # Adjust import path as needed
 
@@ -18,154 +20,90 @@ def _get_dashboard_metrics_data(start_date_str, end_date_str):
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date_exclusive = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
 
-    # Base query filter for date range
-    ticket_date_filter = and_(Ticket.date >= start_date, Ticket.date < end_date_exclusive)
-    transaction_date_filter = and_(Transaction.date >= start_date, Transaction.date < end_date_exclusive)
-    service_date_filter = and_(Service.date >= start_date, Service.date < end_date_exclusive)
+    # Days covered by the daily_financials rollup
+    day_filter = and_(DailyFinancial.day >= start_date.date(), DailyFinancial.day < end_date_exclusive.date())
 
     # --- Fetch current company balances up to the end of the selected end_date_str ---
     balance_as_of_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1) - timedelta(microseconds=1)
 
-    cash_balance_obj = CompanyAccountBalance.query.filter_by(mode='cash') \
-                                            .filter(CompanyAccountBalance.updated_at <= balance_as_of_date) \
-                                            .order_by(CompanyAccountBalance.updated_at.desc()) \
-                                            .first()
-    cash_balance = cash_balance_obj.balance if cash_balance_obj else 0.0
-
-    online_balance_obj = CompanyAccountBalance.query.filter_by(mode='online') \
-                                             .filter(CompanyAccountBalance.updated_at <= balance_as_of_date) \
-                                             .order_by(CompanyAccountBalance.updated_at.desc()) \
-                                             .first()
-    online_balance = online_balance_obj.balance if online_balance_obj else 0.0
+    cash_balance = get_company_balance_as_of('cash', balance_as_of_date)
+    online_balance = get_company_balance_as_of('online', balance_as_of_date)
     # --- End Company Balance Fetch ---
 
 
+    # Ticket, service and transaction metrics come from the daily_financials
+    # rollup, so the cost depends on the number of days, not of raw rows.
+    # SUM over no matching rows is NULL, hence `or 0.0`.
+    totals = db.session.query(
+        func.sum(DailyFinancial.ticket_sales).label('ticket_sales'),
+        func.sum(DailyFinancial.agent_charges).label('agent_charges'),
+        func.sum(DailyFinancial.service_income).label('service_income'),
+        func.sum(DailyFinancial.expenditure).label('expenditure'),
+        func.sum(DailyFinancial.agent_deposit).label('agent_deposit'),
+        func.sum(DailyFinancial.customer_deposit).label('customer_deposit')
+    ).filter(day_filter).one()
+
     # 1. Total sales through ticket (customer rate sum)
-    total_ticket_sales = db.session.query(func.sum(Ticket.customer_charge))\
-                             .filter(ticket_date_filter, Ticket.status == 'booked')\
-                             .scalar() or 0.0
+    total_ticket_sales = totals.ticket_sales or 0.0
 
     # 2. Agent charges (assuming this is agent_paid in Ticket model)
-    total_agent_charges = db.session.query(func.sum(Ticket.agent_paid))\
-                          .filter(ticket_date_filter, Ticket.status == 'booked')\
-                          .scalar() or 0.0
+    total_agent_charges = totals.agent_charges or 0.0
 
     # 3. Profit from sales (customer rate - agent charge)
     profit_from_sales = total_ticket_sales - total_agent_charges
 
     # 4. Other Service Income (Service availed rates)
-    other_service_income = db.session.query(func.sum(Service.customer_charge))\
-                           .filter(service_date_filter, Service.status == 'booked')\
-                           .scalar() or 0.0
+    other_service_income = totals.service_income or 0.0
 
     # 5. Expenditure (other than customer/partner/agent cash_deposit, not wallet updated amount)
-    total_expenditure = db.session.query(func.sum(Transaction.amount))\
-                            .filter(
-                                transaction_date_filter,
-                                Transaction.transaction_type == 'payment',
-                                Transaction.pay_type != 'wallet_transfer',
-                                or_(
-                                    Transaction.entity_type == 'others',
-                                    and_(
-                                        Transaction.entity_type == 'agent',
-                                        Transaction.pay_type == 'other_expense',
-                                        Transaction.extra_data.cast(db.String).like('%"deduct_from_account": true%')
-                                    ),
-                                    and_(
-                                        or_(Transaction.entity_type == 'customer', Transaction.entity_type == 'partner'),
-                                        or_(
-                                            Transaction.pay_type == 'cash_withdrawal',
-                                            and_(
-                                                Transaction.pay_type == 'other_expense',
-                                                Transaction.extra_data.cast(db.String).like('%"deduct_from_account": true%')
-                                            )
-                                        )
-                                    )
-                                )
-                            )\
-                            .scalar() or 0.0
+    total_expenditure = totals.expenditure or 0.0
 
     # 6. Net profit (c+d-e)
     net_profit = profit_from_sales + other_service_income - total_expenditure
 
     # 7. Total agent deposit made
-    total_agent_deposit = db.session.query(func.sum(Transaction.amount))\
-                         .filter(
-                             transaction_date_filter,
-                             Transaction.entity_type == 'agent',
-                             or_(
-                                 and_(Transaction.transaction_type == 'receipt', Transaction.pay_type == 'cash_deposit'),
-                                 and_(
-                                     Transaction.transaction_type == 'receipt',
-                                     Transaction.pay_type == 'other_receipt',
-                                     Transaction.extra_data.cast(db.String).like('%"credit_to_account": true%')
-                                 )
-                             )
-                         )\
-                         .scalar() or 0.0
+    total_agent_deposit = totals.agent_deposit or 0.0
 
     # 8. Total Customer Deposits
-    total_customer_deposit = db.session.query(func.sum(Transaction.amount))\
-                           .filter(
-                               transaction_date_filter,
-                               Transaction.entity_type == 'customer',
-                               Transaction.transaction_type == 'receipt',
-                               or_(
-                                   Transaction.pay_type == 'cash_deposit',
-                                   and_(
-                                       Transaction.pay_type == 'other_receipt',
-                                       Transaction.extra_data.cast(db.String).like('%"credit_to_account": true%')
-                                   )
-                               )
-                           )\
-                           .scalar() or 0.0
-
-    # 9. Total Agent Credit (actual credit used by agents)
-    total_agent_credit = db.session.query(func.sum(Agent.credit_limit - Agent.credit_balance))\
-                             .filter(Agent.active == True)\
-                             .scalar() or 0.0
-
-    # 10. Total Customer Credit (actual credit used by customers)
-    total_customer_credit = db.session.query(func.sum(Customer.credit_used))\
-                                .filter(Customer.active == True)\
-                                .scalar() or 0.0
-
-    # Sales and Expense Trend Data for Chart
+    total_customer_deposit = totals.customer_deposit or 0.0
+
+    # 9-10. Credit actually used by active agents and customers, from the
+    # balance_summary rows the wallet updates keep current
+    credit_used = dict(db.session.query(BalanceSummary.kind, BalanceSummary.credit_used_total).all())
+    total_agent_credit = credit_used.get('agent') or 0.0
+    total_customer_credit = credit_used.get('customer') or 0.0
+
+    # Sales and Expense Trend Data for Chart (days with at least one ticket)
     daily_data_query = db.session.query(
-        func.date(Ticket.date).label('date'),
-        func.sum(case((Ticket.status == 'booked', Ticket.customer_charge), else_=0)).label('daily_sales'),
-        func.sum(case((Ticket.status == 'booked', Ticket.agent_paid), else_=0)).label('daily_expenses')
+        DailyFinancial.day,
+        func.sum(DailyFinancial.ticket_sales).label('daily_sales'),
+        func.sum(DailyFinancial.agent_charges).label('daily_expenses')
     ).filter(
-        ticket_date_filter
+        day_filter
     ).group_by(
-        func.date(Ticket.date)
+        DailyFinancial.day
+    ).having(
+        func.sum(DailyFinancial.ticket_count) > 0
     ).order_by(
-        func.date(Ticket.date)
+        DailyFinancial.day
     )
 
-    sales_expense_trend = [{'date': row.date, 'sales': row.daily_sales, 'expenses': row.daily_expenses} for row in daily_data_query.all()]
+    sales_expense_trend = [{'date': row.day.isoformat(), 'sales': row.daily_sales, 'expenses': row.daily_expenses} for row in daily_data_query.all()]
 
-    # Sales by Particular for Bar Chart
-    sales_by_particular_query = db.session.query(
+    # Sales (bar chart) and profit (pie chart) by Particular, from one grouped pass
+    by_particular = db.session.query(
         Particular.name,
-        func.sum(Ticket.customer_charge).label('total_sales')
-    ).join(Ticket, Ticket.particular_id == Particular.id)\
+        func.sum(DailyFinancial.ticket_sales).label('total_sales'),
+        func.sum(DailyFinancial.ticket_sales - DailyFinancial.agent_charges).label('total_profit')
+    ).join(DailyFinancial, DailyFinancial.particular_id == Particular.id)\
     .filter(
-        ticket_date_filter,
-        Ticket.status == 'booked'
-    )
-    sales_by_particular_data = [{'name': row.name, 'sales': row.total_sales} for row in sales_by_particular_query.group_by(Particular.name).order_by(func.sum(Ticket.customer_charge).desc()).all()]
+        day_filter
+    ).group_by(Particular.name).having(
+        func.sum(DailyFinancial.booked_ticket_count) > 0
+    ).all()
 
-    # Profit Breakdown by Particular for Pie Chart
-    profit_by_particular_query = db.session.query(
-        Particular.name,
-        func.sum(Ticket.customer_charge - Ticket.agent_paid).label('total_profit')
-    ).join(Ticket, Ticket.particular_id == Particular.id)\
-    .filter(
-        ticket_date_filter,
-        Ticket.status == 'booked'
-    )
-    profit_by_particular_data = [{'name': row.name, 'profit': row.total_profit} for row in profit_by_particular_query.group_by(Particular.name).order_by(func.sum(Ticket.customer_charge - Ticket.agent_paid).desc()).all()]
+    sales_by_particular_data = [{'name': row.name, 'sales': row.total_sales} for row in sorted(by_particular, key=lambda r: r.total_sales, reverse=True)]
+    profit_by_particular_data = [{'name': row.name, 'profit': row.total_profit} for row in sorted(by_particular, key=lambda r: r.total_profit, reverse=True)]
 
 
     return {
@@ -191,15 +129,8 @@ class CompanyBalancesAPI(Resource):
     # @check_permission()
     def get(self):
         try:
-            cash_balance_obj = CompanyAccountBalance.query.filter_by(mode='cash') \
-                                                    .order_by(CompanyAccountBalance.updated_at.desc()) \
-                                                    .first()
-            cash_balance = cash_balance_obj.balance if cash_balance_obj else 0.0
-
-            online_balance_obj = CompanyAccountBalance.query.filter_by(mode='online') \
-                                                     .order_by(CompanyAccountBalance.updated_at.desc()) \
-                                                     .first()
-            online_balance = online_balance_obj.balance if online_balance_obj else 0.0
+            cash_balance = get_company_balance('cash')
+            online_balance = get_company_balance('online')
 
             return {
                 'cash_balance': cash_balance,
@@ -371,28 +302,58 @@ class DashboardMetricsAPI(Resource):
             raise # Re-raise to be caught by the outer try-except in get()
 
 
+def _balance_rows(columns, active, to_row):
+    """Report rows from a column-only query of the active entities, fetched in chunks"""
+    query = db.session.query(*columns).filter(active == True).order_by(columns[0])
+    return (to_row(row) for row in query.yield_per(EXPORT_CHUNK_SIZE))
+
+
+def _stream_balance_report(rows, kind):
+    """
+    The rows as a JSON array written one row at a time, so memory stays flat
+    however many entities there are. Totals come from balance_summary.
+    """
+    summary = db.session.get(BalanceSummary, kind)
+
+    def generate():
+        yield '['
+        for i, row in enumerate(rows):
+            yield (',' if i else '') + current_app.json.dumps(row)
+        yield ']\n'
+
+    headers = {}
+    if summary:
+        headers = {
+            'X-Total-Count': str(summary.entity_count),
+            'X-Wallet-Total': str(summary.wallet_total),
+            'X-Credit-Used-Total': str(summary.credit_used_total)
+        }
+    return Response(stream_with_context(generate()), mimetype='application/json', headers=headers)
+
+
 class CustomerWalletCreditAPI(Resource):
     # @check_permission()
     def get(self):
         export_format = request.args.get('export')
         try:
-            customers = Customer.query.filter_by(active=True).all()
-            data = []
-            for c in customers:
-                data.append({
+            data = _balance_rows(
+                [Customer.id, Customer.name, Customer.wallet_balance, Customer.credit_limit, Customer.credit_used],
+                Customer.active,
+                lambda c: {
                     'ID': c.id,
                     'Name': c.name,
                     'Wallet Balance': c.wallet_balance,
                     'Credit Limit': c.credit_limit,
                     'Credit Used': c.credit_used,
                     'Credit Available': c.credit_limit - c.credit_used
-                })
+                }
+            )
 
             if export_format == 'pdf':
                 column_headers = ['ID', 'Name', 'Wallet Balance', 'Credit Limit', 'Credit Used', 'Credit Available']
-                return _export_list_to_pdf(data, "Customer Wallet & Credit Balances", "customer_balances", column_headers)
+                return _export_list_to_pdf(list(data), "Customer Wallet & Credit Balances", "customer_balances", column_headers)
             else:
-                return jsonify(data)
+                return _stream_balance_report(data, 'customer')
         except Exception as e:
             return {'error': 'Failed to fetch customer wallet/credit data.'}, 500
 
@@ -401,23 +362,24 @@ class AgentWalletCreditAPI(Resource):
     def get(self):
         export_format = request.args.get('export')
         try:
-            agents = Agent.query.filter_by(active=True).all()
-            data = []
-            for a in agents:
-                data.append({
+            data = _balance_rows(
+                [Agent.id, Agent.name, Agent.wallet_balance, Agent.credit_limit, Agent.credit_balance],
+                Agent.active,
+                lambda a: {
                     'ID': a.id,
                     'Name': a.name,
                     'Wallet Balance': a.wallet_balance,
                     'Credit Limit': a.credit_limit,
                     'Credit Balance': a.credit_balance, # This is available credit
                     'Credit Used': a.credit_limit - a.credit_balance # Calculate used credit
-                })
+                }
+            )
 
             if export_format == 'pdf':
                 column_headers = ['ID', 'Name', 'Wallet Balance', 'Credit Limit', 'Credit Balance', 'Credit Used']
-                return _export_list_to_pdf(data, "Agent Wallet & Credit Balances", "agent_balances", column_headers)
+                return _export_list_to_pdf(list(data), "Agent Wallet & Credit Balances", "agent_balances", column_headers)
             else:
-                return jsonify(data)
+                return _stream_balance_report(data, 'agent')
         except Exception as e:
             return {'error': 'Failed to fetch agent wallet/credit data.'}, 500
 
@@ -426,20 +388,21 @@ class PartnerWalletCreditAPI(Resource):
     def get(self):
         export_format = request.args.get('export')
         try:
-            partners = Partner.query.filter_by(active=True).all()
-            data = []
-            for p in partners:
-                data.append({
+            data = _balance_rows(
+                [Partner.id, Partner.name, Partner.wallet_balance, Partner.allow_negative_wallet],
+                Partner.active,
+                lambda p: {
                     'ID': p.id,
                     'Name': p.name,
                     'Wallet Balance': p.wallet_balance,
                     'Allow Negative Wallet': 'Yes' if p.allow_negative_wallet else 'No'
-                })
+                }
+            )
 
             if export_format == 'pdf':
                 column_headers = ['ID', 'Name', 'Wallet Balance', 'Allow Negative Wallet']
-                return _export_list_to_pdf(data, "Partner Wallet Balances", "partner_balances", column_headers)
+                return _export_list_to_pdf(list(data), "Partner Wallet Balances", "partner_balances", column_headers)
             else:
-                return jsonify(data)
+                return _stream_balance_report(data, 'partner')
         except Exception as e:
             return {'error': 'Failed to fetch partner wallet data.'}, 500
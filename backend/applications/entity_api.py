@@ -2,6 +2,7 @@ from flask import request, jsonify, abort
 from flask_restful import Resource
 from sqlalchemy.exc import IntegrityError
 from applications.utils import check_permission
+from applications.reference_cache import REFERENCE_MODELS, bump_reference_version
 from applications.model import db, Customer, Agent, Partner, Particular,Passenger, TravelLocation,Ticket, Transaction
 import re
 
@@ -210,6 +211,8 @@ class EntityResource(Resource):
         try:
             instance = model(**{k: v for k, v in data.items() if k in allowed})
             db.session.add(instance)
+            if entity_type.lower() in REFERENCE_MODELS:
+                bump_reference_version(model)
             db.session.commit()
             return {"message": f"{entity_type.capitalize()} created", "id": instance.id}
         except IntegrityError as e:
@@ -250,6 +253,8 @@ class EntityResource(Resource):
                 setattr(instance, key, value)
 
         try:
+            if entity_type.lower() in REFERENCE_MODELS:
+                bump_reference_version(model)
             db.session.commit()
             return {"message": f"{entity_type.capitalize()} updated"}
         except IntegrityError as e:
@@ -286,6 +291,8 @@ class EntityResource(Resource):
 
         try:
             db.session.delete(instance)
+            if entity_type.lower() in REFERENCE_MODELS:
+                bump_reference_version(model)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -0,0 +1,51 @@
+# applications/entity_cache.py
+from flask import g, has_request_context, request
+
+from applications.model import db
+
+
+def get_cached(model, entity_id):
+    """
+    Load a row by primary key at most once per request.
+
+    Ticket, service and transaction paths look the same Customer/Agent/Partner
+    up from several helpers; every lookup after the first returns the same
+    session instance. Outside a request (CLI, plain app context) this is a
+    plain session.get().
+    """
+    if entity_id is None:
+        return None
+    if not has_request_context():
+        return db.session.get(model, entity_id)
+
+    cache = g.setdefault('_entity_cache', {})
+    stats = g.setdefault('_entity_cache_stats', {'hits': 0, 'misses': 0})
+    key = (model, entity_id)
+    if key in cache:
+        stats['hits'] += 1
+        return cache[key]
+
+    stats['misses'] += 1
+    cache[key] = db.session.get(model, entity_id)
+    return cache[key]
+
+
+def entity_cache_stats():
+    """Hit/miss counts of the current request's entity cache"""
+    if not has_request_context():
+        return {'hits': 0, 'misses': 0}
+    return dict(g.get('_entity_cache_stats') or {'hits': 0, 'misses': 0})
+
+
+def init_entity_cache(app):
+    """Log each request's cache counts at debug level"""
+    @app.after_request
+    def log_entity_cache(response):
+        stats = entity_cache_stats()
+        if stats['hits'] or stats['misses']:
+            app.logger.debug(
+                "entity cache %s %s: %d hits, %d misses",
+                request.method, request.path,
+                stats['hits'], stats['misses']
+            )
+        return response
@@ -0,0 +1,82 @@
+# applications/export_api.py
+import os
+from uuid import uuid4
+
+from flask import request, abort, g, send_file
+from flask_restful import Resource
+from flask_jwt_extended import get_jwt
+
+from applications.utils import check_permission
+from applications.model import db, ExportJob
+from applications.tasks import queue_export, EXPORT_RENDERERS
+
+
+class ExportJobResource(Resource):
+    """
+    POST /api/exports              - queue an export, returns the job id
+    GET  /api/exports/<id>         - job status and progress
+    GET  /api/exports/<id>?download=1 - the rendered file once completed
+    DELETE /api/exports/<id>       - drop the job and its file
+    """
+
+    @check_permission()
+    def post(self):
+        data = request.get_json() or {}
+        kind = data.get('kind')
+        export_format = data.get('format')
+        params = data.get('params') or {}
+
+        if kind not in EXPORT_RENDERERS:
+            abort(400, f"Unknown export kind: {kind}")
+        formats, _ = EXPORT_RENDERERS[kind]
+        if export_format not in formats:
+            abort(400, f"Format for {kind} must be one of: {', '.join(formats)}")
+        if not isinstance(params, dict):
+            abort(400, "params must be an object")
+
+        job = ExportJob(
+            id=uuid4().hex,
+            kind=kind,
+            format=export_format,
+            params={k: str(v) for k, v in params.items() if v is not None},
+            created_by=getattr(g, 'username', 'system')
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        queue_export(job.id)
+
+        db.session.refresh(job)
+        return {"job_id": job.id, "job": job.to_dict()}, 202
+
+    @check_permission()
+    def get(self, job_id):
+        job = self._get_job(job_id)
+
+        if request.args.get('download'):
+            if job.status != 'completed' or not job.file_path or not os.path.exists(job.file_path):
+                abort(409, f"Export is {job.status}, no file available")
+            return send_file(
+                job.file_path,
+                mimetype=job.mimetype,
+                as_attachment=True,
+                download_name=job.filename
+            )
+
+        return job.to_dict(), 200
+
+    @check_permission()
+    def delete(self, job_id):
+        job = self._get_job(job_id)
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        db.session.delete(job)
+        db.session.commit()
+        return {"message": "Export deleted"}, 200
+
+    def _get_job(self, job_id):
+        job = ExportJob.query.get(job_id)
+        # Jobs are private to their creator; admins can see all of them
+        if not job or (job.created_by != getattr(g, 'username', 'system') and not get_jwt().get('is_admin')):
+            abort(404, "Export job not found")
+        return job
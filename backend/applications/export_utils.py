@@ -0,0 +1,100 @@
+# applications/export_utils.py
+import os
+import tempfile
+from itertools import chain
+
+import xlsxwriter
+from flask import Response
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 1000
+
+
+def stream_excel(rows, sheet_name, download_name, headers=None, header_format=None,
+                 column_formats=None, max_width=None, freeze_header=False):
+    """
+    Write an iterable of row dicts to an .xlsx file and send it back.
+
+    The workbook is written with xlsxwriter's constant_memory mode into a
+    temporary file, so only the current row is held in memory no matter how
+    many rows the iterable yields. The finished file is streamed to the client
+    from disk in chunks and removed once the response is closed. The xlsx zip
+    container is only finalised on close, so the file is complete on disk
+    before the first byte is sent.
+
+    Returns None when `rows` is empty so callers can keep their own
+    "no data" responses.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None
+
+    headers = headers or list(first.keys())
+    column_formats = column_formats or {}
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        worksheet = workbook.add_worksheet(sheet_name)
+        formats = {
+            col: workbook.add_format(spec) for col, spec in column_formats.items()
+        }
+
+        # Column formats must be registered before any cell is written
+        for idx, header in enumerate(headers):
+            if header in formats:
+                worksheet.set_column(idx, idx, 15, formats[header])
+
+        header_fmt = workbook.add_format(header_format) if header_format else None
+        widths = [len(str(h)) for h in headers]
+        for idx, header in enumerate(headers):
+            worksheet.write(0, idx, header, header_fmt)
+
+        for row_idx, row in enumerate(chain([first], rows), start=1):
+            for idx, header in enumerate(headers):
+                value = row.get(header)
+                worksheet.write(row_idx, idx, value)
+                if value is not None:
+                    widths[idx] = max(widths[idx], len(str(value)))
+
+        # Widths are only emitted when the workbook is closed, so they can be
+        # set after the data has been streamed through
+        for idx, header in enumerate(headers):
+            if header in formats:
+                continue
+            width = widths[idx] + 2
+            if max_width:
+                width = min(width, max_width)
+            worksheet.set_column(idx, idx, width)
+
+        if freeze_header:
+            worksheet.autofilter(0, 0, 0, len(headers) - 1)
+            worksheet.freeze_panes(1, 0)
+
+        workbook.close()
+    except Exception:
+        os.remove(path)
+        raise
+
+    return Response(
+        _read_and_remove(path),
+        mimetype=EXCEL_MIMETYPE,
+        headers={
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            'Content-Length': str(os.path.getsize(path))
+        }
+    )
+
+
+def _read_and_remove(path, chunk_size=64 * 1024):
+    """Yield a file in chunks and delete it once the response is done with it"""
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+    finally:
+        os.remove(path)
@@ -2,9 +2,14 @@
 from flask_restful import Resource
 from flask import request, abort
 from applications.utils import check_permission
-from applications.model import db
+from applications.model import db, Role, Page, User
+from applications.permissions import bump_permissions_version
 from applications.bootstrap import RESOURCE_MODELS
 
+# Edits to these change what users are allowed to do; users also because a
+# new user can reuse a deleted user's id, the key of the permission cache
+PERMISSION_MODELS = (Role, Page, User)
+
 class GenericAPI(Resource):
     method_decorators = [ check_permission() ]
 
@@ -23,6 +28,7 @@ class GenericAPI(Resource):
         if not Model: abort(404)
         data = request.get_json() or {}
         obj = Model(**data)
+        if Model in PERMISSION_MODELS: bump_permissions_version()
         db.session.add(obj); db.session.commit()
         return obj.to_dict(),201
 
@@ -32,6 +38,7 @@ class GenericAPI(Resource):
         data = request.get_json() or {}
         obj = Model.query.get_or_404(id)
         for k,v in data.items(): setattr(obj,k,v)
+        if Model in PERMISSION_MODELS: bump_permissions_version()
         db.session.commit()
         return obj.to_dict(),200
 
@@ -39,5 +46,6 @@ class GenericAPI(Resource):
         Model = RESOURCE_MODELS.get(resource)
         if not Model: abort(404)
         obj = Model.query.get_or_404(id)
+        if Model in PERMISSION_MODELS: bump_permissions_version()
         db.session.delete(obj); db.session.commit()
         return {},204
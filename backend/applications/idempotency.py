@@ -0,0 +1,164 @@
+# applications/idempotency.py
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+
+import click
+from flask import current_app, g, request
+from flask.cli import with_appcontext
+from flask_restful.utils import unpack
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from applications.model import db, IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+
+def idempotent(fn):
+    """
+    Replay the stored response when a POST is retried with the same
+    Idempotency-Key header instead of running it again.
+
+    The key row is claimed with INSERT ... ON CONFLICT DO NOTHING in the
+    request's own transaction, so a retry racing the first request waits on
+    it and then sees the key. Only 2xx responses are stored: an exception or
+    any other status deletes the claim, even when the handler has already
+    committed it, so the request can be retried. Place below
+    @check_permission() so keys are scoped to the authenticated user.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > 255:
+            return {'error': f'{HEADER} must be at most 255 characters'}, 400
+
+        owner = str(g.get('user_id') or '')
+        fingerprint = _fingerprint()
+        existing = _claim(owner, key, fingerprint)
+        if existing is not None:
+            return _replay(existing, fingerprint)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            db.session.rollback()
+            _release(owner, key, fingerprint)
+            raise
+
+        data, status, headers = unpack(result)
+        if 200 <= status < 300 and not hasattr(data, 'status_code'):
+            db.session.execute(
+                update(IdempotencyKey)
+                .where(*_pending(owner, key, fingerprint))
+                .values(status_code=status, response_body=json.dumps(data))
+            )
+            db.session.commit()
+        else:
+            db.session.rollback()
+            _release(owner, key, fingerprint)
+        return result
+    return wrapper
+
+
+def purge_expired_keys():
+    """Delete keys past their expiry; returns the number removed"""
+    count = IdempotencyKey.query\
+        .filter(IdempotencyKey.expires_at <= datetime.now())\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Delete expired Idempotency-Key responses."""
+    click.echo(f"✔ {purge_expired_keys()} expired idempotency keys removed")
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.full_path}\n".encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _claim(owner, key, fingerprint):
+    """None when this request now holds the key, else the stored row"""
+    now = datetime.now()
+    existing = db.session.get(IdempotencyKey, (owner, key))
+    if existing is not None and existing.expires_at > now:
+        return existing
+    if existing is not None:
+        db.session.delete(existing)
+        db.session.flush()
+
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL') or DEFAULT_TTL
+    values = {
+        'owner': owner,
+        'key': key,
+        'request_hash': fingerprint,
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=ttl),
+    }
+    if _insert_key(values):
+        return None
+    # A concurrent request with this key committed first
+    return db.session.get(IdempotencyKey, (owner, key), populate_existing=True)
+
+
+def _insert_key(values):
+    """
+    Insert the key row unless it exists; True when this call inserted it.
+    No savepoint: on pysqlite one opened outside a transaction commits the
+    claim on release, and the handler's rollback could no longer drop it.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        upsert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = upsert(IdempotencyKey).values(values).on_conflict_do_nothing()
+        return db.session.execute(stmt).rowcount == 1
+    try:
+        db.session.execute(insert(IdempotencyKey).values(values))
+    except IntegrityError:
+        # The transaction holds only the claim and any expired row it replaces
+        db.session.rollback()
+        return False
+    return True
+
+
+def _pending(owner, key, fingerprint):
+    """Filter for this request's claim while it has no response stored"""
+    return (
+        IdempotencyKey.owner == owner,
+        IdempotencyKey.key == key,
+        IdempotencyKey.request_hash == fingerprint,
+        IdempotencyKey.status_code.is_(None),
+    )
+
+
+def _release(owner, key, fingerprint):
+    """Delete the claim of a request that failed, in case the handler committed it"""
+    try:
+        db.session.execute(delete(IdempotencyKey).where(*_pending(owner, key, fingerprint)))
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Could not release {HEADER} {key!r}: {e}")
+
+
+def _replay(stored, fingerprint):
+    request_hash, status, body = stored.request_hash, stored.status_code, stored.response_body
+    db.session.rollback()
+    if request_hash != fingerprint:
+        return {'error': f'{HEADER} was already used for a different request'}, 422
+    if status is None:
+        return {'error': f'A request with this {HEADER} is still being processed'}, 409
+    return json.loads(body), status, {REPLAY_HEADER: 'true'}
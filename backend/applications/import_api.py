@@ -0,0 +1,274 @@
+# applications/import_api.py
+from datetime import datetime
+
+import pandas as pd
+from flask import request, abort, g
+from flask_restful import Resource
+
+from applications.utils import check_permission
+from applications.idempotency import idempotent
+from applications.export_utils import EXPORT_CHUNK_SIZE
+from applications.sequences import next_ref_nos
+from applications.reference_cache import reference_id
+from applications.ledger import post_company_entries, get_company_balance, LEDGER_MODES
+from applications.transaction_api import (
+    MODEL_MAP, REF_NO_PREFIXES, parse_transaction_date, sync_flag_columns, update_wallet_and_company
+)
+from applications.model import db, Customer, Agent, Transaction, Particular
+
+MAX_IMPORT_ROWS = 5000
+IMPORT_CHUNK_SIZE = EXPORT_CHUNK_SIZE
+
+# Pay types the wallet/ledger rules know for each importable transaction type
+IMPORT_PAY_TYPES = {
+    'payment': ('cash_deposit', 'cash_withdrawal', 'other_expense'),
+    'receipt': ('cash_deposit', 'other_receipt'),
+}
+IMPORT_ENTITY_TYPES = ('customer', 'agent', 'partner', 'others')
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+class TransactionImportResource(Resource):
+    """
+    POST /api/transactions/import               - import receipts/payments from a CSV or XLSX upload
+    POST /api/transactions/import?dry_run=true  - validate and report the resulting balances, nothing saved
+
+    Columns (header names are case-insensitive): transaction_type, entity_type,
+    entity_name or entity_id, pay_type, mode, amount, and optionally date,
+    description, particular, deduct_from_account, credit_to_account.
+    The import is all or nothing: any invalid row rejects the whole file.
+    """
+
+    @check_permission()
+    @idempotent
+    def post(self):
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            abort(400, "Upload a CSV or XLSX file in the 'file' field")
+        dry_run = request.args.get('dry_run', '').lower() in TRUE_VALUES
+
+        self.entities = {kind: {} for kind in IMPORT_ENTITY_TYPES if kind != 'others'}   # kind -> {name: entity}
+        self.before = {}                                    # (kind, id) -> balances before the import
+        company_before = {mode: get_company_balance(mode) for mode in LEDGER_MODES}
+
+        errors, touched, count = [], set(), 0
+        try:
+            for start, frame in self._read_chunks(upload):
+                if start + len(frame) > MAX_IMPORT_ROWS:
+                    raise ValueError(f"At most {MAX_IMPORT_ROWS} rows per import")
+                count += len(frame)
+                errors += self._import_chunk(start, frame.to_dict('records'), touched)
+        except ValueError as e:
+            db.session.rollback()
+            abort(400, str(e))
+
+        if not count:
+            db.session.rollback()
+            abort(400, "The file has no rows")
+
+        result = {
+            "rows": count,
+            "errors": errors,
+            "balances": {
+                "company": [
+                    {"mode": mode, "before": company_before[mode], "after": get_company_balance(mode)}
+                    for mode in LEDGER_MODES
+                ],
+                "entities": self._entity_balances(touched)
+            }
+        }
+
+        if dry_run:
+            db.session.rollback()
+            return {"dry_run": True, **result}, 200
+        if errors:
+            db.session.rollback()
+            return {"message": "Nothing imported", **result}, 400
+
+        db.session.commit()
+        return {"message": f"{count} transactions imported", **result}, 201
+
+    def _read_chunks(self, upload):
+        """(first row index, DataFrame) pairs; every cell is read as text"""
+        name = upload.filename.lower()
+        if name.endswith('.csv'):
+            reader = pd.read_csv(upload.stream, dtype=str, keep_default_na=False, chunksize=IMPORT_CHUNK_SIZE)
+        elif name.endswith('.xlsx'):
+            try:
+                # openpyxl has no streaming reader pandas can use; sheets are read whole
+                frame = pd.read_excel(upload.stream, dtype=str, keep_default_na=False)
+            except Exception:
+                raise ValueError("Could not read the XLSX file")
+            reader = (frame.iloc[i:i + IMPORT_CHUNK_SIZE] for i in range(0, len(frame), IMPORT_CHUNK_SIZE))
+        else:
+            raise ValueError("Only .csv and .xlsx files can be imported")
+
+        start = 0
+        for frame in reader:
+            frame.columns = [str(c).strip().lower().replace(' ', '_') for c in frame.columns]
+            yield start, frame
+            start += len(frame)
+
+    def _import_chunk(self, start, rows, touched):
+        """Validate, apply and flush one chunk; returns the row errors"""
+        self._load_entities(rows)
+
+        errors, valid = [], []
+        for offset, row in enumerate(rows):
+            try:
+                valid.append((start + offset, self._build_transaction(row)))
+            except ValueError as e:
+                errors.append({"row": _line(start + offset), "error": str(e)})
+
+        # Reference numbers for the chunk, one counter bump per type
+        by_type = {}
+        for _, t in valid:
+            by_type.setdefault(t.transaction_type, []).append(t)
+        for ttype, transactions in by_type.items():
+            for t, ref_no in zip(transactions, next_ref_nos(REF_NO_PREFIXES[ttype], 4, len(transactions))):
+                t.ref_no = ref_no
+
+        ledger = []
+        for index, t in valid:
+            try:
+                update_wallet_and_company(t, ledger=ledger)
+            except ValueError as e:
+                # e.g. insufficient funds; the row changed nothing
+                errors.append({"row": _line(index), "error": str(e)})
+                continue
+            db.session.add(t)
+            if t.entity_id is not None:
+                touched.add((t.entity_type, t.entity_id))
+
+        post_company_entries(ledger)
+        db.session.flush()
+        return errors
+
+    def _load_entities(self, rows):
+        """Entities named in the chunk and not seen yet, one query per entity type"""
+        wanted = {}
+        for row in rows:
+            kind = _text(row, 'entity_type').lower()
+            name = _text(row, 'entity_name')
+            if kind in self.entities and name and name not in self.entities[kind]:
+                wanted.setdefault(kind, set()).add(name)
+
+        for kind, names in wanted.items():
+            model = MODEL_MAP[kind]
+            for entity in model.query.filter(model.name.in_(names)):
+                self.entities[kind][entity.name] = entity
+                self.before[(kind, entity.id)] = _balances(entity)
+
+    def _build_transaction(self, row):
+        """Validated, unsaved Transaction for one row; raises ValueError with the reason"""
+        ttype = _text(row, 'transaction_type').lower()
+        if ttype not in IMPORT_PAY_TYPES:
+            raise ValueError(f"transaction_type must be one of: {', '.join(IMPORT_PAY_TYPES)}")
+        pay_type = _text(row, 'pay_type').lower()
+        if pay_type not in IMPORT_PAY_TYPES[ttype]:
+            raise ValueError(f"pay_type for {ttype} must be one of: {', '.join(IMPORT_PAY_TYPES[ttype])}")
+        mode = _text(row, 'mode').lower()
+        if not mode:
+            raise ValueError("mode is required")
+
+        try:
+            amount = float(_text(row, 'amount'))
+        except ValueError:
+            raise ValueError("amount must be a number")
+        if amount <= 0:
+            raise ValueError("Amount must be greater than 0")
+
+        kind = _text(row, 'entity_type').lower()
+        if kind not in IMPORT_ENTITY_TYPES:
+            raise ValueError(f"entity_type must be one of: {', '.join(IMPORT_ENTITY_TYPES)}")
+        entity_id = None
+        if kind != 'others':
+            entity_id = self._entity_id(kind, row)
+
+        particular_id = None
+        if particular := _text(row, 'particular'):
+            if not (particular_id := reference_id(Particular, particular)):
+                raise ValueError(f"Particular not found: {particular}")
+
+        try:
+            date = parse_transaction_date(_text(row, 'date')) if _text(row, 'date') else datetime.now()
+        except (ValueError, OverflowError):
+            raise ValueError("Invalid date")
+
+        t = Transaction(
+            entity_type=kind,
+            entity_id=entity_id,
+            transaction_type=ttype,
+            pay_type=pay_type,
+            mode=mode,
+            amount=amount,
+            date=date,
+            description=_text(row, 'description') or None,
+            particular_id=particular_id,
+            updated_by=getattr(g, 'username', 'system')
+        )
+        t.extra_data = {
+            'deduct_from_account': _text(row, 'deduct_from_account').lower() in TRUE_VALUES,
+            'credit_to_account': _text(row, 'credit_to_account').lower() in TRUE_VALUES,
+        }
+        sync_flag_columns(t)
+        return t
+
+    def _entity_id(self, kind, row):
+        if name := _text(row, 'entity_name'):
+            if name not in self.entities[kind]:
+                raise ValueError(f"{kind.capitalize()} not found: {name}")
+            return self.entities[kind][name].id
+
+        if not (raw := _text(row, 'entity_id')):
+            raise ValueError(f"entity_name or entity_id is required for {kind}")
+        try:
+            entity_id = int(float(raw))
+        except ValueError:
+            raise ValueError("Invalid entity_id")
+        entity = db.session.get(MODEL_MAP[kind], entity_id)
+        if entity is None:
+            raise ValueError(f"{kind.capitalize()} not found: {entity_id}")
+        self.before.setdefault((kind, entity_id), _balances(entity))
+        return entity_id
+
+    def _entity_balances(self, touched):
+        """Before/after balances of every entity the import moved, one query per type"""
+        ids = {}
+        for kind, entity_id in touched:
+            ids.setdefault(kind, set()).add(entity_id)
+
+        report = []
+        for kind, wanted in sorted(ids.items()):
+            model = MODEL_MAP[kind]
+            query = model.query.filter(model.id.in_(wanted))\
+                .order_by(model.id)\
+                .execution_options(populate_existing=True)
+            for entity in query:
+                report.append({
+                    "entity_type": kind,
+                    "entity_id": entity.id,
+                    "name": entity.name,
+                    "before": self.before.get((kind, entity.id)),
+                    "after": _balances(entity)
+                })
+        return report
+
+
+def _balances(entity):
+    balances = {"wallet_balance": entity.wallet_balance}
+    if isinstance(entity, Customer):
+        balances["credit_used"] = entity.credit_used
+    elif isinstance(entity, Agent):
+        balances["credit_balance"] = entity.credit_balance
+    return balances
+
+
+def _text(row, column):
+    value = row.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def _line(index):
+    """Spreadsheet line number of a data row (line 1 is the header)"""
+    return index + 2
@@ -0,0 +1,115 @@
+# applications/instrumentation.py
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from applications.model import db
+
+# Statements kept per request for the slow-request log
+MAX_LOGGED_STATEMENTS = 200
+# Endpoint name for requests no route matched (404s, scanners), so their
+# paths can't grow the per-endpoint totals without bound
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+_lock = threading.Lock()
+_endpoints = defaultdict(lambda: {'requests': 0, 'statements': 0, 'db_ms': 0.0, 'wall_ms': 0.0, 'max_wall_ms': 0.0})
+
+
+def init_instrumentation(app):
+    """
+    Count SQL statements and time them per request.
+
+    Every response gets a Server-Timing header (db time and statement count,
+    total wall time) unless SERVER_TIMING is off. Requests slower than
+    SLOW_REQUEST_MS or running more than SLOW_REQUEST_QUERIES statements are
+    logged with their statements, grouped by text and slowest first.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or not conn.info.get('_query_start'):
+            return
+        elapsed = (time.perf_counter() - conn.info['_query_start'].pop()) * 1000
+        stats = g.get('_sql_stats')
+        if stats is None:
+            return
+        stats['count'] += 1
+        stats['db_ms'] += elapsed
+        if len(stats['statements']) < MAX_LOGGED_STATEMENTS:
+            stats['statements'].append((statement, elapsed))
+
+    @app.before_request
+    def start_request_timer():
+        g._sql_stats = {'count': 0, 'db_ms': 0.0, 'statements': []}
+        g._request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_timing(response):
+        stats = g.get('_sql_stats')
+        if stats is None:
+            return response
+        wall_ms = (time.perf_counter() - g._request_start) * 1000
+        endpoint = request.endpoint or UNMATCHED_ENDPOINT
+
+        with _lock:
+            totals = _endpoints[endpoint]
+            totals['requests'] += 1
+            totals['statements'] += stats['count']
+            totals['db_ms'] += stats['db_ms']
+            totals['wall_ms'] += wall_ms
+            totals['max_wall_ms'] = max(totals['max_wall_ms'], wall_ms)
+
+        if app.config.get('SERVER_TIMING', True):
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats["db_ms"]:.1f};desc="{stats["count"]} queries", '
+                f'total;dur={wall_ms:.1f}'
+            )
+
+        max_ms = app.config.get('SLOW_REQUEST_MS')
+        max_queries = app.config.get('SLOW_REQUEST_QUERIES')
+        if (max_ms and wall_ms > max_ms) or (max_queries and stats['count'] > max_queries):
+            app.logger.warning(
+                "slow request %s %s: %.1f ms, %d statements, %.1f ms in db\n%s",
+                request.method, request.full_path.rstrip('?'),
+                wall_ms, stats['count'], stats['db_ms'],
+                _describe_statements(stats['statements'])
+            )
+        return response
+
+
+def endpoint_stats():
+    """Per-endpoint totals and averages since the process started"""
+    with _lock:
+        snapshot = {name: dict(totals) for name, totals in _endpoints.items()}
+    for totals in snapshot.values():
+        count = totals['requests']
+        totals['avg_statements'] = round(totals['statements'] / count, 2)
+        totals['avg_db_ms'] = round(totals['db_ms'] / count, 2)
+        totals['avg_wall_ms'] = round(totals['wall_ms'] / count, 2)
+    return snapshot
+
+
+def _describe_statements(statements):
+    """One line per distinct statement: repeats, total time, SQL; slowest first"""
+    grouped = {}
+    for statement, elapsed in statements:
+        text = ' '.join(statement.split())
+        count, total = grouped.get(text, (0, 0.0))
+        grouped[text] = (count + 1, total + elapsed)
+    lines = [
+        f"  {count}x {total:.1f} ms  {text[:300]}"
+        for text, (count, total) in sorted(grouped.items(), key=lambda item: -item[1][1])
+    ]
+    if len(statements) == MAX_LOGGED_STATEMENTS:
+        lines.append(f"  (only the first {MAX_LOGGED_STATEMENTS} statements are kept)")
+    return '\n'.join(lines)
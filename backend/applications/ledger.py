@@ -0,0 +1,210 @@
+# applications/ledger.py
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
+
+from applications.model import db, CompanyAccountBalance, CompanyBalanceHead
+
+# Only these modes are tracked in the company ledger
+LEDGER_MODES = ('cash', 'online')
+
+_head = CompanyBalanceHead.__table__
+
+
+def post_company_entry(mode, amount, ref_no=None, transaction_type=None, action='add', updated_by='system'):
+    """
+    Append a signed amount to the company ledger for `mode`.
+
+    The balance head is moved with a single UPDATE in the caller's transaction
+    and the new ledger row takes its running balance from it, so writers never
+    read the last ledger row and concurrent appends serialise on the head row.
+    """
+    if mode not in LEDGER_MODES:
+        return None
+
+    balance = _move_head(mode, amount)
+    now = datetime.now()
+    entry = CompanyAccountBalance(
+        mode=mode,
+        credited_amount=amount,
+        credited_date=now,
+        balance=balance,
+        posted_at=now,
+        ref_no=ref_no,
+        transaction_type=transaction_type,
+        action=action,
+        updated_by=updated_by
+    )
+    db.session.add(entry)
+    return entry
+
+
+def post_company_entries(entries):
+    """
+    Append many ledger entries at once; each entry takes the keyword
+    arguments of post_company_entry. Each mode's head is moved once by the
+    batch total and the rows get consecutive running balances.
+    """
+    by_mode = {}
+    for entry in entries:
+        if entry['mode'] in LEDGER_MODES:
+            by_mode.setdefault(entry['mode'], []).append(entry)
+
+    rows = []
+    now = datetime.now()
+    for mode, batch in by_mode.items():
+        total = sum(entry['amount'] for entry in batch)
+        balance = _move_head(mode, total) - total
+        for entry in batch:
+            balance += entry['amount']
+            rows.append({
+                'mode': mode,
+                'credited_amount': entry['amount'],
+                'credited_date': now,
+                'balance': balance,
+                'posted_at': now,
+                'ref_no': entry.get('ref_no'),
+                'transaction_type': entry.get('transaction_type'),
+                'action': entry.get('action', 'add'),
+                'updated_by': entry.get('updated_by', 'system'),
+                'updated_at': now
+            })
+    if rows:
+        # Plain executemany, the new ids aren't needed
+        db.session.execute(insert(CompanyAccountBalance), rows)
+    return len(rows)
+
+
+def get_company_balance(mode):
+    """Current balance for a mode, read from its head row"""
+    balance = db.session.execute(
+        select(_head.c.balance).where(_head.c.mode == mode)
+    ).scalar()
+    if balance is None:
+        # Head not seeded yet (e.g. a mode with no ledger writes since upgrade)
+        return _last_ledger_balance(mode)
+    return balance
+
+
+def get_company_balance_as_of(mode, as_of=None):
+    """
+    Balance of a mode at `as_of`: the running balance of the last row posted
+    at or before it, found with one seek on (mode, posted_at, id).
+    Without `as_of` this is the current balance.
+    """
+    if as_of is None:
+        return get_company_balance(mode)
+    balance = db.session.execute(
+        select(CompanyAccountBalance.balance)
+        .where(CompanyAccountBalance.mode == mode, CompanyAccountBalance.posted_at <= as_of)
+        .order_by(CompanyAccountBalance.posted_at.desc(), CompanyAccountBalance.id.desc())
+        .limit(1)
+    ).scalar()
+    return balance if balance is not None else 0.0
+
+
+def backfill_posted_at():
+    """
+    Fill posted_at on ledger rows written before the column existed.
+    credited_date is preferred: ticket and service entries set it when
+    appended, while updated_at moves on every edit. Transaction entries
+    never set it, so theirs holds the process start time the old
+    datetime.now() default was frozen at, and so does their updated_at;
+    those rows can only be dated approximately. Returns the row count.
+    """
+    count = CompanyAccountBalance.query\
+        .filter(CompanyAccountBalance.posted_at.is_(None))\
+        .update(
+            {CompanyAccountBalance.posted_at: func.coalesce(CompanyAccountBalance.credited_date, CompanyAccountBalance.updated_at)},
+            synchronize_session=False
+        )
+    db.session.commit()
+    return count
+
+
+def seed_balance_heads():
+    """Create missing head rows from the last ledger entry of each mode"""
+    for mode in LEDGER_MODES:
+        _seed_head(mode)
+    db.session.commit()
+
+
+def verify_balance_heads(fix=False):
+    """
+    Recompute each head from the ledger and report any drift.
+
+    The ledger sum (replay of every credited_amount) is treated as the source
+    of truth; the last row's running balance is reported alongside it.
+    Every row is summed, checkpointed or not: a checkpoint only records what
+    the ledger held when it was written, so trusting it would hide later
+    edits to the rows before it. audit-ledger compares those against it.
+    """
+    report = []
+    for mode in LEDGER_MODES:
+        ledger_sum = db.session.query(func.coalesce(func.sum(CompanyAccountBalance.credited_amount), 0.0))\
+            .filter(CompanyAccountBalance.mode == mode).scalar()
+        head = db.session.get(CompanyBalanceHead, mode)
+        head_balance = head.balance if head else None
+        ok = head_balance is not None and round(head_balance - ledger_sum, 2) == 0
+        report.append({
+            "mode": mode,
+            "head_balance": head_balance,
+            "last_row_balance": _last_ledger_balance(mode),
+            "ledger_sum": ledger_sum,
+            "ok": ok
+        })
+        if fix and not ok:
+            if head:
+                head.balance = ledger_sum
+            else:
+                db.session.add(CompanyBalanceHead(mode=mode, balance=ledger_sum))
+    if fix:
+        db.session.commit()
+    return report
+
+
+@click.command('verify-ledger')
+@click.option('--fix', is_flag=True, help='Reset drifted heads to the ledger sum.')
+@with_appcontext
+def verify_ledger_command(fix):
+    """Check company balance heads against the ledger."""
+    for row in verify_balance_heads(fix=fix):
+        status = "✔" if row["ok"] else ("✘ fixed" if fix else "✘")
+        click.echo(
+            f"{status} {row['mode']}: head={row['head_balance']} "
+            f"ledger_sum={row['ledger_sum']} last_row={row['last_row_balance']}"
+        )
+
+
+def _move_head(mode, amount):
+    bump = _head.update()\
+        .where(_head.c.mode == mode)\
+        .values(balance=_head.c.balance + amount)
+
+    if db.session.execute(bump).rowcount == 0:
+        _seed_head(mode)
+        db.session.execute(bump)
+
+    return db.session.execute(
+        select(_head.c.balance).where(_head.c.mode == mode)
+    ).scalar_one()
+
+
+def _seed_head(mode):
+    if db.session.get(CompanyBalanceHead, mode):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(CompanyBalanceHead(mode=mode, balance=_last_ledger_balance(mode)))
+    except IntegrityError:
+        pass  # Another request created it first
+
+
+def _last_ledger_balance(mode):
+    last = CompanyAccountBalance.query.filter_by(mode=mode)\
+        .order_by(CompanyAccountBalance.id.desc())\
+        .first()
+    return last.balance if last else 0.0
@@ -0,0 +1,212 @@
+# applications/ledger_audit.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, create_engine, select
+
+from applications.model import db, CompanyAccountBalance, LedgerCheckpoint
+from applications.ledger import LEDGER_MODES, get_company_balance
+
+PERIODS = ('day', 'month')
+SCAN_CHUNK = 10_000
+TOLERANCE = 0.005   # balances are floats; less than half a cent is rounding
+
+_ledger = CompanyAccountBalance.__table__
+_engine = None      # per worker process, see _init_worker
+
+# Built once: segments are many and short, compiling a query per segment costs more than the scan
+_segment_rows = select(_ledger.c.id, _ledger.c.credited_amount, _ledger.c.balance)\
+    .where(_ledger.c.mode == bindparam('mode'), _ledger.c.id > bindparam('after_id'))\
+    .order_by(_ledger.c.id)
+_bounded_segment_rows = _segment_rows.where(_ledger.c.id <= bindparam('last_id'))
+
+
+def create_checkpoints(period='day', now=None):
+    """
+    Checkpoint each mode at the end of every closed period that has none
+    yet. Only the rows after the last checkpoint are read, so a nightly run
+    costs one day of ledger. Returns the number of checkpoints written.
+    """
+    current = _period_start(now or datetime.now(), period)
+    checkpoints = []
+    for mode in LEDGER_MODES:
+        last = LedgerCheckpoint.query.filter_by(mode=mode, period=period)\
+            .order_by(LedgerCheckpoint.last_id.desc())\
+            .first()
+        total, count = (last.ledger_sum, last.row_count) if last else (0.0, 0)
+
+        rows = db.session.execute(
+            select(_ledger.c.id, _ledger.c.credited_amount, _ledger.c.balance, _ledger.c.posted_at)
+            .where(_ledger.c.mode == mode, _ledger.c.id > (last.last_id if last else 0))
+            .order_by(_ledger.c.id)
+            .execution_options(yield_per=SCAN_CHUNK)
+        )
+        pending = None  # the period being scanned and the state after its last row so far
+        for row in rows:
+            start = _period_start(row.posted_at, period) if row.posted_at else current
+            if pending:
+                # Periods follow row order, even if a backfilled posted_at doesn't
+                start = max(start, pending['period_start'])
+            if start >= current:
+                break
+            if pending and start != pending['period_start']:
+                checkpoints.append(LedgerCheckpoint(**pending))
+            total += row.credited_amount or 0.0
+            count += 1
+            pending = {
+                'mode': mode, 'period': period, 'period_start': start, 'last_id': row.id,
+                'balance': row.balance, 'ledger_sum': total, 'row_count': count
+            }
+        rows.close()
+        if pending:
+            checkpoints.append(LedgerCheckpoint(**pending))
+
+    for checkpoint in checkpoints:
+        # merge: a late row posted inside an already checkpointed period extends it
+        db.session.merge(checkpoint)
+    db.session.commit()
+    return len(checkpoints)
+
+
+def audit_ledger(period='day', workers=None):
+    """
+    Replay the company ledger and report where it first goes wrong.
+
+    The ledger is cut at the `period` checkpoints into segments that are
+    checked independently across worker processes. Within a segment every
+    row's balance must equal the previous balance plus its amount; at its
+    end the row count, amount sum and balance must match the checkpoint, or
+    for the rows after the last checkpoint, the balance head.
+    Returns one report per mode.
+    """
+    segments = []
+    for mode in LEDGER_MODES:
+        previous = None
+        for checkpoint in LedgerCheckpoint.query.filter_by(mode=mode, period=period).order_by(LedgerCheckpoint.last_id):
+            segments.append(_segment(mode, previous, checkpoint))
+            previous = checkpoint
+        segments.append(_segment(mode, previous, None, head=get_company_balance(mode)))
+
+    workers = workers or os.cpu_count() or 1
+    url = db.engine.url
+    if workers == 1 or len(segments) == 1 or (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+        results = [_replay(db.session.connection(), segment) for segment in segments]
+    else:
+        chunksize = max(1, len(segments) // (workers * 4))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(url.render_as_string(hide_password=False),)) as pool:
+            results = list(pool.map(_audit_segment, segments, chunksize=chunksize))
+
+    report = {mode: {'mode': mode, 'segments': 0, 'rows': 0, 'first_divergence': None} for mode in LEDGER_MODES}
+    for result in results:
+        totals = report[result['mode']]
+        totals['segments'] += 1
+        totals['rows'] += result['rows']
+        divergence = result['divergence']
+        if divergence and (totals['first_divergence'] is None or divergence['id'] < totals['first_divergence']['id']):
+            totals['first_divergence'] = divergence
+    return list(report.values())
+
+
+@click.command('checkpoint-ledger')
+@click.option('--period', type=click.Choice(PERIODS + ('all',)), default='all', help='Checkpoint granularity.')
+@with_appcontext
+def checkpoint_ledger_command(period):
+    """Checkpoint the company ledger at the end of each closed day/month."""
+    for name in PERIODS if period == 'all' else (period,):
+        click.echo(f"✔ {create_checkpoints(name)} {name} checkpoints added")
+
+
+@click.command('audit-ledger')
+@click.option('--period', type=click.Choice(PERIODS), default='day', help='Checkpoints the ledger is split at.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: one per CPU).')
+@with_appcontext
+def audit_ledger_command(period, workers):
+    """Checkpoint closed periods, then replay the company ledger in parallel."""
+    create_checkpoints(period)
+    failed = False
+    for row in audit_ledger(period, workers):
+        divergence = row['first_divergence']
+        if divergence is None:
+            click.echo(f"✔ {row['mode']}: {row['rows']} rows in {row['segments']} segments")
+            continue
+        failed = True
+        click.echo(
+            f"✘ {row['mode']}: first divergence at ledger row {divergence['id']}: {divergence['reason']} "
+            f"(expected {divergence['expected']}, found {divergence['found']})"
+        )
+    if failed:
+        raise click.exceptions.Exit(1)
+
+
+def _period_start(moment, period):
+    day = moment.date()
+    return day.replace(day=1) if period == 'month' else day
+
+
+def _segment(mode, previous, checkpoint, head=None):
+    """Rows (after previous.last_id, up to checkpoint.last_id] and what they must add up to"""
+    segment = {
+        'mode': mode,
+        'after_id': previous.last_id if previous else 0,
+        'balance': previous.balance if previous else 0.0,
+        'ledger_sum': previous.ledger_sum if previous else 0.0,
+        'row_count': previous.row_count if previous else 0,
+        'end': None,
+        'head': head
+    }
+    if checkpoint:
+        segment['end'] = {
+            'last_id': checkpoint.last_id, 'balance': checkpoint.balance,
+            'ledger_sum': checkpoint.ledger_sum, 'row_count': checkpoint.row_count
+        }
+    return segment
+
+
+def _init_worker(url):
+    global _engine
+    _engine = create_engine(url)
+
+
+def _audit_segment(segment):
+    with _engine.connect() as conn:
+        return _replay(conn, segment)
+
+
+def _replay(conn, segment):
+    mode, end = segment['mode'], segment['end']
+    params = {'mode': mode, 'after_id': segment['after_id']}
+    if end:
+        params['last_id'] = end['last_id']
+    rows = conn.execute(_bounded_segment_rows if end else _segment_rows, params)
+
+    def result(rows, divergence=None):
+        return {'mode': mode, 'rows': rows, 'divergence': divergence}
+
+    def diverged(row_id, reason, expected, found):
+        return {'id': row_id, 'reason': reason, 'expected': expected, 'found': found}
+
+    balance, total, count, last_id = segment['balance'], segment['ledger_sum'], segment['row_count'], None
+    for row_id, amount, row_balance in rows.tuples():
+        amount = amount or 0.0
+        expected = balance + amount
+        count += 1
+        if row_balance is None or abs(row_balance - expected) > TOLERANCE:
+            rows.close()
+            return result(count - segment['row_count'], diverged(row_id, 'running balance', round(expected, 2), row_balance))
+        balance, total, last_id = row_balance, total + amount, row_id
+
+    rows = count - segment['row_count']
+    if end:
+        at = end['last_id']
+        if last_id != at or count != end['row_count']:
+            return result(rows, diverged(at, 'rows missing before checkpoint', end['row_count'], count))
+        if abs(total - end['ledger_sum']) > TOLERANCE:
+            return result(rows, diverged(at, 'amount sum differs from checkpoint', end['ledger_sum'], round(total, 2)))
+        if abs(balance - end['balance']) > TOLERANCE:
+            return result(rows, diverged(at, 'balance differs from checkpoint', end['balance'], balance))
+    elif segment['head'] is not None and abs(balance - segment['head']) > TOLERANCE:
+        return result(rows, diverged(last_id or segment['after_id'], 'balance head differs', segment['head'], balance))
+    return result(rows)
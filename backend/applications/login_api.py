@@ -1,9 +1,10 @@
 from flask import request, jsonify, current_app
 from flask_restful import Resource
 from flask_jwt_extended import create_access_token,jwt_required,get_jwt_identity
-from applications.model import db, User, Role, Permission
+from applications.model import db, User
 from applications.validation_utils import validate_user_data, validate_password
-from applications.utils import get_user_payload,normalize
+from applications.utils import get_user_payload
+from applications.permissions import effective_permissions, bump_permissions_version
 from datetime import timedelta
 
 class LoginAPI(Resource):
@@ -15,58 +16,16 @@ class LoginAPI(Resource):
                 return {"error": "Username and password required"}, 400
 
             user = User.query\
-                .options(
-                    db.joinedload(User.role).joinedload(Role.permissions).joinedload(Permission.page),
-                    db.joinedload(User.permissions).joinedload(Permission.page)
-                )\
+                .options(db.joinedload(User.role))\
                 .filter_by(name=name).first()
 
             if not user or not user.check_password(password):
                 return {"error": "Invalid credentials"}, 401
 
-            # Modified Section
-            perms_set = set()
-
-            # 1. Process ROLE permissions first
-            for p in user.role.permissions:
-                if not p.page:
-                    continue
-
-                page_name = normalize(p.page.name)
-                
-                # Skip 'none' in roles (they shouldn't exist here normally)
-                if p.crud_operation == "none":
-                    continue
-                    
-                if p.crud_operation == "write":
-                    perms_set.add(f"{page_name}.read")
-                    perms_set.add(f"{page_name}.write")
-                elif p.crud_operation == "read":
-                    perms_set.add(f"{page_name}.read")
-
-            # 2. Process USER permissions to override
-            for p in user.permissions:
-                if not p.page:
-                    continue
-                page_name = normalize(p.page.name)
-                
-                # Remove existing permissions for this page
-                perms_set.discard(f"{page_name}.read")
-                perms_set.discard(f"{page_name}.write")
-                
-                if p.crud_operation == "write":
-                    perms_set.add(f"{page_name}.read")  # Write implies read
-                    perms_set.add(f"{page_name}.write")
-                elif p.crud_operation == "read":
-                    perms_set.add(f"{page_name}.read")
-                elif p.crud_operation == "none":
-                    pass  
-            
-
             additional_claims = {
                 "sub": str(user.id),
                 "username": user.name,  # ✅ Add username to token
-                "perms": [p.lower() for p in user.effective_permissions],
+                "perms": effective_permissions(user),
                 "role": user.role.name,
                 "is_admin": user.is_admin,
                 "session_version": user.session_version
@@ -123,6 +82,7 @@ class SignupAPI(Resource):
             )
             user.set_password(data["password"])
             db.session.add(user)
+            bump_permissions_version()
             db.session.commit()
             return {"message": "User created", "user": get_user_payload(user)}, 201
         except Exception as e:
@@ -3,7 +3,6 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from itertools import chain
 
 db = SQLAlchemy()
 
@@ -86,21 +85,10 @@ class User(db.Model, UserMixin):
         }
     @property
     def effective_permissions(self):
-        if self.is_admin:
-            # Return both read+write for all pages to support legacy checks
-            return [f"{page.name.lower()}.write" for page in Page.query.all()]
-
-        perms = {}
-        # Process permissions with priority
-        for perm in chain(self.role.permissions, self.permissions):
-            page_name = perm.page.name.lower()
-            current = perms.get(page_name, 'none')
-            # Hierarchy: write > read > none
-            if perm.crud_operation == 'write' or \
-               (perm.crud_operation == 'read' and current != 'write'):
-                perms[page_name] = perm.crud_operation
-
-        return [f"{page}.{op}" for page, op in perms.items() if op != 'none']
+        # Resolved with one query and cached, see applications/permissions.py
+        # (imported here because it imports this module)
+        from applications.permissions import effective_permissions
+        return effective_permissions(self)
     
 
     #<!-- Model for TravelAgency -->
@@ -195,6 +183,12 @@ class Ticket(db.Model):
 
     updated_by = db.Column(db.String(100), default='system')
     
+    __table_args__ = (
+        db.Index('uq_ticket_ref_no', 'ref_no', unique=True),
+        db.Index('ix_ticket_date_id', 'date', 'id'),            # listing range + keyset order
+        db.Index('ix_ticket_status_date', 'status', 'date'),    # dashboard booked-in-range sums
+    )
+
     def __repr__(self):
         return f"<Ticket {self.id} | {self.status} | {self.customer_charge} - {self.agent_paid} = {self.profit}>"
 
@@ -221,6 +215,19 @@ class Transaction(db.Model):
     
     updated_by = db.Column(db.String(100), default='system')
     extra_data = db.Column(db.JSON, default={})
+
+    # Flags promoted out of extra_data so queries can filter on them directly
+    deduct_from_account = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(), index=True)
+    credit_to_account = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(), index=True)
+    refund_direction = db.Column(db.String(20), index=True)  # incoming / outgoing (refunds only)
+    company_adjusted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(), index=True)
+
+    __table_args__ = (
+        db.Index('ix_transaction_type_date', 'transaction_type', 'date'),  # per-type listings/exports
+        db.Index('ix_transaction_date', 'date'),                           # dashboard range sums
+        db.Index('ix_transaction_entity', 'entity_type', 'entity_id'),     # entity history lookups
+    )
+
     def __repr__(self):
         return f"<Transaction {self.id} | {self.transaction_type} | {self.amount}>"
 
@@ -229,14 +236,27 @@ class CompanyAccountBalance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     mode = db.Column(db.String(20), nullable=False)  # cash / online
     credited_amount = db.Column(db.Float, default=0)
-    credited_date = db.Column(db.DateTime, default=datetime.now())
+    credited_date = db.Column(db.DateTime, default=datetime.now)
     balance = db.Column(db.Float, default=0)
+    posted_at = db.Column(db.DateTime, default=datetime.now)   # when the row was appended; never updated
 
     ref_no = db.Column(db.String(100))               # Transaction/Ticket reference
     transaction_type = db.Column(db.String(20))      # payment, receipt, refund, ticket
     action = db.Column(db.String(20))                # add, update, delete, cancel
     updated_by = db.Column(db.String(100))           # User who performed it
-    updated_at = db.Column(db.DateTime, default=datetime.now(), onupdate=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_company_balance_mode_id', 'mode', 'id'),                         # last row per mode
+        db.Index('ix_company_balance_mode_posted', 'mode', 'posted_at', 'id'),        # balance as of a date
+    )
+
+class CompanyBalanceHead(db.Model):
+    # Current balance per mode, moved in the same transaction as each ledger append
+    __tablename__ = 'company_balance_head'
+    mode = db.Column(db.String(20), primary_key=True)  # cash / online
+    balance = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
 class Service(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -258,5 +278,112 @@ class Service(db.Model):
     updated_at = db.Column(db.DateTime, onupdate=datetime.now)
     updated_by = db.Column(db.String(100), default='system')
     
+    __table_args__ = (
+        db.Index('uq_service_ref_no', 'ref_no', unique=True),
+        db.Index('ix_service_date', 'date'),                    # listing range
+        db.Index('ix_service_status_date', 'status', 'date'),   # dashboard booked-in-range sums
+    )
+
     def __repr__(self):
-        return f"<Service {self.id} | {self.ref_no} | {self.status}>"
\ No newline at end of file
+        return f"<Service {self.id} | {self.ref_no} | {self.status}>"
+
+
+class RefNoSequence(db.Model):
+    # Last issued reference number per (year, prefix), e.g. (2025, 'T') -> 2025/T/00042
+    __tablename__ = 'ref_no_sequence'
+    year = db.Column(db.Integer, primary_key=True)
+    prefix = db.Column(db.String(10), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CacheVersion(db.Model):
+    # Change counter per cached table (reference tables, permissions), bumped in the same transaction as the change
+    __tablename__ = 'cache_version'
+    name = db.Column(db.String(50), primary_key=True)   # e.g. 'particular'
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyFinancial(db.Model):
+    # Dashboard totals per (day, particular), kept in step with ticket/service/transaction writes
+    __tablename__ = 'daily_financials'
+    day = db.Column(db.Date, primary_key=True)
+    particular_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0 = no particular
+
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)          # any status
+    booked_ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    ticket_sales = db.Column(db.Float, nullable=False, default=0.0)          # booked customer_charge
+    agent_charges = db.Column(db.Float, nullable=False, default=0.0)         # booked agent_paid
+    service_income = db.Column(db.Float, nullable=False, default=0.0)        # booked service customer_charge
+    expenditure = db.Column(db.Float, nullable=False, default=0.0)
+    agent_deposit = db.Column(db.Float, nullable=False, default=0.0)
+    customer_deposit = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class IdempotencyKey(db.Model):
+    # Response of a POST sent with an Idempotency-Key header, replayed to retries until expires_at
+    __tablename__ = 'idempotency_keys'
+    owner = db.Column(db.String(64), primary_key=True)        # JWT subject the key belongs to
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)   # sha256 of method, path and body
+    status_code = db.Column(db.Integer)                       # NULL while the first request is running
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class BalanceSummary(db.Model):
+    # Totals over the active customers/agents/partners, moved with every wallet/credit change
+    __tablename__ = 'balance_summary'
+    kind = db.Column(db.String(20), primary_key=True)   # customer / agent / partner
+    entity_count = db.Column(db.Integer, nullable=False, default=0)
+    wallet_total = db.Column(db.Float, nullable=False, default=0.0)
+    credit_limit_total = db.Column(db.Float, nullable=False, default=0.0)
+    credit_used_total = db.Column(db.Float, nullable=False, default=0.0)  # agent: limit - balance
+
+
+class LedgerCheckpoint(db.Model):
+    # Company ledger state at the end of a closed day/month, so audits and sums start here instead of row 1
+    __tablename__ = 'ledger_checkpoint'
+    mode = db.Column(db.String(20), primary_key=True)            # cash / online
+    period = db.Column(db.String(10), primary_key=True)          # day / month
+    period_start = db.Column(db.Date, primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False)              # last ledger row of the period
+    balance = db.Column(db.Float, nullable=False)                # running balance stored on that row
+    ledger_sum = db.Column(db.Float, nullable=False)             # sum of credited_amount up to that row
+    row_count = db.Column(db.Integer, nullable=False)            # ledger rows up to that row
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_ledger_checkpoint_last', 'mode', 'period', 'last_id'),
+    )
+
+
+class ExportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)          # uuid4 hex
+    kind = db.Column(db.String(30), nullable=False)           # tickets, transactions, dashboard, ...
+    format = db.Column(db.String(10), nullable=False)         # excel / pdf
+    params = db.Column(db.JSON, default={})                   # query args the export is rendered with
+    status = db.Column(db.String(20), default='queued')       # queued, running, completed, failed
+    progress = db.Column(db.Integer, default=0)               # 0-100
+    file_path = db.Column(db.String(255))
+    filename = db.Column(db.String(255))
+    mimetype = db.Column(db.String(100))
+    error = db.Column(db.String(500))
+    created_by = db.Column(db.String(100), default='system')
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "format": self.format,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "filename": self.filename,
+            "error": self.error,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
\ No newline at end of file
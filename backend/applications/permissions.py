@@ -0,0 +1,71 @@
+# applications/permissions.py
+import threading
+
+from sqlalchemy import or_, select
+
+from applications.model import db, Page, Permission, role_permissions, user_permissions
+from applications.reference_cache import bump_cache_version, cache_version
+
+# Change counter bumped by every role, page and permission edit
+VERSION_NAME = 'permissions'
+
+_lock = threading.Lock()
+_cache = {}     # user id -> (key, perms), key = (session_version, role_id, permissions version)
+
+
+def effective_permissions(user):
+    """
+    'page.op' strings a user holds: every page's write for admins, otherwise
+    the strongest of read/write per page across the role's permissions and
+    the user's own. Cached per process until the user's session_version or
+    role changes, or any role/page/permission edit bumps the version.
+    """
+    key = (user.session_version, user.role_id, cache_version(VERSION_NAME))
+    with _lock:
+        cached = _cache.get(user.id)
+    if cached and cached[0] == key:
+        return list(cached[1])
+
+    perms = _resolve(user)
+    with _lock:
+        _cache[user.id] = (key, perms)
+    return list(perms)
+
+
+def bump_permissions_version():
+    """
+    Invalidate every cached permission set. Call inside the transaction that
+    edits roles, pages or permissions, or creates or deletes users (ids can
+    be reused), so other workers see both together.
+    """
+    bump_cache_version(VERSION_NAME)
+    with _lock:
+        _cache.clear()
+
+
+def _resolve(user):
+    """The permission set with one query"""
+    if user.is_admin:
+        # Return both read+write for all pages to support legacy checks
+        names = db.session.execute(select(Page.name).order_by(Page.id)).scalars()
+        return [f"{name.lower()}.write" for name in names]
+
+    granted = select(Page.name, Permission.crud_operation)\
+        .join(Page, Page.id == Permission.page_id)\
+        .where(or_(
+            Permission.id.in_(
+                select(role_permissions.c.permission_id).where(role_permissions.c.role_id == user.role_id)
+            ),
+            Permission.id.in_(
+                select(user_permissions.c.permission_id).where(user_permissions.c.user_id == user.id)
+            )
+        ))\
+        .order_by(Page.id)
+
+    perms = {}
+    for page_name, operation in db.session.execute(granted):
+        page_name = page_name.lower()
+        # Hierarchy: write > read > none
+        if operation == 'write' or (operation == 'read' and perms.get(page_name) != 'write'):
+            perms[page_name] = operation
+    return [f"{page}.{op}" for page, op in perms.items()]
@@ -0,0 +1,125 @@
+# applications/reference_cache.py
+import threading
+import time
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from applications.model import db, CacheVersion, Particular, TravelLocation
+
+# Small, rarely edited tables kept in memory by every worker process
+REFERENCE_MODELS = {
+    'particular': Particular,
+    'travel_location': TravelLocation,
+}
+
+_versions = CacheVersion.__table__
+_lock = threading.Lock()
+_tables = {}    # name -> {'version', 'loaded_at', 'by_id', 'by_name'}
+_stats = {'hits': 0, 'misses': 0}
+
+
+def reference_name(model, ref_id):
+    """Name of a Particular/TravelLocation by id, from the process cache"""
+    if not ref_id:
+        return None
+    return _table(model)['by_id'].get(ref_id)
+
+
+def reference_id(model, name):
+    """Id of a Particular/TravelLocation by name, from the process cache"""
+    if not name:
+        return None
+    return _table(model)['by_name'].get(name)
+
+
+def bump_reference_version(model):
+    """
+    Mark a reference table as changed. Call inside the transaction that
+    changes it: other workers see the new version together with the new rows
+    and reload on their next lookup.
+    """
+    name = _name(model)
+    bump_cache_version(name)
+    with _lock:
+        _tables.pop(name, None)
+
+
+def bump_cache_version(name):
+    """Increment the change counter `name` in the caller's transaction"""
+    bump = _versions.update()\
+        .where(_versions.c.name == name)\
+        .values(version=_versions.c.version + 1)
+    if db.session.execute(bump).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.add(CacheVersion(name=name, version=1))
+        except IntegrityError:
+            db.session.execute(bump)  # Another worker created it first
+
+    if has_request_context():
+        g.pop('_reference_versions', None)
+
+
+def cache_version(name):
+    """Current value of the change counter `name` (0 if never bumped)"""
+    return _current_versions().get(name, 0)
+
+
+def reference_cache_stats():
+    """Process-wide lookup counters; a miss is a lookup that had to reload its table"""
+    with _lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'tables': {name: entry['version'] for name, entry in _tables.items()}
+    }
+
+
+def _name(model):
+    return next(name for name, m in REFERENCE_MODELS.items() if m is model)
+
+
+def _current_versions():
+    """All change counters, read once per request"""
+    if has_request_context() and '_reference_versions' in g:
+        return g._reference_versions
+    versions = dict(db.session.execute(select(_versions.c.name, _versions.c.version)).all())
+    if has_request_context():
+        g._reference_versions = versions
+    return versions
+
+
+def _table(model):
+    name = _name(model)
+    # Read the version before the rows so a concurrent change can only cause
+    # an extra reload, never a stale table tagged as current
+    version = cache_version(name)
+    ttl = current_app.config.get('REFERENCE_CACHE_TTL')
+
+    with _lock:
+        entry = _tables.get(name)
+        fresh = (
+            entry is not None
+            and entry['version'] == version
+            and (not ttl or time.monotonic() - entry['loaded_at'] < ttl)
+        )
+        if fresh:
+            _stats['hits'] += 1
+            return entry
+        _stats['misses'] += 1
+
+    rows = db.session.query(model.id, model.name).all()
+    entry = {
+        'version': version,
+        'loaded_at': time.monotonic(),
+        'by_id': {ref_id: ref_name for ref_id, ref_name in rows},
+        'by_name': {ref_name: ref_id for ref_id, ref_name in rows},
+    }
+    with _lock:
+        _tables[name] = entry
+    return entry
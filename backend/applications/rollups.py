@@ -0,0 +1,330 @@
+# applications/rollups.py
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect, func, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from applications.model import (
+    db, DailyFinancial, Ticket, Service, Transaction, BalanceSummary, Customer, Agent, Partner
+)
+from applications.export_utils import EXPORT_CHUNK_SIZE
+
+ROLLUP_FIELDS = (
+    'ticket_count', 'booked_ticket_count', 'ticket_sales', 'agent_charges',
+    'service_income', 'expenditure', 'agent_deposit', 'customer_deposit'
+)
+
+# Columns each source row contributes through; a change to any other column
+# leaves the rollup untouched
+WATCHED_COLUMNS = {
+    Ticket: ('date', 'particular_id', 'status', 'customer_charge', 'agent_paid'),
+    Service: ('date', 'particular_id', 'status', 'customer_charge'),
+    Transaction: ('date', 'particular_id', 'transaction_type', 'pay_type', 'entity_type', 'amount',
+                  'deduct_from_account', 'credit_to_account'),
+}
+
+_table = DailyFinancial.__table__
+
+
+# ===== CONTRIBUTIONS =====
+# The same rules as the raw dashboard queries, applied to one row at a time
+def _ticket_amounts(v):
+    amounts = {'ticket_count': 1}
+    if v['status'] == 'booked':
+        amounts.update(
+            booked_ticket_count=1,
+            ticket_sales=v['customer_charge'] or 0.0,
+            agent_charges=v['agent_paid'] or 0.0
+        )
+    return amounts
+
+
+def _service_amounts(v):
+    if v['status'] != 'booked':
+        return {}
+    return {'service_income': v['customer_charge'] or 0.0}
+
+
+def _transaction_amounts(v):
+    deducted = bool(v['deduct_from_account'])
+    credited = bool(v['credit_to_account'])
+    entity, pay_type, ttype = v['entity_type'], v['pay_type'], v['transaction_type']
+    amount = v['amount'] or 0.0
+
+    if ttype == 'payment' and pay_type != 'wallet_transfer' and (
+        entity == 'others'
+        or (entity == 'agent' and pay_type == 'other_expense' and deducted)
+        or (entity in ('customer', 'partner') and (
+            pay_type == 'cash_withdrawal' or (pay_type == 'other_expense' and deducted)
+        ))
+    ):
+        return {'expenditure': amount}
+
+    if ttype == 'receipt' and (pay_type == 'cash_deposit' or (pay_type == 'other_receipt' and credited)):
+        if entity == 'agent':
+            return {'agent_deposit': amount}
+        if entity == 'customer':
+            return {'customer_deposit': amount}
+    return {}
+
+
+_AMOUNTS = {
+    Ticket: _ticket_amounts,
+    Service: _service_amounts,
+    Transaction: _transaction_amounts,
+}
+
+
+def _accumulate(deltas, model, values, sign):
+    amounts = _AMOUNTS[model](values)
+    if not amounts:
+        return
+    day = (values['date'] or datetime.now()).date()
+    bucket = deltas[(day, values['particular_id'] or 0)]
+    for field, amount in amounts.items():
+        bucket[field] += sign * amount
+
+
+# ===== INCREMENTAL MAINTENANCE =====
+def _values(obj, columns, old):
+    """Current column values of `obj`, or the ones it had before this flush"""
+    state = inspect(obj)
+    values = {}
+    for name in columns:
+        if old:
+            history = state.attrs[name].history
+            if history.deleted:
+                values[name] = history.deleted[0]
+                continue
+            if history.unchanged:
+                values[name] = history.unchanged[0]
+                continue
+        values[name] = getattr(obj, name)
+    return values
+
+
+def _has_changes(obj, columns):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in columns)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_rollups(session, flush_context):
+    """
+    Fold every ticket/service/transaction insert, update and delete of this
+    flush into daily_financials, inside the same transaction. Attribute
+    history still holds the pre-flush values here, so an update is applied
+    as "remove the old contribution, add the new one".
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+
+    for obj in session.new:
+        columns = WATCHED_COLUMNS.get(type(obj))
+        if columns:
+            _accumulate(deltas, type(obj), _values(obj, columns, old=False), 1)
+
+    for obj in session.dirty:
+        columns = WATCHED_COLUMNS.get(type(obj))
+        if columns and _has_changes(obj, columns):
+            _accumulate(deltas, type(obj), _values(obj, columns, old=True), -1)
+            _accumulate(deltas, type(obj), _values(obj, columns, old=False), 1)
+
+    for obj in session.deleted:
+        columns = WATCHED_COLUMNS.get(type(obj))
+        if columns:
+            _accumulate(deltas, type(obj), _values(obj, columns, old=True), -1)
+
+    if deltas:
+        _apply(session.connection(), deltas)
+
+
+def _apply(connection, deltas):
+    dialect = connection.dialect.name
+    for (day, particular_id), amounts in deltas.items():
+        amounts = {field: amount for field, amount in amounts.items() if amount}
+        if not amounts:
+            continue  # e.g. an update that moved nothing
+
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            stmt = insert(_table).values(day=day, particular_id=particular_id, **{**_zeros(), **amounts})
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['day', 'particular_id'],
+                set_={field: _table.c[field] + stmt.excluded[field] for field in amounts}
+            )
+            connection.execute(stmt)
+            continue
+
+        bump = _table.update()\
+            .where(_table.c.day == day, _table.c.particular_id == particular_id)\
+            .values({field: _table.c[field] + amount for field, amount in amounts.items()})
+        if connection.execute(bump).rowcount == 0:
+            connection.execute(_table.insert().values(day=day, particular_id=particular_id, **{**_zeros(), **amounts}))
+
+
+def _zeros():
+    return {field: 0 for field in ROLLUP_FIELDS}
+
+
+# ===== REBUILD =====
+def rebuild_daily_financials():
+    """
+    Recompute daily_financials from every ticket, service and transaction.
+    Used for the initial backfill and to repair drift.
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+    for model, columns in WATCHED_COLUMNS.items():
+        query = db.session.query(*(getattr(model, name) for name in columns))
+        for row in query.yield_per(EXPORT_CHUNK_SIZE):
+            _accumulate(deltas, model, row._asdict(), 1)
+
+    rows = [
+        {'day': day, 'particular_id': particular_id, **_zeros(), **amounts}
+        for (day, particular_id), amounts in deltas.items()
+    ]
+    db.session.execute(_table.delete())
+    if rows:
+        db.session.execute(_table.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def seed_daily_financials():
+    """Backfill the rollup once for databases that predate it"""
+    if db.session.query(DailyFinancial.day).first():
+        return None
+    if not any(db.session.query(model.id).first() for model in WATCHED_COLUMNS):
+        return None
+    return rebuild_daily_financials()
+
+
+# ===== BALANCE SUMMARY =====
+# One balance_summary row per entity kind with the totals over its active
+# rows. ORM changes (entity create/edit/delete) are folded in after each
+# flush; the atomic wallet UPDATEs in wallets.py report theirs through
+# apply_balance_change().
+BALANCE_KINDS = {Customer: 'customer', Agent: 'agent', Partner: 'partner'}
+BALANCE_WATCHED = {
+    Customer: ('active', 'wallet_balance', 'credit_limit', 'credit_used'),
+    Agent: ('active', 'wallet_balance', 'credit_limit', 'credit_balance'),
+    Partner: ('active', 'wallet_balance'),
+}
+SUMMARY_FIELDS = ('entity_count', 'wallet_total', 'credit_limit_total', 'credit_used_total')
+
+_summary = BalanceSummary.__table__
+
+
+def _balance_amounts(model, v):
+    if v['active'] is False:
+        return {}
+    amounts = {'entity_count': 1, 'wallet_total': v['wallet_balance'] or 0.0}
+    if model is Customer:
+        amounts['credit_limit_total'] = v['credit_limit'] or 0.0
+        amounts['credit_used_total'] = v['credit_used'] or 0.0
+    elif model is Agent:
+        amounts['credit_limit_total'] = v['credit_limit'] or 0.0
+        amounts['credit_used_total'] = (v['credit_limit'] or 0.0) - (v['credit_balance'] or 0.0)
+    return amounts
+
+
+def _summary_delta(deltas, model, values, sign):
+    for field, amount in _balance_amounts(model, values).items():
+        deltas[BALANCE_KINDS[model]][field] += sign * amount
+
+
+def apply_balance_change(model, old, new):
+    """Move the summary by the difference between two snapshots of an entity's BALANCE_WATCHED columns"""
+    deltas = defaultdict(lambda: defaultdict(float))
+    _summary_delta(deltas, model, old, -1)
+    _summary_delta(deltas, model, new, 1)
+    _apply_summary(db.session, deltas)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_balance_summary(session, flush_context):
+    """Fold customer/agent/partner inserts, edits and deletes of this flush into balance_summary"""
+    deltas = defaultdict(lambda: defaultdict(float))
+
+    for obj in session.new:
+        columns = BALANCE_WATCHED.get(type(obj))
+        if columns:
+            _summary_delta(deltas, type(obj), _values(obj, columns, old=False), 1)
+
+    for obj in session.dirty:
+        columns = BALANCE_WATCHED.get(type(obj))
+        if columns and _has_changes(obj, columns):
+            _summary_delta(deltas, type(obj), _values(obj, columns, old=True), -1)
+            _summary_delta(deltas, type(obj), _values(obj, columns, old=False), 1)
+
+    for obj in session.deleted:
+        columns = BALANCE_WATCHED.get(type(obj))
+        if columns:
+            _summary_delta(deltas, type(obj), _values(obj, columns, old=True), -1)
+
+    if deltas:
+        _apply_summary(session, deltas)
+
+
+def _apply_summary(session, deltas):
+    for kind, amounts in deltas.items():
+        amounts = {field: amount for field, amount in amounts.items() if amount}
+        if not amounts:
+            continue
+        bump = _summary.update()\
+            .where(_summary.c.kind == kind)\
+            .values({field: _summary.c[field] + amount for field, amount in amounts.items()})
+        if session.execute(bump).rowcount:
+            continue
+        # No row yet: seed it from the table, which already includes this change
+        try:
+            with session.begin_nested():
+                session.execute(_summary.insert().values(kind=kind, **_summary_totals(kind)))
+        except IntegrityError:
+            session.execute(bump)  # Another worker seeded it first, without our change
+
+
+def _summary_totals(kind):
+    model = next(m for m, k in BALANCE_KINDS.items() if k == kind)
+    columns = [func.count(model.id), func.coalesce(func.sum(model.wallet_balance), 0.0)]
+    if model is Customer:
+        columns += [func.coalesce(func.sum(model.credit_limit), 0.0), func.coalesce(func.sum(model.credit_used), 0.0)]
+    elif model is Agent:
+        columns += [
+            func.coalesce(func.sum(model.credit_limit), 0.0),
+            func.coalesce(func.sum(model.credit_limit - model.credit_balance), 0.0)
+        ]
+    else:
+        columns += [literal(0.0), literal(0.0)]
+    row = db.session.execute(select(*columns).where(model.active == True)).one()
+    return dict(zip(SUMMARY_FIELDS, row))
+
+
+def rebuild_balance_summary():
+    """Recompute balance_summary from the customer, agent and partner tables"""
+    db.session.execute(_summary.delete())
+    for kind in BALANCE_KINDS.values():
+        db.session.execute(_summary.insert().values(kind=kind, **_summary_totals(kind)))
+    db.session.commit()
+
+
+def seed_balance_summary():
+    """Create the summary rows once for databases that predate them"""
+    if db.session.query(BalanceSummary.kind).count() == len(BALANCE_KINDS):
+        return False
+    rebuild_balance_summary()
+    return True
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Rebuild the daily_financials dashboard rollup and balance_summary from raw data."""
+    count = rebuild_daily_financials()
+    click.echo(f"✔ daily_financials rebuilt: {count} rows")
+    rebuild_balance_summary()
+    click.echo("✔ balance_summary rebuilt")
@@ -0,0 +1,97 @@
+# applications/sequences.py
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from applications.model import db, RefNoSequence, Ticket, Service, Transaction
+
+# Table holding the existing reference numbers for each prefix, used once to
+# seed a counter that does not exist yet
+REF_NO_MODELS = {
+    'T': Ticket,
+    'S': Service,
+    'P': Transaction,
+    'R': Transaction,
+    'E': Transaction,
+    'WT': Transaction,
+}
+
+_seq = RefNoSequence.__table__
+
+
+def next_ref_no(prefix, width, year=None):
+    """
+    Allocate the next 'YYYY/<prefix>/<n>' reference number.
+
+    The counter row is bumped with a single UPDATE inside the caller's
+    transaction, so the row stays write-locked until commit and concurrent
+    bookings can't be handed the same number. A rollback gives the number back.
+    """
+    return next_ref_nos(prefix, width, 1, year)[0]
+
+
+def next_ref_nos(prefix, width, count, year=None):
+    """Allocate `count` consecutive reference numbers with one counter bump"""
+    if count <= 0:
+        return []
+    year = year or datetime.now().year
+    bump = _seq.update()\
+        .where(_seq.c.year == year, _seq.c.prefix == prefix)\
+        .values(last_value=_seq.c.last_value + count)
+
+    if db.session.execute(bump).rowcount == 0:
+        seed_ref_sequence(prefix, year)
+        db.session.execute(bump)
+
+    last = db.session.execute(
+        select(_seq.c.last_value).where(_seq.c.year == year, _seq.c.prefix == prefix)
+    ).scalar_one()
+    return [f"{year}/{prefix}/{value:0{width}d}" for value in range(last - count + 1, last + 1)]
+
+
+def preview_ref_no(prefix, width, year=None):
+    """Next reference number for display in forms, without allocating it"""
+    year = year or datetime.now().year
+    last = db.session.execute(
+        select(_seq.c.last_value).where(_seq.c.year == year, _seq.c.prefix == prefix)
+    ).scalar()
+    if last is None:
+        last = _max_existing(prefix, year)
+    return f"{year}/{prefix}/{last + 1:0{width}d}"
+
+
+def seed_ref_sequence(prefix, year):
+    """Create the counter for (year, prefix) from the highest number already issued"""
+    try:
+        with db.session.begin_nested():
+            db.session.add(RefNoSequence(year=year, prefix=prefix, last_value=_max_existing(prefix, year)))
+    except IntegrityError:
+        pass  # Another request created it first
+
+
+def seed_ref_sequences(year=None):
+    """One-time seeding of the current year's counters from existing data"""
+    year = year or datetime.now().year
+    existing = {
+        p for (p,) in db.session.query(RefNoSequence.prefix).filter_by(year=year)
+    }
+    for prefix in REF_NO_MODELS:
+        if prefix not in existing:
+            seed_ref_sequence(prefix, year)
+    db.session.commit()
+
+
+def _max_existing(prefix, year):
+    model = REF_NO_MODELS.get(prefix)
+    if model is None:
+        return 0
+
+    last = 0
+    pattern = f"{year}/{prefix}/"
+    for (ref_no,) in db.session.query(model.ref_no).filter(model.ref_no.startswith(pattern, autoescape=True)):
+        try:
+            last = max(last, int(ref_no.split('/')[-1]))
+        except ValueError:
+            continue  # Manually entered reference that doesn't follow the pattern
+    return last
@@ -2,7 +2,13 @@
 from flask import request, abort, g
 from flask_restful import Resource
 from applications.utils import check_permission
-from applications.model import db, Customer, Particular, Service, CompanyAccountBalance
+from applications.idempotency import idempotent
+from applications.sequences import next_ref_no
+from applications.entity_cache import get_cached
+from applications.wallets import debit_wallet, credit_wallet, adjust_wallet
+from applications.reference_cache import reference_name
+from applications.ledger import post_company_entry
+from applications.model import db, Customer, Particular, Service
 from datetime import datetime, timedelta
 import pandas as pd
 from fpdf import FPDF
@@ -35,6 +41,7 @@ class ServiceResource(Resource):
         return [self._format_service(s) for s in services]
 
     @check_permission()
+    @idempotent
     def post(self, action=None):
         action = (action or request.args.get('action', '')).lower().strip()
         return self.cancel_service() if action == 'cancel' else self.book_service()
@@ -96,9 +103,9 @@ class ServiceResource(Resource):
             'id': service.id,
             'ref_no': service.ref_no,
             'customer_id': service.customer_id,
-            'customer_name': Customer.query.get(service.customer_id).name,
+            'customer_name': get_cached(Customer, service.customer_id).name,
             'particular_id': service.particular_id,
-            'particular_name': Particular.query.get(service.particular_id).name if service.particular_id else None,
+            'particular_name': reference_name(Particular, service.particular_id),
             'customer_charge': service.customer_charge,
             'status': service.status,
             'date': service.date.isoformat(),
@@ -187,9 +194,9 @@ class ServiceResource(Resource):
         return {"message": "Service deleted successfully"}
 
     def _adjust_customer_balance(self, customer_id, amount, mode, description, service_ref=None):
-        if customer := Customer.query.get(customer_id):
+        if customer := get_cached(Customer, customer_id):
             if mode == 'wallet':
-                customer.wallet_balance += amount
+                adjust_wallet(customer, amount)
             else:
                 self._update_company_account(
                     mode,
@@ -200,26 +207,14 @@ class ServiceResource(Resource):
                 )
 
     def _update_company_account(self, mode, amount, action, description, ref_no=None):
-        if mode not in ['cash', 'online']:
-            return
-            
-        last_balance = 0
-        if last_entry := CompanyAccountBalance.query.filter_by(mode=mode)\
-                            .order_by(CompanyAccountBalance.id.desc())\
-                            .first():
-            last_balance = last_entry.balance
-
-        entry = CompanyAccountBalance(
-            mode=mode,
-            credited_amount=amount,
-            credited_date=datetime.now(),
-            balance=last_balance + amount,
+        post_company_entry(
+            mode,
+            amount,
             ref_no=ref_no,
             transaction_type='service',
             action=action,
             updated_by=getattr(g, 'username', 'system')
         )
-        db.session.add(entry)
 
     # ===== SERVICE PROCESSING METHODS =====
     def book_service(self):
@@ -249,12 +244,7 @@ class ServiceResource(Resource):
             abort(500, f"Booking failed: {str(e)}")
 
     def _generate_reference_number(self):
-        current_year = datetime.now().year
-        max_ref = db.session.query(db.func.max(Service.ref_no)).filter(
-            Service.ref_no.like(f"{current_year}/S/%")
-        ).scalar()
-        last_num = int(max_ref.split('/')[-1]) if max_ref and '/' in max_ref else 0
-        return f"{current_year}/S/{last_num + 1:05d}"
+        return next_ref_no('S', width=5)
 
     def cancel_service(self):
         data = request.json
@@ -306,17 +296,9 @@ class ServiceResource(Resource):
                 service.ref_no
             )
             
-        if customer := Customer.query.get(service.customer_id):
+        if customer := get_cached(Customer, service.customer_id):
             if service.customer_payment_mode == 'wallet':
-                if customer.wallet_balance >= service.customer_charge:
-                    customer.wallet_balance -= service.customer_charge
-                else:
-                    remaining = service.customer_charge - customer.wallet_balance
-                    customer.wallet_balance = 0
-                    if remaining <= (customer.credit_limit - customer.credit_used):
-                        customer.credit_used += remaining
-                    else:
-                        raise Exception("Insufficient customer credit")
+                debit_wallet(customer, service.customer_charge, "Insufficient customer credit")
 
     def _reverse_payment(self, service):
         if service.customer_payment_mode in ['cash', 'online']:
@@ -328,22 +310,16 @@ class ServiceResource(Resource):
                 service.ref_no
             )
             
-        if customer := Customer.query.get(service.customer_id):
+        if customer := get_cached(Customer, service.customer_id):
             if service.customer_payment_mode == 'wallet':
-                refund_to_credit = min(service.customer_charge, customer.credit_used)
-                customer.credit_used -= refund_to_credit
-                refund_to_wallet = service.customer_charge - refund_to_credit
-                customer.wallet_balance += refund_to_wallet
+                credit_wallet(customer, service.customer_charge)
 
     def _process_refund(self, service, refund_amt, refund_mode):
         if refund_amt > 0:
-            if customer := Customer.query.get(service.customer_id):
+            if customer := get_cached(Customer, service.customer_id):
                 if refund_mode == 'wallet':
-                    # Existing wallet refund logic
-                    refund_to_credit = min(refund_amt, customer.credit_used)
-                    customer.credit_used -= refund_to_credit
-                    refund_to_wallet = refund_amt - refund_to_credit
-                    customer.wallet_balance += refund_to_wallet
+                    # Refund to credit first, remainder to wallet
+                    credit_wallet(customer, refund_amt)
                 else:  # cash or online refund
                     # Deduct from company account for cash/online refund
                     self._update_company_account(
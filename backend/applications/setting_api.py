@@ -3,6 +3,7 @@ from sqlalchemy.exc import IntegrityError
 from flask_restful import Resource
 from applications.model import db,User, Role, Permission, Page,role_permissions, user_permissions
 from applications.utils import check_permission, serialize_entity
+from applications.permissions import bump_permissions_version
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
 from flask import current_app
@@ -64,6 +65,7 @@ class RoleAPI(Resource):
             role.name = data['name']
         if 'description' in data:
             role.description = data['description']
+        bump_permissions_version()
         db.session.commit()
         return serialize_entity(role), 200
 
@@ -71,6 +73,7 @@ class RoleAPI(Resource):
     def delete(self, role_id):
         role = Role.query.get_or_404(role_id)
         db.session.delete(role)
+        bump_permissions_version()
         db.session.commit()
         return {'message': 'Role deleted'}, 200
 
@@ -123,6 +126,7 @@ class RolePermissionAPI(Resource):
             new_perms.append(permission)
 
         role.permissions = new_perms
+        bump_permissions_version()
         db.session.commit()
         return {
             "message": "Permissions updated successfully",
@@ -174,6 +178,7 @@ class PageAPI(Resource):
                 perm = Permission(page_id=page.id, crud_operation=op)
                 db.session.add(perm)
 
+            bump_permissions_version()
             db.session.commit()
             return {
                 **serialize_entity(page),
@@ -190,6 +195,7 @@ class PageAPI(Resource):
         p = Page.query.get_or_404(page_id)
         if 'name' in request.json: p.name = request.json['name']
         if 'route' in request.json: p.route = request.json['route']
+        bump_permissions_version()
         db.session.commit()
         return serialize_entity(p), 200
 
@@ -214,6 +220,7 @@ class PageAPI(Resource):
 
         # Step 4: Delete the page
         db.session.delete(page)
+        bump_permissions_version()
         db.session.commit()
 
         return {"message": "Page and related permissions deleted successfully"}, 200
\ No newline at end of file
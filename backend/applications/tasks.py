@@ -0,0 +1,137 @@
+# applications/tasks.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from celery import Celery
+from flask import g
+from werkzeug.http import parse_options_header
+
+from applications.model import db, ExportJob
+from applications.ticket_api import TicketResource
+from applications.transaction_api import TransactionResource
+from applications.dashboard import DashboardMetricsAPI, CustomerWalletCreditAPI, AgentWalletCreditAPI, PartnerWalletCreditAPI
+
+celery = Celery(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def init_celery(app):
+    """
+    Configure the shared Celery instance from the Flask config.
+
+    With a broker, exports are rendered by Celery workers:
+    celery -A main.celery worker. Without one they run on a small thread
+    pool in the web process (EXPORT_THREADS), still off the request thread.
+    CELERY_TASK_ALWAYS_EAGER renders them inside the request, for tests.
+    """
+    celery.conf.update(
+        broker_url=app.config.get('CELERY_BROKER_URL') or 'memory://',
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        task_ignore_result=True
+    )
+    celery.flask_app = app
+    os.makedirs(app.config['EXPORT_DIR'], exist_ok=True)
+    return celery
+
+
+def queue_export(job_id):
+    """Hand a queued job to Celery, or to the local thread pool when there is no broker"""
+    config = celery.flask_app.config
+    if celery.conf.task_always_eager or config.get('CELERY_BROKER_URL'):
+        render_export.delay(job_id)
+    else:
+        _local_executor(config).submit(render_export, job_id)
+
+
+def _local_executor(config):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=config.get('EXPORT_THREADS') or 1,
+                thread_name_prefix='export'
+            )
+        return _executor
+
+
+# ===== EXPORT RENDERERS =====
+# Each renderer runs inside a request context built from the job params and
+# returns the same response the synchronous export endpoint would.
+def _render_tickets(job):
+    return TicketResource().export_tickets(job.format)
+
+def _render_transactions(job):
+    return TransactionResource().export_transactions(job.params.get('transaction_type'), job.format)
+
+EXPORT_RENDERERS = {
+    'tickets': (('excel', 'pdf'), _render_tickets),
+    'transactions': (('excel', 'pdf'), _render_transactions),
+    'dashboard': (('pdf',), lambda job: DashboardMetricsAPI().get()),
+    'customer_balances': (('pdf',), lambda job: CustomerWalletCreditAPI().get()),
+    'agent_balances': (('pdf',), lambda job: AgentWalletCreditAPI().get()),
+    'partner_balances': (('pdf',), lambda job: PartnerWalletCreditAPI().get()),
+}
+
+
+def _update_job(job, **fields):
+    for key, value in fields.items():
+        setattr(job, key, value)
+    db.session.commit()
+
+
+def _error_message(result):
+    """Pull a readable message out of a non-file export result"""
+    if isinstance(result, tuple):
+        body = result[0]
+        return body.get('error') if isinstance(body, dict) else str(body)
+    return getattr(result, 'description', None) or str(result)
+
+
+@celery.task
+def render_export(job_id):
+    app = celery.flask_app
+    with app.app_context():
+        job = ExportJob.query.get(job_id)
+        if not job or job.status != 'queued':
+            return
+
+        _update_job(job, status='running', progress=10)
+        try:
+            _, renderer = EXPORT_RENDERERS[job.kind]
+            query_string = {**(job.params or {}), 'export': job.format}
+            with app.test_request_context(query_string=query_string):
+                g.username = job.created_by
+                result = renderer(job)
+
+                if isinstance(result, tuple) or getattr(result, 'status_code', 500) != 200:
+                    raise ValueError(_error_message(result))
+
+                _update_job(job, progress=50)
+                path = os.path.join(app.config['EXPORT_DIR'], job.id)
+                with open(path, 'wb') as f:
+                    for chunk in result.iter_encoded():
+                        f.write(chunk)
+                result.close()
+
+            _, options = parse_options_header(result.headers.get('Content-Disposition', ''))
+            _update_job(
+                job,
+                status='completed',
+                progress=100,
+                file_path=path,
+                filename=options.get('filename') or job.id,
+                mimetype=result.mimetype,
+                finished_at=datetime.now()
+            )
+        except Exception as e:
+            db.session.rollback()
+            _update_job(
+                job,
+                status='failed',
+                error=(getattr(e, 'description', None) or str(e))[:500],
+                finished_at=datetime.now()
+            )
@@ -2,12 +2,36 @@
 from flask import request, abort, g
 from flask_restful import Resource
 from applications.utils import check_permission
-from applications.model import db, Customer, Agent, Ticket, CompanyAccountBalance, Particular, TravelLocation, Passenger
+from applications.idempotency import idempotent
+from applications.export_utils import stream_excel, EXPORT_CHUNK_SIZE
+from applications.sequences import next_ref_no, next_ref_nos
+from applications.entity_cache import get_cached
+from applications.wallets import debit_wallet, credit_wallet, adjust_wallet, available_funds, InsufficientFunds
+from applications.reference_cache import reference_name
+from applications.ledger import post_company_entry, post_company_entries
+from applications.model import db, Customer, Agent, Ticket, Particular, TravelLocation, Passenger
 from datetime import datetime, timedelta
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import IntegrityError
 from flask import send_file
 from fpdf import FPDF
 from io import BytesIO
-import pandas as pd
+
+MAX_PAGE_SIZE = 500
+MAX_BULK_TICKETS = 500
+PAYMENT_MODES = ('cash', 'online', 'wallet')
+
+EXPORT_COLUMNS = [
+    'Reference No', 'Date', 'Customer', 'Agent', 'Particular', 'Travel Location',
+    'Passenger', 'Customer Charge', 'Agent Paid', 'Profit', 'Status',
+    'Customer Payment Mode', 'Agent Payment Mode',
+    'Created At', 'Updated At', 'Updated By'
+]
+CANCELLED_EXPORT_COLUMNS = [
+    'Customer Refund Amount', 'Customer Refund Mode',
+    'Agent Recovery Amount', 'Agent Recovery Mode'
+]
 
 class TicketResource(Resource):
     def __init__(self, **kwargs):
@@ -19,25 +43,18 @@ class TicketResource(Resource):
         if export_format in ['excel', 'pdf']:
             return self.export_tickets(export_format)
         
-        status = request.args.get('status', 'booked')
-        start_date, end_date = self._parse_date_range()
-        
-        # Add 1 day to end_date to include the entire day
-        end_date_plus = end_date + timedelta(days=1)
-        
-        query = Ticket.query.filter(
-            Ticket.date >= start_date,
-            Ticket.date < end_date_plus
-        )
-        
-        if status != 'all':
-            query = query.filter_by(status=status)
+        query = self._build_listing_query()
+
+        # Paginated mode is opt-in so existing callers keep the full array
+        if (limit := request.args.get('limit')) is not None:
+            return self._paginate(query, limit)
             
-        tickets = query.all()
+        rows = self._with_related_names(query).all()
         
-        return [self._format_ticket(t) for t in tickets]
+        return [self._format_ticket(row.Ticket, row) for row in rows]
 
     @check_permission()
+    @idempotent
     def post(self, action=None):
         action = (action or request.args.get('action', '')).lower().strip()
         return self.cancel_ticket() if action == 'cancel' else self.book_ticket()
@@ -95,17 +112,113 @@ class TicketResource(Resource):
         
         return start_date, end_date
 
-    def _format_ticket(self, ticket):
+    def _build_listing_query(self):
+        """Ticket query for the requested date range and server-side filters"""
+        status = request.args.get('status', 'booked')
+        start_date, end_date = self._parse_date_range()
+        
+        # Add 1 day to end_date to include the entire day
+        end_date_plus = end_date + timedelta(days=1)
+        
+        query = Ticket.query.filter(
+            Ticket.date >= start_date,
+            Ticket.date < end_date_plus
+        )
+        
+        if status != 'all':
+            query = query.filter_by(status=status)
+
+        for field in ('customer_id', 'agent_id', 'particular_id'):
+            if value := request.args.get(field):
+                try:
+                    query = query.filter(getattr(Ticket, field) == int(value))
+                except ValueError:
+                    abort(400, f"Invalid {field}")
+
+        if ref_prefix := request.args.get('ref_no'):
+            query = query.filter(Ticket.ref_no.startswith(ref_prefix, autoescape=True))
+
+        return query
+
+    def _paginate(self, query, limit):
+        """Keyset pagination on (date, id).
+
+        The next page cursor is returned in the X-Next-Cursor header. The total
+        row count is only computed for the first page (no cursor) and sent as
+        X-Total-Count, so following pages never re-count the range.
+        """
+        try:
+            limit = int(limit)
+        except ValueError:
+            abort(400, "Invalid limit")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            abort(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        headers = {}
+        if cursor := request.args.get('cursor'):
+            last_date, last_id = self._decode_cursor(cursor)
+            query = query.filter(or_(
+                Ticket.date > last_date,
+                and_(Ticket.date == last_date, Ticket.id > last_id)
+            ))
+        else:
+            headers['X-Total-Count'] = str(query.with_entities(func.count(Ticket.id)).scalar())
+
+        rows = self._with_related_names(query)\
+            .order_by(Ticket.date, Ticket.id)\
+            .limit(limit + 1)\
+            .all()
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers['X-Next-Cursor'] = self._encode_cursor(rows[-1].Ticket)
+
+        return [self._format_ticket(row.Ticket, row) for row in rows], 200, headers
+
+    @staticmethod
+    def _encode_cursor(ticket):
+        raw = f"{ticket.date.isoformat()}|{ticket.id}"
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            raw = urlsafe_b64decode(cursor.encode()).decode()
+            date_part, id_part = raw.rsplit('|', 1)
+            return datetime.fromisoformat(date_part), int(id_part)
+        except (ValueError, UnicodeDecodeError):
+            abort(400, "Invalid cursor")
+
+    def _with_related_names(self, query):
+        """Attach customer/agent/passenger names to a ticket query.
+
+        The names are fetched through outer joins in the same statement, so a
+        listing costs one query no matter how many tickets it returns.
+        Particular and travel location names come from the reference cache.
+        """
+        return query.outerjoin(Customer, Customer.id == Ticket.customer_id)\
+            .outerjoin(Agent, Agent.id == Ticket.agent_id)\
+            .outerjoin(Passenger, Passenger.id == Ticket.passenger_id)\
+            .add_columns(
+                Customer.name.label('customer_name'),
+                Agent.name.label('agent_name'),
+                Passenger.name.label('passenger_name')
+            )
+
+    def _format_ticket(self, ticket, names):
         return {
             'id': ticket.id,
             'ref_no': ticket.ref_no,
             'customer_id': ticket.customer_id,
-            'customer_name': Customer.query.get(ticket.customer_id).name if ticket.customer_id else None,
+            'customer_name': names.customer_name,
             'agent_id': ticket.agent_id,
-            'agent_name': Agent.query.get(ticket.agent_id).name if ticket.agent_id else None,
+            'agent_name': names.agent_name,
             'particular_id': ticket.particular_id,
+            'particular_name': reference_name(Particular, ticket.particular_id),
             'travel_location_id': ticket.travel_location_id,
+            'travel_location_name': reference_name(TravelLocation, ticket.travel_location_id),
             'passenger_id': ticket.passenger_id,
+            'passenger_name': names.passenger_name,
             'customer_charge': ticket.customer_charge,
             'agent_paid': ticket.agent_paid,
             'profit': ticket.profit,
@@ -207,6 +320,9 @@ class TicketResource(Resource):
 
             db.session.commit()
             return {"message": "Ticket updated successfully"}
+        except IntegrityError:
+            db.session.rollback()
+            abort(409, "Reference number already exists")
         except Exception as e:
             db.session.rollback()
             abort(500, f"Update failed: {str(e)}")
@@ -257,9 +373,9 @@ class TicketResource(Resource):
     # Update helper methods to handle references
     def _adjust_customer_balance(self, customer_id, amount, mode, description, ticket_ref=None):
         """Adjust customer balance based on mode"""
-        if customer := Customer.query.get(customer_id):
+        if customer := get_cached(Customer, customer_id):
             if mode == 'wallet':
-                customer.wallet_balance += amount
+                adjust_wallet(customer, amount)
             else:
                 self._update_company_account(
                     mode,
@@ -271,9 +387,9 @@ class TicketResource(Resource):
 
     def _adjust_agent_balance(self, agent_id, amount, mode, description, ticket_ref=None):
         """Adjust agent balance based on mode"""
-        if agent := Agent.query.get(agent_id):
+        if agent := get_cached(Agent, agent_id):
             if mode == 'wallet':
-                agent.wallet_balance += amount
+                adjust_wallet(agent, amount)
             else:
                 self._update_company_account(
                     mode,
@@ -285,28 +401,14 @@ class TicketResource(Resource):
 
     def _update_company_account(self, mode, amount, action, description, ref_no=None):
         """Create a new CompanyAccountBalance entry"""
-        if mode not in ['cash', 'online']:
-            return
-            
-        # Get last balance
-        last_balance = 0
-        if last_entry := CompanyAccountBalance.query.filter_by(mode=mode)\
-                            .order_by(CompanyAccountBalance.id.desc())\
-                            .first():
-            last_balance = last_entry.balance
-
-        # Create new entry
-        entry = CompanyAccountBalance(
-            mode=mode,
-            credited_amount=amount,
-            credited_date=datetime.now(),
-            balance=last_balance + amount,
-            ref_no=ref_no,  # Use provided reference
+        post_company_entry(
+            mode,
+            amount,
+            ref_no=ref_no,
             transaction_type='ticket',
             action=action,
             updated_by=getattr(g, 'username', 'system')
         )
-        db.session.add(entry)
 
     # ===== TICKET PROCESSING METHODS =====
     def book_ticket(self):
@@ -344,6 +446,9 @@ class TicketResource(Resource):
 
             db.session.commit()
             return {"message": "Ticket booked", "id": ticket.id, "ref_no": ticket.ref_no}, 201
+        except IntegrityError:
+            db.session.rollback()
+            abort(409, "Reference number already exists")
         except Exception as e:
             db.session.rollback()
             abort(500, f"Booking failed: {str(e)}")
@@ -358,12 +463,7 @@ class TicketResource(Resource):
         return datetime.now()
 
     def _generate_reference_number(self):
-        current_year = datetime.now().year
-        max_ref = db.session.query(db.func.max(Ticket.ref_no)).filter(
-            Ticket.ref_no.like(f"{current_year}/T/%")
-        ).scalar()
-        last_num = int(max_ref.split('/')[-1]) if max_ref and '/' in max_ref else 0
-        return f"{current_year}/T/{last_num + 1:05d}"
+        return next_ref_no('T', width=5)
 
     def cancel_ticket(self):
         data = request.json
@@ -403,7 +503,7 @@ class TicketResource(Resource):
     def _process_payments(self, ticket, action):
         """Process customer and agent payments for booking/updating"""
         # Customer payment
-        if customer := Customer.query.get(ticket.customer_id):
+        if customer := get_cached(Customer, ticket.customer_id):
             self._process_entity_payment(
                 entity=customer,
                 amount=ticket.customer_charge,
@@ -413,7 +513,7 @@ class TicketResource(Resource):
         
         # Agent payment
         if ticket.agent_id and ticket.agent_paid > 0:
-            if agent := Agent.query.get(ticket.agent_id):
+            if agent := get_cached(Agent, ticket.agent_id):
                 self._process_entity_payment(
                     entity=agent,
                     amount=ticket.agent_paid,
@@ -438,28 +538,11 @@ class TicketResource(Resource):
 
     def _process_wallet_payment(self, entity, amount, is_customer):
         """Handle wallet-based payments with credit fallback"""
-        if is_customer:
-            # Customer payment logic
-            if entity.wallet_balance >= amount:
-                entity.wallet_balance -= amount
-            else:
-                remaining = amount - entity.wallet_balance
-                entity.wallet_balance = 0
-                if remaining <= (entity.credit_limit - entity.credit_used):
-                    entity.credit_used += remaining
-                else:
-                    raise Exception("Insufficient customer credit")
-        else:
-            # Agent payment logic
-            if entity.wallet_balance >= amount:
-                entity.wallet_balance -= amount
-            else:
-                remaining = amount - entity.wallet_balance
-                entity.wallet_balance = 0
-                if remaining <= entity.credit_balance:
-                    entity.credit_balance -= remaining
-                else:
-                    raise Exception("Insufficient agent credit")
+        debit_wallet(
+            entity,
+            amount,
+            "Insufficient customer credit" if is_customer else "Insufficient agent credit"
+        )
 
     def _reverse_payments(self, ticket):
         """Reverse payments for a ticket"""
@@ -468,20 +551,15 @@ class TicketResource(Resource):
 
     def _reverse_customer_payment(self, ticket):
         """Reverse customer payment"""
-        if not (customer := Customer.query.get(ticket.customer_id)):
+        if not (customer := get_cached(Customer, ticket.customer_id)):
             return
 
         mode = (ticket.customer_payment_mode or '').lower().strip()
         amount = ticket.customer_charge
 
         if mode == 'wallet':
-            # Refund credit first
-            refund_to_credit = min(amount, customer.credit_used)
-            customer.credit_used -= refund_to_credit
-            
-            # Refund remainder to wallet
-            refund_to_wallet = amount - refund_to_credit
-            customer.wallet_balance += refund_to_wallet
+            # Refund credit first, remainder to wallet
+            credit_wallet(customer, amount)
 
         elif mode in ['cash', 'online']:
             self._update_company_account(
@@ -497,21 +575,15 @@ class TicketResource(Resource):
         if not (ticket.agent_paid > 0 and ticket.agent_id):
             return
             
-        if not (agent := Agent.query.get(ticket.agent_id)):
+        if not (agent := get_cached(Agent, ticket.agent_id)):
             return
 
         mode = (ticket.agent_payment_mode or '').lower().strip()
         amount = ticket.agent_paid
 
         if mode == 'wallet':
-            # Restore credit
-            credit_deficit = agent.credit_limit - agent.credit_balance
-            refund_to_credit = min(amount, credit_deficit)
-            agent.credit_balance += refund_to_credit
-            
-            # Refund remainder to wallet
-            refund_to_wallet = amount - refund_to_credit
-            agent.wallet_balance += refund_to_wallet
+            # Restore credit first, remainder to wallet
+            credit_wallet(agent, amount)
 
         elif mode in ['cash', 'online']:
             self._update_company_account(
@@ -526,37 +598,38 @@ class TicketResource(Resource):
         """Process refunds during cancellation"""
         # Customer refund
         if refund_amt > 0:
-            if customer := Customer.query.get(ticket.customer_id):
+            if customer := get_cached(Customer, ticket.customer_id):
                 if refund_mode == 'wallet':
-                    # Refund to credit first
-                    refund_to_credit = min(refund_amt, customer.credit_used)
-                    customer.credit_used -= refund_to_credit
-                    
-                    # Refund remainder to wallet
-                    refund_to_wallet = refund_amt - refund_to_credit
-                    customer.wallet_balance += refund_to_wallet
+                    # Refund to credit first, remainder to wallet
+                    credit_wallet(customer, refund_amt)
                 
                 ticket.customer_refund_amount = refund_amt
                 ticket.customer_refund_mode = refund_mode
 
         # Agent recovery
         if recovery_amt > 0 and ticket.agent_id:
-            if agent := Agent.query.get(ticket.agent_id):
+            if agent := get_cached(Agent, ticket.agent_id):
                 if recovery_mode == 'wallet':
-                    # Restore credit
-                    credit_deficit = agent.credit_limit - agent.credit_balance
-                    refund_to_credit = min(recovery_amt, credit_deficit)
-                    agent.credit_balance += refund_to_credit
-                    
-                    # Refund remainder to wallet
-                    refund_to_wallet = recovery_amt - refund_to_credit
-                    agent.wallet_balance += refund_to_wallet
+                    # Restore credit first, remainder to wallet
+                    credit_wallet(agent, recovery_amt)
                 
                 ticket.agent_recovery_amount = recovery_amt
                 ticket.agent_recovery_mode = recovery_mode
 
     def _update_ticket_financials(self, ticket, action):
         """Calculate net cash impact and update company account"""
+        if entry := self._ticket_ledger_entry(ticket, action):
+            mode, net_amount = entry
+            self._update_company_account(
+                mode, 
+                net_amount, 
+                action, 
+                f"Ticket {ticket.id} {action}",
+                ref_no=ticket.ref_no
+            )
+
+    def _ticket_ledger_entry(self, ticket, action):
+        """(mode, net cash impact) of a ticket action, or None when it has none"""
         net_amount = 0
         
         # Determine cash/online impact
@@ -583,13 +656,8 @@ class TicketResource(Resource):
             # Determine which account to update
             mode = self._get_account_mode(ticket)
             if mode:
-                self._update_company_account(
-                    mode, 
-                    net_amount, 
-                    action, 
-                    f"Ticket {ticket.id} {action}",
-                    ref_no=ticket.ref_no
-                )
+                return mode, net_amount
+        return None
 
     def _get_account_mode(self, ticket):
         """Determine account mode based on payment types"""
@@ -604,49 +672,44 @@ class TicketResource(Resource):
         return None
     def export_tickets(self, format_type):
         status = request.args.get('status', 'booked')
-        start_date, end_date = self._parse_date_range()
-        end_date_plus = end_date + timedelta(days=1)
-        
-        query = Ticket.query.filter(
-            Ticket.date >= start_date,
-            Ticket.date < end_date_plus
-        )
-        
-        if status != 'all':
-            query = query.filter_by(status=status)
-            
-        tickets = query.all()
-        data = [self._format_ticket_for_export(t) for t in tickets]
-        
+        query = self._with_related_names(self._build_listing_query())
+
         if format_type == 'excel':
-            return self.export_excel(data, status)
+            rows = query.order_by(Ticket.date, Ticket.id).yield_per(EXPORT_CHUNK_SIZE)
+            return self.export_excel(
+                (self._format_ticket_for_export(row.Ticket, row) for row in rows),
+                status
+            )
         elif format_type == 'pdf':
+            data = [self._format_ticket_for_export(row.Ticket, row) for row in query.all()]
             return self.export_pdf(data, status)
         else:
             abort(400, "Invalid export format")
 
     def export_excel(self, data, status):
+        """Stream tickets into a workbook; `data` may be any iterable of export rows"""
+        # Cancelled-only columns are included whenever cancelled rows can appear
+        headers = list(EXPORT_COLUMNS)
+        if status != 'booked':
+            idx = headers.index('Created At')
+            headers[idx:idx] = CANCELLED_EXPORT_COLUMNS
+
+        money_cols = ['Customer Charge', 'Agent Paid', 'Profit']
+        if status == 'cancelled':
+            money_cols.extend(['Customer Refund Amount', 'Agent Recovery Amount'])
+
+        column_formats = {col: {'num_format': '#,##0.00'} for col in money_cols}
+        column_formats.update({
+            col: {'num_format': 'yyyy-mm-dd'} for col in ['Date', 'Created At', 'Updated At']
+        })
+
         try:
-            import pandas as pd
-            from io import BytesIO
-            
-            # Create DataFrame
-            df = pd.DataFrame(data)
-            
-            if df.empty:
-                return "No data to export", 404
-                
-            # Create Excel file in memory
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Tickets', index=False)
-                
-                # Get workbook and worksheet
-                workbook = writer.book
-                worksheet = writer.sheets['Tickets']
-                
-                # Add header formatting
-                header_format = workbook.add_format({
+            response = stream_excel(
+                data,
+                sheet_name='Tickets',
+                download_name=f'{status}_tickets_export_{datetime.now().strftime("%Y%m%d")}.xlsx',
+                headers=headers,
+                header_format={
                     'bold': True,
                     'text_wrap': True,
                     'border': 1,
@@ -654,70 +717,29 @@ class TicketResource(Resource):
                     'font_color': 'white',
                     'align': 'center',
                     'valign': 'vcenter'
-                })
-                
-                # Apply header formatting
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                
-                # Auto-adjust column widths
-                for i, col in enumerate(df.columns):
-                    max_len = max(
-                        df[col].astype(str).map(len).max(),  # Max content length
-                        len(str(col))                        # Header length
-                    ) + 2  # Add padding
-                    # Limit max width to 30 characters
-                    max_len = min(max_len, 30) 
-                    worksheet.set_column(i, i, max_len)
-                
-                # Format currency columns
-                money_cols = ['Customer Charge', 'Agent Paid', 'Profit']
-                if status == 'cancelled':
-                    money_cols.extend(['Customer Refund Amount', 'Agent Recovery Amount'])
-                
-                money_format = workbook.add_format({'num_format': '#,##0.00'})
-                
-                for col in money_cols:
-                    if col in df.columns:
-                        col_idx = df.columns.get_loc(col)
-                        worksheet.set_column(col_idx, col_idx, 15, money_format)
-                
-                # Format date columns
-                date_cols = ['Date', 'Created At', 'Updated At']
-                date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
-                
-                for col in date_cols:
-                    if col in df.columns:
-                        col_idx = df.columns.get_loc(col)
-                        worksheet.set_column(col_idx, col_idx, 15, date_format)
-                
-                # Add freeze pane and filter
-                worksheet.autofilter(0, 0, 0, len(df.columns)-1)
-                worksheet.freeze_panes(1, 0)
-            
-            output.seek(0)
-            
-            # Send file to client
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'{status}_tickets_export_{datetime.now().strftime("%Y%m%d")}.xlsx'
+                },
+                column_formats=column_formats,
+                max_width=30,
+                freeze_header=True
             )
         except Exception as e:
             abort(500, f"Excel export failed: {str(e)}")
 
-    def _format_ticket_for_export(self, ticket):
+        if response is None:
+            return "No data to export", 404
+        return response
+
+    def _format_ticket_for_export(self, ticket, names):
         """Format ticket data specifically for exports"""
         # Common fields for all tickets
         data = {
             'Reference No': ticket.ref_no,
             'Date': ticket.date.strftime('%Y-%m-%d') if ticket.date else '',
-            'Customer': Customer.query.get(ticket.customer_id).name if ticket.customer_id else '',
-            'Agent': Agent.query.get(ticket.agent_id).name if ticket.agent_id else '',
-            'Particular': Particular.query.get(ticket.particular_id).name if ticket.particular_id else '',
-            'Travel Location': TravelLocation.query.get(ticket.travel_location_id).name if ticket.travel_location_id else '',
-            'Passenger': Passenger.query.get(ticket.passenger_id).name if ticket.passenger_id else '',
+            'Customer': names.customer_name or '',
+            'Agent': names.agent_name or '',
+            'Particular': reference_name(Particular, ticket.particular_id) or '',
+            'Travel Location': reference_name(TravelLocation, ticket.travel_location_id) or '',
+            'Passenger': names.passenger_name or '',
             'Customer Charge': ticket.customer_charge,
             'Agent Paid': ticket.agent_paid,
             'Profit': ticket.profit,
@@ -962,4 +984,212 @@ class TicketResource(Resource):
             )
             
         except Exception as e:
-            abort(500, f"PDF export failed: {str(e)}")
\ No newline at end of file
+            abort(500, f"PDF export failed: {str(e)}")
+
+class BulkTicketResource(TicketResource):
+    """Group bookings: every row is validated first, then all are booked in one transaction"""
+    methods = ['POST']
+
+    @check_permission()
+    @idempotent
+    def post(self):
+        data = request.json
+        rows = data.get('tickets') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not rows:
+            abort(400, "Provide a non-empty list of tickets")
+        if len(rows) > MAX_BULK_TICKETS:
+            abort(400, f"At most {MAX_BULK_TICKETS} tickets per request")
+
+        lookups = self._load_lookups(rows)
+        tickets, errors = [], []
+        for index, row in enumerate(rows):
+            try:
+                tickets.append(self._build_ticket(row, lookups))
+            except ValueError as e:
+                tickets.append(None)
+                errors.append({"row": index, "error": str(e)})
+        errors += self._check_funds(tickets, lookups)
+        if errors:
+            return {
+                "message": "No tickets booked",
+                "errors": sorted(errors, key=lambda e: e["row"])
+            }, 400
+
+        try:
+            ref_nos = iter(next_ref_nos('T', 5, sum(1 for t in tickets if not t.ref_no)))
+            for ticket in tickets:
+                ticket.ref_no = ticket.ref_no or next(ref_nos)
+            db.session.add_all(tickets)
+            db.session.flush()
+
+            # One wallet/credit update per customer and agent for the whole group
+            for (model, entity_id), amount in self._wallet_totals(tickets).items():
+                debit_wallet(
+                    lookups[model][entity_id],
+                    amount,
+                    "Insufficient customer credit" if model is Customer else "Insufficient agent credit"
+                )
+
+            # Company ledger rows for the whole group in one batch
+            entries = []
+            for ticket in tickets:
+                if entry := self._ticket_ledger_entry(ticket, 'book'):
+                    entries.append({
+                        'mode': entry[0],
+                        'amount': entry[1],
+                        'ref_no': ticket.ref_no,
+                        'transaction_type': 'ticket',
+                        'action': 'book',
+                        'updated_by': getattr(g, 'username', 'system')
+                    })
+            post_company_entries(entries)
+
+            results = [
+                {"row": index, "id": ticket.id, "ref_no": ticket.ref_no}
+                for index, ticket in enumerate(tickets)
+            ]
+            db.session.commit()
+        except InsufficientFunds as e:
+            # Balances moved between validation and booking
+            db.session.rollback()
+            abort(409, f"{e}, no tickets booked")
+        except IntegrityError:
+            db.session.rollback()
+            abort(409, "Reference number already exists")
+        except Exception as e:
+            db.session.rollback()
+            abort(500, f"Bulk booking failed: {str(e)}")
+
+        return {"message": f"{len(tickets)} tickets booked", "results": results}, 201
+
+    def _load_lookups(self, rows):
+        """Customers, agents, passengers and taken ref numbers for all rows, one query each"""
+        def ids(field):
+            found = set()
+            for row in rows:
+                try:
+                    found.add(_row_id(row, field))
+                except (ValueError, AttributeError):
+                    continue
+            found.discard(None)
+            return found
+
+        supplied_refs = {row.get('ref_no') for row in rows if isinstance(row, dict) and row.get('ref_no')}
+        return {
+            Customer: {c.id: c for c in Customer.query.filter(Customer.id.in_(ids('customer_id')))},
+            Agent: {a.id: a for a in Agent.query.filter(Agent.id.in_(ids('agent_id')))},
+            Passenger: {
+                pid for (pid,) in db.session.query(Passenger.id).filter(Passenger.id.in_(ids('passenger_id')))
+            },
+            'ref_nos': {
+                ref for (ref,) in db.session.query(Ticket.ref_no).filter(Ticket.ref_no.in_(supplied_refs))
+            },
+        }
+
+    def _build_ticket(self, row, lookups):
+        """Validated, unsaved Ticket for one row; raises ValueError with the reason"""
+        if not isinstance(row, dict):
+            raise ValueError("Each ticket must be an object")
+        required = ['customer_id', 'travel_location_id', 'customer_charge', 'customer_payment_mode']
+        if missing := [field for field in required if row.get(field) in (None, '')]:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+        customer_id = _row_id(row, 'customer_id')
+        if customer_id not in lookups[Customer]:
+            raise ValueError("Customer not found")
+        agent_id = _row_id(row, 'agent_id')
+        if agent_id is not None and agent_id not in lookups[Agent]:
+            raise ValueError("Agent not found")
+        travel_location_id = _row_id(row, 'travel_location_id')
+        if not reference_name(TravelLocation, travel_location_id):
+            raise ValueError("Travel location not found")
+        particular_id = _row_id(row, 'particular_id')
+        if particular_id is not None and not reference_name(Particular, particular_id):
+            raise ValueError("Particular not found")
+        passenger_id = _row_id(row, 'passenger_id')
+        if passenger_id is not None and passenger_id not in lookups[Passenger]:
+            raise ValueError("Passenger not found")
+
+        try:
+            customer_charge = float(row['customer_charge'])
+            agent_paid = float(row.get('agent_paid') or 0)
+        except (TypeError, ValueError):
+            raise ValueError("customer_charge and agent_paid must be numbers")
+
+        customer_mode = str(row['customer_payment_mode']).lower().strip()
+        agent_mode = str(row.get('agent_payment_mode') or 'cash').lower().strip()
+        if customer_mode not in PAYMENT_MODES:
+            raise ValueError(f"Invalid payment mode: {customer_mode}")
+        if agent_id and agent_paid > 0 and agent_mode not in PAYMENT_MODES:
+            raise ValueError(f"Invalid payment mode: {agent_mode}")
+
+        ticket_date = datetime.now()
+        if row.get('date'):
+            try:
+                ticket_date = datetime.strptime(row['date'], '%Y-%m-%d')
+            except (TypeError, ValueError):
+                raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+
+        ref_no = row.get('ref_no') or None
+        if ref_no:
+            if ref_no in lookups['ref_nos']:
+                raise ValueError("Reference number already exists")
+            lookups['ref_nos'].add(ref_no)
+
+        return Ticket(
+            customer_id=customer_id,
+            agent_id=agent_id,
+            travel_location_id=travel_location_id,
+            passenger_id=passenger_id,
+            ref_no=ref_no,
+            status='booked',
+            customer_charge=customer_charge,
+            agent_paid=agent_paid,
+            profit=customer_charge - agent_paid,
+            customer_payment_mode=customer_mode,
+            agent_payment_mode=agent_mode,
+            updated_by=getattr(g, 'username', 'system'),
+            date=ticket_date,
+            particular_id=particular_id
+        )
+
+    def _wallet_debits(self, ticket):
+        """(model, id, amount) wallet charges of one ticket"""
+        if ticket.customer_payment_mode == 'wallet':
+            yield Customer, ticket.customer_id, ticket.customer_charge
+        if ticket.agent_id and ticket.agent_paid > 0 and ticket.agent_payment_mode == 'wallet':
+            yield Agent, ticket.agent_id, ticket.agent_paid
+
+    def _wallet_totals(self, tickets):
+        totals = {}
+        for ticket in tickets:
+            for model, entity_id, amount in self._wallet_debits(ticket):
+                totals[(model, entity_id)] = totals.get((model, entity_id), 0) + amount
+        return totals
+
+    def _check_funds(self, tickets, lookups):
+        """Errors for the rows whose wallet charge no longer fits, in row order"""
+        errors, spent = [], {}
+        for index, ticket in enumerate(tickets):
+            if ticket is None:
+                continue
+            for model, entity_id, amount in self._wallet_debits(ticket):
+                key = (model, entity_id)
+                if spent.get(key, 0) + amount > available_funds(lookups[model][entity_id]):
+                    label = "customer" if model is Customer else "agent"
+                    errors.append({"row": index, "error": f"Insufficient {label} credit"})
+                    break
+            else:
+                for model, entity_id, amount in self._wallet_debits(ticket):
+                    spent[(model, entity_id)] = spent.get((model, entity_id), 0) + amount
+        return errors
+
+
+def _row_id(row, field):
+    value = row.get(field)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field}")
@@ -1,13 +1,21 @@
 from flask import request,g,send_file
 from flask_restful import Resource
 from applications.utils import check_permission
-from applications.model import db, Customer, Agent, Partner, Transaction ,Passenger, CompanyAccountBalance, Particular
-from datetime import datetime, timedelta
+from applications.idempotency import idempotent
+from applications.export_utils import stream_excel, EXPORT_CHUNK_SIZE
+from applications.sequences import next_ref_no, preview_ref_no
+from applications.entity_cache import get_cached
+from applications.wallets import debit_wallet, credit_wallet, adjust_wallet
+from applications.reference_cache import reference_name
+from applications.ledger import post_company_entry, get_company_balance, get_company_balance_as_of, LEDGER_MODES
+from applications.model import db, Customer, Agent, Partner, Transaction ,Passenger, Particular
+from sqlalchemy import update
+from datetime import date, datetime, time, timedelta
 from dateutil.parser import parse as parse_date
-import pandas as pd
 from io import BytesIO
 from fpdf import FPDF
 import re
+from itertools import islice
 
 TRANSACTION_TYPES = ['payment', 'receipt', 'refund', 'wallet_transfer']
 
@@ -29,30 +37,25 @@ def get_entity(entity_type, entity_id):
     if entity_id is None or entity_type == 'others':
         return None
     model = MODEL_MAP.get(entity_type)
-    return model.query.get(entity_id) if model else None
+    return get_cached(model, entity_id) if model else None
 
-def adjust_company_balance(mode, amount, direction='out', ref_no=None, transaction_type=None, action='add', updated_by='system'):
+def adjust_company_balance(mode, amount, direction='out', ref_no=None, transaction_type=None, action='add', updated_by='system', ledger=None):
+    """Post to the company ledger, or append the entry to `ledger` for post_company_entries()"""
     if not mode:
         raise ValueError("Missing mode for company balance adjustment.")
 
-    # NEW: Only allow specific modes
-    if mode not in ['cash', 'online']:
-        return  # Prevent creating invalid company balance rows
-
-    last = CompanyAccountBalance.query.filter_by(mode=mode).order_by(CompanyAccountBalance.id.desc()).first()
-    prev = last.balance if last else 0
+    # Only cash/online modes are tracked; others create no company balance rows
     delta = amount if direction == 'in' else -amount
-    new_balance = prev + delta
-
-    db.session.add(CompanyAccountBalance(
-        mode=mode,
-        credited_amount=delta,
-        balance=new_balance,
+    entry = dict(
         ref_no=ref_no,
         transaction_type=transaction_type,
         action=action,
         updated_by=updated_by
-    ))
+    )
+    if ledger is not None:
+        ledger.append({'mode': mode, 'amount': delta, **entry})
+    else:
+        post_company_entry(mode, delta, **entry)
 
 
 def get_entity_name(entity_type, entity_id):
@@ -64,17 +67,52 @@ def get_entity_name(entity_type, entity_id):
 def get_particular_name(particular_id):
     if not particular_id:
         return None
-    p = Particular.query.get(particular_id)
-    return p.name if p else None
+    return reference_name(Particular, particular_id)
+
+
+def resolve_names(transactions):
+    """
+    Names for every entity referenced by `transactions`, with one IN query
+    per entity type: {'customer': {id: name}, 'agent': {...}, 'partner': {...}}.
+    Particular names come from the reference cache.
+    """
+    ids = {}
+    for t in transactions:
+        if t.entity_id is not None and t.entity_type in MODEL_MAP:
+            ids.setdefault(t.entity_type, set()).add(t.entity_id)
+
+    names = {}
+    for kind, wanted in ids.items():
+        model = MODEL_MAP[kind]
+        names[kind] = dict(
+            db.session.query(model.id, model.name).filter(model.id.in_(wanted)).all()
+        )
+    return names
 
+def _with_names(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield (transaction, names) pairs, resolving names one chunk at a time"""
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        names = resolve_names(chunk)
+        for t in chunk:
+            yield t, names
+
+def get_transaction_payload(t: Transaction, names=None):
+    """
+    Serialize a transaction. `names` is a resolve_names() map for list
+    endpoints; without it the names are looked up one query at a time.
+    """
+    if names is None:
+        entity_name = get_entity_name(t.entity_type, t.entity_id)
+    else:
+        entity_name = names.get(t.entity_type, {}).get(t.entity_id)
 
-def get_transaction_payload(t: Transaction):
     payload = {
         "id": t.id,
         "ref_no": t.ref_no,
         "entity_type": t.entity_type,
         "entity_id": t.entity_id,
-        "entity_name": get_entity_name(t.entity_type, t.entity_id),
+        "entity_name": entity_name,
         "transaction_type": t.transaction_type,
         "pay_type": t.pay_type,
         "mode": t.mode,
@@ -105,24 +143,13 @@ def get_transaction_payload(t: Transaction):
     return payload
 
 def generate_ref_no(transaction_type):
-    """Generate unique reference number for transaction"""
-    year = datetime.now().year
-    prefix = REF_NO_PREFIXES.get(transaction_type, 'T')
-    
-    last_trans = Transaction.query.filter(
-        Transaction.ref_no.like(f"{year}/{prefix}/%")
-    ).order_by(Transaction.ref_no.desc()).first()
-    
-    if last_trans:
-        try:
-            last_seq = int(last_trans.ref_no.split('/')[-1])
-        except (ValueError, IndexError):
-            last_seq = 0
-        seq = last_seq + 1
-    else:
-        seq = 1
+    """Allocate the next unique reference number for a transaction"""
+    return next_ref_no(REF_NO_PREFIXES.get(transaction_type, 'T'), width=4)
+
+def preview_transaction_ref_no(transaction_type):
+    """Reference number the next transaction will most likely get, for forms"""
+    return preview_ref_no(REF_NO_PREFIXES.get(transaction_type, 'T'), width=4)
 
-    return f"{year}/{prefix}/{seq:04d}"
 def apply_credit_wallet_logic(entity, amount, entity_type, mode='deduct'):
     """Apply wallet/credit logic based on entity type
     
@@ -131,45 +158,20 @@ def apply_credit_wallet_logic(entity, amount, entity_type, mode='deduct'):
         amount: The amount to process
         entity_type: Type of entity ('customer', 'agent', 'partner')
         mode: 'deduct' or 'revert' the amount
+
+    The balance check and update run as one atomic UPDATE (see wallets.py).
     """
-    if entity_type == 'customer':
-        if mode == 'deduct':
-            wallet = entity.wallet_balance
-            credit_available = entity.credit_limit - entity.credit_used
-            if wallet + credit_available < amount:
-                raise ValueError("Insufficient funds")
-            # Deduct from wallet first, then credit
-            deduct_wallet = min(wallet, amount)
-            entity.wallet_balance -= deduct_wallet
-            entity.credit_used += (amount - deduct_wallet)
-        elif mode == 'revert':
-            # First reduce credit used, then add to wallet
-            repay_credit = min(entity.credit_used, amount)
-            entity.credit_used -= repay_credit
-            entity.wallet_balance += (amount - repay_credit)
-            
-    elif entity_type == 'agent':
-        if mode == 'deduct':
-            if entity.wallet_balance + entity.credit_balance < amount:
-                raise ValueError("Insufficient funds")
-            # Deduct from wallet first, then credit balance
-            deduct_wallet = min(entity.wallet_balance, amount)
-            entity.wallet_balance -= deduct_wallet
-            entity.credit_balance -= (amount - deduct_wallet)
-        elif mode == 'revert':
-            # First fill credit balance deficit, then add to wallet
-            credit_deficit = entity.credit_limit - entity.credit_balance
-            repay_credit = min(credit_deficit, amount)
-            entity.credit_balance += repay_credit
-            entity.wallet_balance += (amount - repay_credit)
-            
-    elif entity_type == 'partner':
-        if mode == 'deduct':
-            if not entity.allow_negative_wallet and entity.wallet_balance < amount:
-                raise ValueError("Insufficient wallet balance")
-            entity.wallet_balance -= amount
-        elif mode == 'revert':
-            entity.wallet_balance += amount
+    if entity_type not in ('customer', 'agent', 'partner'):
+        return
+    if mode == 'deduct':
+        debit_wallet(
+            entity,
+            amount,
+            "Insufficient wallet balance" if entity_type == 'partner' else "Insufficient funds"
+        )
+    elif mode == 'revert':
+        # Credit is repaid first, the remainder goes to the wallet
+        credit_wallet(entity, amount)
 
 def apply_company_adjustment(transaction, direction):
     adjust_company_balance(transaction.mode, transaction.amount, direction)
@@ -181,6 +183,36 @@ def parse_transaction_date(raw_date):
         return parse_date(raw_date)
     return datetime.now()
 
+def flags_from_extra(extra):
+    """Flag column values carried in a transaction's extra_data"""
+    extra = extra or {}
+    return {
+        'deduct_from_account': extra.get('deduct_from_account') is True,
+        'credit_to_account': extra.get('credit_to_account') is True,
+        'refund_direction': extra.get('refund_direction') or None,
+        'company_adjusted': extra.get('company_adjusted') is True
+    }
+
+def sync_flag_columns(transaction):
+    """Copy the request flags from extra_data onto their columns"""
+    flags = flags_from_extra(transaction.extra_data)
+    transaction.deduct_from_account = flags['deduct_from_account']
+    transaction.credit_to_account = flags['credit_to_account']
+    transaction.refund_direction = flags['refund_direction']
+
+def backfill_flag_columns():
+    """One-time copy of extra_data flags into the flag columns of existing rows"""
+    updates = []
+    rows = db.session.query(Transaction.id, Transaction.extra_data).yield_per(EXPORT_CHUNK_SIZE)
+    for transaction_id, extra in rows:
+        flags = flags_from_extra(extra)
+        if any(flags.values()):
+            updates.append({'id': transaction_id, **flags})
+    if updates:
+        db.session.execute(update(Transaction), updates)
+    db.session.commit()
+    return len(updates)
+
 def process_wallet_transfer(transaction):
     """Apply wallet-to-wallet transfer between entities with credit and wallet logic"""
     extra = transaction.extra_data or {}
@@ -221,7 +253,12 @@ def process_wallet_transfer(transaction):
     db.session.add(from_entity)
     db.session.add(to_entity)
 
-def update_wallet_and_company(transaction):
+def update_wallet_and_company(transaction, ledger=None):
+    """
+    Apply a new transaction to entity wallets and the company ledger. Bulk
+    callers pass a `ledger` list to collect the company entries and post
+    them in one batch.
+    """
     etype = transaction.entity_type
     ttype = transaction.transaction_type
     pay_type = transaction.pay_type
@@ -240,9 +277,11 @@ def update_wallet_and_company(transaction):
             ref_no=ref_no,
             transaction_type=ttype,
             action=action,
-            updated_by=updated_by
+            updated_by=updated_by,
+            ledger=ledger
         )
         transaction.extra_data["company_adjusted"] = True
+        transaction.company_adjusted = True
 
     if ttype == 'payment':
         entity = get_entity(etype, transaction.entity_id)
@@ -281,7 +320,7 @@ def update_wallet_and_company(transaction):
             
         elif etype == 'partner':
             if pay_type == 'cash_deposit' or (pay_type == 'other_receipt' and extra.get('credit_to_account')):
-                entity.wallet_balance += amount
+                adjust_wallet(entity, amount)
                 transaction.extra_data["credited_entity"] = True
             log_company(transaction.mode, direction='in')
             
@@ -412,10 +451,11 @@ def revert_wallet_and_company(transaction):
             
             db.session.add(entity)
 
-        if extra.get("company_adjusted"):
+        if transaction.company_adjusted:
             # Reverse company adjustment
             direction = 'out' if ttype == 'payment' else 'in'
             log_company(mode, direction)
+            transaction.company_adjusted = False
 
     elif ttype == 'wallet_transfer':
         from_entity = get_entity(extra.get('from_entity_type'), extra.get('from_entity_id'))
@@ -465,7 +505,7 @@ class TransactionResource(Resource):
             return {'error': 'Invalid transaction type'}, 400
         
         if request.args.get('mode') == 'form':
-            return {'ref_no': generate_ref_no(transaction_type)}, 200
+            return {'ref_no': preview_transaction_ref_no(transaction_type)}, 200
         # Handle exports
         export_format = request.args.get('export')
         if export_format in ['excel', 'pdf']:
@@ -486,9 +526,11 @@ class TransactionResource(Resource):
                 return {'error': 'Invalid date format. Use YYYY-MM-DD.'}, 400
         
         transactions = query.all()
-        return {"transactions": [get_transaction_payload(t) for t in transactions]}, 200
+        names = resolve_names(transactions)
+        return {"transactions": [get_transaction_payload(t, names) for t in transactions]}, 200
 
     @check_permission()
+    @idempotent
     def post(self, transaction_type):
         """Create new transaction"""
         if transaction_type not in TRANSACTION_TYPES:
@@ -556,6 +598,7 @@ class TransactionResource(Resource):
                     'mode_for_to': data.get('mode_for_to'),
                 }.items()
             }
+            sync_flag_columns(t)
             
             # Update wallets and company accounts
             update_wallet_and_company(t)
@@ -670,6 +713,8 @@ class TransactionResource(Resource):
                 t.pay_type = data.get('pay_type')
                 t.mode = data.get('mode')
 
+            sync_flag_columns(t)
+
             # Re-apply updated transaction logic
             if amount_changed or entities_changed or mode_changed:
                 if t.transaction_type == 'wallet_transfer':
@@ -751,17 +796,19 @@ class TransactionResource(Resource):
             except ValueError:
                 return {'error': 'Invalid date format. Use YYYY-MM-DD.'}, 400
         
-        transactions = query.all()
-        data = [self._format_transaction_for_export(t) for t in transactions]
-        
         if format_type == 'excel':
-            return self.export_excel(data, transaction_type)
+            rows = query.order_by(Transaction.date, Transaction.id).yield_per(EXPORT_CHUNK_SIZE)
+            return self.export_excel(
+                (self._format_transaction_for_export(t, names) for t, names in _with_names(rows)),
+                transaction_type
+            )
         elif format_type == 'pdf':
+            data = [self._format_transaction_for_export(t, names) for t, names in _with_names(query.all())]
             return self.export_pdf(data, transaction_type)
         else:
             return {'error': 'Invalid export format'}, 400
 
-    def _format_transaction_for_export(self, transaction):
+    def _format_transaction_for_export(self, transaction, names):
         base_data = {
             "Reference No": transaction.ref_no,
             "Date": transaction.date.strftime('%Y-%m-%d') if transaction.date else '',
@@ -776,7 +823,7 @@ class TransactionResource(Resource):
         if transaction.transaction_type != 'wallet_transfer':
             base_data.update({
                 "Entity Type": transaction.entity_type.capitalize() if transaction.entity_type else '',
-                "Entity Name": get_entity_name(transaction.entity_type, transaction.entity_id),
+                "Entity Name": names.get(transaction.entity_type, {}).get(transaction.entity_id),
             })
         
         # Add wallet transfer specific fields
@@ -799,55 +846,29 @@ class TransactionResource(Resource):
         return base_data
 
     def export_excel(self, data, transaction_type):
-        try:          
-            if not data:
-                return {'error': 'No data to export'}, 404
-                
-            df = pd.DataFrame(data)
-            
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                # Create valid sheet name
-                sheet_name = transaction_type
-                # Remove invalid characters
-                sheet_name = re.sub(r'[\\/*?:[\]]', '', sheet_name)
-                # Truncate if too long
-                if len(sheet_name) > 31:
-                    sheet_name = sheet_name[:31]
-                
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                workbook = writer.book
-                worksheet = writer.sheets[sheet_name]  # Use dynamic sheet name
-                
-                header_format = workbook.add_format({
+        """Stream transactions into a workbook; `data` may be any iterable of export rows"""
+        # Create valid sheet name: remove invalid characters, truncate if too long
+        sheet_name = re.sub(r'[\\/*?:[\]]', '', transaction_type)[:31]
+
+        try:
+            response = stream_excel(
+                data,
+                sheet_name=sheet_name,
+                download_name=f'{transaction_type}_transactions_{datetime.now().strftime("%Y%m%d")}.xlsx',
+                header_format={
                     'bold': True, 
                     'border': 1,
                     'bg_color': '#4472C4',
                     'font_color': 'white'
-                })
-                
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                
-                # Auto-adjust column widths
-                for idx, col in enumerate(df.columns):
-                    max_len = max(
-                        df[col].astype(str).map(len).max(),
-                        len(col)
-                    ) + 2
-                    worksheet.set_column(idx, idx, max_len)
-                    
-            output.seek(0)
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'{transaction_type}_transactions_{datetime.now().strftime("%Y%m%d")}.xlsx'
+                }
             )
         except Exception as e:
             return {'error': f'Excel export failed: {str(e)}'}, 500
 
+        if response is None:
+            return {'error': 'No data to export'}, 404
+        return response
+
     def export_pdf(self, data, transaction_type):
         try:
             pdf = FPDF(orientation='L', unit='mm', format='A4')
@@ -952,8 +973,37 @@ class TransactionResource(Resource):
             return {'error': f'PDF export failed: {str(e)}'}, 500
 
 class CompanyBalanceResource(Resource):
+    """
+    GET /api/company_balance/<mode>                  - current balance
+    GET /api/company_balance/<mode>?as_of=2024-03-31 - balance at the end of that day (or at a given datetime)
+    """
+
+    @staticmethod
+    def _parse_as_of(raw):
+        """
+        The naive local datetime the ledger stores. A date without a time
+        means the end of that day; a value with a UTC offset is converted.
+        """
+        raw = raw.strip()
+        try:
+            return datetime.combine(date.fromisoformat(raw), time.max)
+        except ValueError:
+            pass
+        as_of = parse_date(raw)
+        if as_of.tzinfo is not None:
+            as_of = as_of.astimezone().replace(tzinfo=None)
+        return as_of
+
     @check_permission()
     def get(self, mode):
-        last = CompanyAccountBalance.query.filter_by(mode=mode).order_by(CompanyAccountBalance.id.desc()).first()
-        balance = last.balance if last else 0.0
-        return {"mode": mode, "balance": balance}, 200
+        raw = request.args.get('as_of')
+        if not raw:
+            balance = get_company_balance(mode) if mode in LEDGER_MODES else 0.0
+            return {"mode": mode, "balance": balance}, 200
+
+        try:
+            as_of = self._parse_as_of(raw)
+        except (ValueError, OverflowError):
+            return {"error": "Invalid as_of date"}, 400
+        balance = get_company_balance_as_of(mode, as_of) if mode in LEDGER_MODES else 0.0
+        return {"mode": mode, "balance": balance, "as_of": as_of.isoformat()}, 200
@@ -2,6 +2,7 @@ from flask import request,abort
 from flask_restful import Resource
 from applications.model import db, User, Permission, Role, Page,role_permissions, user_permissions
 from applications.utils import check_permission, get_user_payload
+from applications.permissions import bump_permissions_version
 from applications.validation_utils import validate_user_data, validate_password,create_existing_cache
 from sqlalchemy import func, case
 from sqlalchemy.orm import joinedload,aliased
@@ -48,6 +49,8 @@ class UserAPI(Resource):
             )
             user.set_password(data['password'])
             db.session.add(user)
+            # A new user may get a deleted user's id, and with it their cached permissions
+            bump_permissions_version()
             db.session.commit()
             return get_user_payload(user), 201
         except Exception as e:
@@ -89,6 +92,7 @@ class UserAPI(Resource):
     def delete(self, user_id):
         user = User.query.get_or_404(user_id)
         db.session.delete(user)
+        bump_permissions_version()
         db.session.commit()
         return {'message': 'User deleted'}, 200
 
@@ -178,6 +182,7 @@ class UserPermissionAPI(Resource):
         existing_perms = [p for p in user.permissions if all(p.page_id != np.page_id for np in updated_perms)]
         user.permissions = existing_perms + updated_perms
         user.session_version += 1
+        bump_permissions_version()
         db.session.commit()
 
         return {
@@ -199,6 +204,7 @@ class UserPermissionAPI(Resource):
             p for p in user.permissions
             if p.page_id not in page_ids
         ]
+        bump_permissions_version()
         db.session.commit()
         return {"deleted": page_ids}, 200
 
@@ -377,7 +383,8 @@ class BulkDeleteAPI(Resource):
             
             if delete_count == 0:
                 abort(404, "No users found for deletion")
-                
+
+            bump_permissions_version()
             db.session.commit()
             
             return {
@@ -492,6 +499,7 @@ class BulkUserCreateAPI(Resource):
 
         try:
             db.session.bulk_save_objects(new_users)
+            bump_permissions_version()
             db.session.commit()
             return {
                 "message": f"Successfully created {len(new_users)} users",
@@ -585,10 +593,7 @@ class CurrentUserAPI(Resource):
     @jwt_required()
     def get(self):
         uid = get_jwt_identity()
-        user = User.query.options(
-            joinedload(User.role).joinedload(Role.permissions).joinedload(Permission.page),
-            joinedload(User.permissions).joinedload(Permission.page)
-        ).get(uid)
+        user = User.query.options(joinedload(User.role)).get(uid)
         
         if not user:
             abort(404, description="User not found")
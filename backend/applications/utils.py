@@ -2,6 +2,7 @@ from functools import wraps
 from flask import abort,request
 from flask_jwt_extended import jwt_required, get_jwt
 from applications.model import User
+from applications.permissions import effective_permissions
 
 from flask import request, abort, g
 from functools import wraps
@@ -55,7 +56,7 @@ def require_admin(fn):
     return wrapper
 def get_perms_for_audit(user_id):
     user = User.get(user_id)
-    return user.effective_permissions
+    return effective_permissions(user)
 def serialize_entity(entity):
     return {col.name: getattr(entity, col.name) for col in entity.__table__.columns}
 
@@ -73,7 +74,7 @@ def get_user_payload(user):
             "id": user.role.id,
             "name": user.role.name
         } if user.role else None,
-        "perms": user.effective_permissions,
+        "perms": effective_permissions(user),
         "session_version": user.session_version,
         "is_admin": user.is_admin
     }
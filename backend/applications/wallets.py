@@ -0,0 +1,123 @@
+# applications/wallets.py
+from sqlalchemy import case, inspect, or_, select
+
+from applications.model import db, Customer, Agent, Partner
+from applications.rollups import BALANCE_WATCHED, apply_balance_change
+
+# Balance columns each entity type carries
+BALANCE_COLUMNS = {
+    Customer: ('wallet_balance', 'credit_used'),
+    Agent: ('wallet_balance', 'credit_balance'),
+    Partner: ('wallet_balance',),
+}
+
+
+class InsufficientFunds(ValueError):
+    """The wallet plus available credit can't cover a debit"""
+
+
+def debit_wallet(entity, amount, error="Insufficient funds"):
+    """
+    Take `amount` from the entity's wallet first, then from its credit.
+
+    The funds check and the write are a single conditional UPDATE computed
+    from the row's current values, so the row is write-locked from the check
+    until commit and two concurrent debits can never both spend the same
+    balance. Raises InsufficientFunds(error) when the check fails.
+    """
+    model = type(entity)
+    c = model.__table__.c
+    covered = c.wallet_balance >= amount
+
+    if model is Partner:
+        values = {'wallet_balance': c.wallet_balance - amount}
+        guard = or_(c.allow_negative_wallet == True, covered)
+    else:
+        shortfall = case((covered, 0), else_=amount - c.wallet_balance)
+        values = {'wallet_balance': case((covered, c.wallet_balance - amount), else_=0)}
+        if model is Customer:
+            values['credit_used'] = c.credit_used + shortfall
+            guard = or_(covered, c.wallet_balance + c.credit_limit - c.credit_used >= amount)
+        else:
+            values['credit_balance'] = c.credit_balance - shortfall
+            guard = or_(covered, c.wallet_balance + c.credit_balance >= amount)
+
+    if not _update(entity, values, guard):
+        raise InsufficientFunds(error)
+
+
+def credit_wallet(entity, amount):
+    """
+    Give `amount` back to the entity: outstanding credit is repaid first,
+    the remainder goes to the wallet. Atomic like debit_wallet.
+    """
+    model = type(entity)
+    c = model.__table__.c
+
+    if model is Partner:
+        values = {'wallet_balance': c.wallet_balance + amount}
+    elif model is Customer:
+        repay = case((c.credit_used < amount, c.credit_used), else_=amount)
+        values = {
+            'credit_used': c.credit_used - repay,
+            'wallet_balance': c.wallet_balance + amount - repay,
+        }
+    else:
+        deficit = c.credit_limit - c.credit_balance
+        repay = case((deficit < amount, deficit), else_=amount)
+        values = {
+            'credit_balance': c.credit_balance + repay,
+            'wallet_balance': c.wallet_balance + amount - repay,
+        }
+    _update(entity, values)
+
+
+def adjust_wallet(entity, amount):
+    """Add a signed amount straight to the wallet, bypassing credit"""
+    c = type(entity).__table__.c
+    _update(entity, {'wallet_balance': c.wallet_balance + amount})
+
+
+def available_funds(entity):
+    """Wallet plus unused credit: the most debit_wallet would take right now"""
+    if isinstance(entity, Customer):
+        return entity.wallet_balance + entity.credit_limit - entity.credit_used
+    if isinstance(entity, Agent):
+        return entity.wallet_balance + entity.credit_balance
+    if entity.allow_negative_wallet:
+        return float('inf')
+    return entity.wallet_balance
+
+
+def _update(entity, values, guard=None):
+    model = type(entity)
+    table = model.__table__
+
+    # Pending in-memory balance changes must reach the row before it is
+    # updated from its own values, or the next flush would overwrite ours
+    state = inspect(entity)
+    if any(state.attrs[name].history.has_changes() for name in BALANCE_COLUMNS[model]):
+        db.session.flush()
+
+    # The row as it is before the update, for the balance_summary delta
+    watched = [table.c[name] for name in BALANCE_WATCHED[model]]
+    row_filter = table.c.id == entity.id
+    before = db.session.execute(select(*watched).where(row_filter).with_for_update()).one()
+
+    stmt = table.update().where(row_filter).values(values)
+    if guard is not None:
+        stmt = stmt.where(guard)
+    if db.session.get_bind().dialect.update_returning:
+        after = db.session.execute(stmt.returning(*watched)).one_or_none()
+    elif db.session.execute(stmt).rowcount:
+        after = db.session.execute(select(*watched).where(row_filter)).one()
+    else:
+        after = None
+    if after is None:
+        return False
+
+    apply_balance_change(model, before._asdict(), after._asdict())
+
+    # Reload the new balances on next access
+    db.session.expire(entity, list(values))
+    return True
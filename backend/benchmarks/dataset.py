@@ -0,0 +1,273 @@
+# benchmarks/dataset.py
+"""
+Seeded synthetic dataset for the load benchmarks.
+
+Rows are bulk inserted through the model tables with distributions shaped
+like a real agency: a few customers and destinations account for most of
+the bookings, charges are log-normal, volume grows over time, ~12% of
+tickets are cancelled and cash/online/wallet are mixed. The same seed
+always produces the same dataset.
+"""
+import math
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from applications.model import (
+    db, Customer, Agent, Partner, Passenger, Particular, TravelLocation,
+    Ticket, Service, Transaction, CompanyAccountBalance, RefNoSequence
+)
+from applications.ledger import verify_balance_heads
+from applications.rollups import rebuild_daily_financials
+from applications.sequences import seed_ref_sequences
+
+CHUNK = 20_000
+MODES = ('cash', 'online', 'wallet')
+MODE_WEIGHTS = (45, 40, 15)
+PARTICULARS = ('Air', 'Visa', 'Hotel', 'Insurance', 'Umrah', 'Holiday', 'Bus', 'Rail')
+ENTITY_NAMES = {'customer': "Customer {:05d}", 'agent': "Agent {:04d}", 'partner': "Partner {:03d}"}
+
+# Row counts at --scale 1
+BASE_SIZES = {
+    'customers': 5_000,
+    'agents': 300,
+    'partners': 50,
+    'passengers': 50_000,
+    'travel_locations': 120,
+    'tickets': 1_000_000,
+    'services': 250_000,
+    'transactions': 1_000_000,
+    'ledger': 1_000_000,
+}
+
+# (transaction_type, pay_type, weight)
+TRANSACTION_MIX = (
+    ('receipt', 'cash_deposit', 30),
+    ('receipt', 'other_receipt', 15),
+    ('payment', 'other_expense', 25),
+    ('payment', 'cash_withdrawal', 10),
+    ('payment', 'cash_deposit', 5),
+    ('refund', 'refund', 10),
+    ('wallet_transfer', 'wallet_transfer', 5),
+)
+
+
+def sizes_for(scale):
+    return {name: max(1, int(count * scale)) for name, count in BASE_SIZES.items()}
+
+
+class Picker:
+    """Weighted choice with precomputed cumulative weights"""
+
+    def __init__(self, values, weights):
+        self.values = list(values)
+        self.cum_weights = list(accumulate(weights))
+
+    def __call__(self, rng):
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+def zipf(values, exponent=1.1):
+    """Popularity skew: the n-th value is picked ~1/n^exponent as often as the first"""
+    return Picker(values, [1 / (rank ** exponent) for rank in range(1, len(values) + 1)])
+
+
+def growing_dates(rng, count, start, days):
+    """Sorted dates, busier towards the end of the range (volume grows over time)"""
+    span = days * 86400
+    return sorted(start + timedelta(seconds=int(span * math.sqrt(rng.random()))) for _ in range(count))
+
+
+def charge(rng, median=350.0, sigma=0.6):
+    return round(rng.lognormvariate(math.log(median), sigma), 2)
+
+
+def seed_dataset(scale=1.0, days=3 * 365, seed=42, log=print):
+    """Fill an empty schema; returns the row counts"""
+    rng = random.Random(seed)
+    sizes = sizes_for(scale)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+
+    def insert(model, rows, total):
+        table = model.__table__
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == CHUNK:
+                db.session.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(table.insert(), batch)
+        db.session.commit()
+        log(f"  seeded {total:,} {table.name} rows")
+
+    # ----- reference data and entities -----
+    insert(Particular, ({'name': name, 'active': True} for name in PARTICULARS), len(PARTICULARS))
+    insert(TravelLocation, (
+        {'name': f"Destination {i:03d}", 'active': True} for i in range(1, sizes['travel_locations'] + 1)
+    ), sizes['travel_locations'])
+    insert(Customer, ({
+        'name': ENTITY_NAMES['customer'].format(i), 'contact': f"+9715{i:07d}", 'active': True,
+        'wallet_balance': round(rng.uniform(0, 20_000), 2),
+        'credit_limit': rng.choice((0.0, 5_000.0, 20_000.0, 100_000.0)),
+        'credit_used': 0.0,
+    } for i in range(1, sizes['customers'] + 1)), sizes['customers'])
+    insert(Agent, ({
+        'name': ENTITY_NAMES['agent'].format(i), 'active': True,
+        'wallet_balance': round(rng.uniform(0, 50_000), 2),
+        'credit_limit': 100_000.0, 'credit_balance': 100_000.0,
+    } for i in range(1, sizes['agents'] + 1)), sizes['agents'])
+    insert(Partner, ({
+        'name': ENTITY_NAMES['partner'].format(i), 'active': True,
+        'wallet_balance': round(rng.uniform(0, 10_000), 2), 'allow_negative_wallet': i % 5 == 0,
+    } for i in range(1, sizes['partners'] + 1)), sizes['partners'])
+    insert(Passenger, ({
+        'name': f"Passenger {i:06d}", 'passport_number': f"P{i:08d}", 'active': True,
+        'customer_id': 1 + (i * 7919) % sizes['customers'],
+    } for i in range(1, sizes['passengers'] + 1)), sizes['passengers'])
+
+    customers = zipf(range(1, sizes['customers'] + 1))
+    agents = zipf(range(1, sizes['agents'] + 1), exponent=0.9)
+    locations = zipf(range(1, sizes['travel_locations'] + 1))
+    particulars = zipf(range(1, len(PARTICULARS) + 1), exponent=1.5)
+    modes = Picker(MODES, MODE_WEIGHTS)
+
+    def ref_numbers(prefix, dates, width):
+        counters = {}
+        for d in dates:
+            counters[d.year] = counters.get(d.year, 0) + 1
+            yield f"{d.year}/{prefix}/{counters[d.year]:0{width}d}"
+
+    # ----- tickets -----
+    dates = growing_dates(rng, sizes['tickets'], start, days)
+
+    def tickets():
+        for d, ref_no in zip(dates, ref_numbers('T', dates, 5)):
+            customer_charge = charge(rng)
+            agent_paid = round(customer_charge * rng.uniform(0.75, 0.95), 2)
+            row = {
+                'customer_id': customers(rng), 'agent_id': agents(rng),
+                'travel_location_id': locations(rng), 'particular_id': particulars(rng),
+                'passenger_id': rng.randint(1, sizes['passengers']),
+                'status': 'booked', 'date': d, 'ref_no': ref_no,
+                'customer_charge': customer_charge, 'agent_paid': agent_paid,
+                'profit': round(customer_charge - agent_paid, 2),
+                'customer_payment_mode': modes(rng), 'agent_payment_mode': modes(rng),
+                'customer_refund_amount': 0.0, 'customer_refund_mode': None,
+                'agent_recovery_amount': 0.0, 'agent_recovery_mode': None,
+                'created_at': d, 'updated_at': None, 'updated_by': 'bench',
+            }
+            if rng.random() < 0.12:
+                row.update(
+                    status='cancelled', updated_at=d + timedelta(days=rng.randint(1, 20)),
+                    customer_refund_amount=round(customer_charge * 0.8, 2), customer_refund_mode=modes(rng),
+                    agent_recovery_amount=round(agent_paid * 0.8, 2), agent_recovery_mode=modes(rng),
+                )
+            yield row
+    insert(Ticket, tickets(), sizes['tickets'])
+
+    # ----- services -----
+    dates = growing_dates(rng, sizes['services'], start, days)
+
+    def services():
+        for d, ref_no in zip(dates, ref_numbers('S', dates, 5)):
+            cancelled = rng.random() < 0.08
+            customer_charge = charge(rng, median=120.0)
+            yield {
+                'customer_id': customers(rng), 'particular_id': particulars(rng),
+                'date': d, 'ref_no': ref_no, 'status': 'cancelled' if cancelled else 'booked',
+                'customer_charge': customer_charge, 'customer_payment_mode': modes(rng),
+                'customer_refund_amount': round(customer_charge * 0.5, 2) if cancelled else 0.0,
+                'customer_refund_mode': modes(rng) if cancelled else None,
+                'created_at': d, 'updated_by': 'bench',
+            }
+    insert(Service, services(), sizes['services'])
+
+    # ----- transactions -----
+    dates = growing_dates(rng, sizes['transactions'], start, days)
+    kinds = Picker([(t, p) for t, p, _ in TRANSACTION_MIX], [w for _, _, w in TRANSACTION_MIX])
+    entity_types = Picker(('customer', 'agent', 'partner', 'others'), (60, 25, 5, 10))
+    transfer_types = Picker(('customer', 'agent', 'partner'), (60, 30, 10))
+    entity_ids = {
+        'customer': customers,
+        'agent': agents,
+        'partner': zipf(range(1, sizes['partners'] + 1)),
+    }
+    prefixes = {'payment': 'P', 'receipt': 'R', 'refund': 'E', 'wallet_transfer': 'WT'}
+    counters = {}
+
+    def transfer(amount):
+        """extra_data of a wallet transfer as TransactionResource writes it"""
+        sender = receiver = None
+        while sender == receiver:
+            sender, receiver = [(kind, entity_ids[kind](rng)) for kind in (transfer_types(rng), transfer_types(rng))]
+        extra = {}
+        for side, (kind, entity_id) in (('from', sender), ('to', receiver)):
+            extra.update({
+                f'{side}_entity_type': kind, f'{side}_entity_id': entity_id,
+                f'{side}_entity_name': ENTITY_NAMES[kind].format(entity_id),
+            })
+        extra.update(from_wallet_deducted=amount, from_credit_used=0, to_credit_repaid=0, to_wallet_added=amount)
+        return extra
+
+    def transactions():
+        for d in dates:
+            ttype, pay_type = kinds(rng)
+            key = (d.year, prefixes[ttype])
+            counters[key] = counters.get(key, 0) + 1
+            amount = charge(rng, median=500.0, sigma=0.9)
+            row = {
+                'ref_no': f"{d.year}/{prefixes[ttype]}/{counters[key]:04d}",
+                'transaction_type': ttype, 'pay_type': pay_type, 'amount': amount, 'date': d,
+                'particular_id': particulars(rng) if rng.random() < 0.3 else None,
+                'updated_by': 'bench',
+            }
+            if ttype == 'wallet_transfer':
+                # Between two entities' wallets; the company accounts are not touched
+                row.update(
+                    entity_type='wallet_transfer', entity_id=None, mode='wallet', extra_data=transfer(amount),
+                    deduct_from_account=False, credit_to_account=False, refund_direction=None, company_adjusted=False,
+                )
+                yield row
+                continue
+
+            entity_type = entity_types(rng)
+            deduct = pay_type == 'other_expense' and rng.random() < 0.3
+            credit = pay_type == 'other_receipt' and rng.random() < 0.5
+            row.update(
+                entity_type=entity_type,
+                entity_id=None if entity_type == 'others' else entity_ids[entity_type](rng),
+                mode=rng.choice(('cash', 'online')),
+                extra_data={'deduct_from_account': deduct, 'credit_to_account': credit},
+                deduct_from_account=deduct, credit_to_account=credit,
+                refund_direction=rng.choice(('incoming', 'outgoing')) if ttype == 'refund' else None,
+                company_adjusted=True,
+            )
+            yield row
+    insert(Transaction, transactions(), sizes['transactions'])
+
+    # ----- company ledger, appended in time order with running balances -----
+    dates = growing_dates(rng, sizes['ledger'], start, days)
+    balances = {'cash': 0.0, 'online': 0.0}
+
+    def ledger():
+        for i, d in enumerate(dates):
+            mode = 'cash' if rng.random() < 0.55 else 'online'
+            amount = charge(rng, median=300.0) * (1 if rng.random() < 0.62 else -1)
+            balances[mode] = round(balances[mode] + amount, 2)
+            yield {
+                'mode': mode, 'credited_amount': amount, 'credited_date': d,
+                'balance': balances[mode], 'posted_at': d, 'ref_no': f"{d.year}/T/{1 + i % 99_999:05d}",
+                'transaction_type': rng.choice(('ticket', 'service', 'receipt', 'payment')),
+                'action': 'add', 'updated_by': 'bench', 'updated_at': d,
+            }
+    insert(CompanyAccountBalance, ledger(), sizes['ledger'])
+
+    # ----- derived state the app keeps alongside the raw rows -----
+    verify_balance_heads(fix=True)
+    log(f"  rebuilt daily_financials: {rebuild_daily_financials():,} rows")
+    RefNoSequence.query.delete()
+    seed_ref_sequences()
+
+    return {**sizes, 'particulars': len(PARTICULARS)}
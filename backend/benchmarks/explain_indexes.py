@@ -0,0 +1,174 @@
+# benchmarks/explain_indexes.py
+"""
+Show the query plans of the hot listing/dashboard/ledger queries with and
+without the composite indexes declared in applications/model.py.
+
+Seeds a throwaway SQLite database (1M rows per table by default), drops the
+ix_* indexes, prints EXPLAIN QUERY PLAN and timings, then creates the
+indexes again and repeats.
+
+    cd backend
+    python -m benchmarks.explain_indexes --rows 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func, text
+
+from applications.model import db, Ticket, Service, Transaction, CompanyAccountBalance
+
+CHUNK = 50_000
+MODES = ('cash', 'online')
+# The types TransactionResource writes
+TRANSACTION_TYPES = ('payment', 'receipt', 'refund', 'wallet_transfer')
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def random_dates(n, start, days):
+    span = days * 86400
+    for _ in range(n):
+        yield start + timedelta(seconds=random.randrange(span))
+
+
+def seed(rows, start, days):
+    """Bulk insert `rows` tickets, services, transactions and ledger rows"""
+    def insert(model, make_row):
+        table = model.__table__
+        for offset in range(0, rows, CHUNK):
+            count = min(CHUNK, rows - offset)
+            batch = [make_row(offset + i, d) for i, d in enumerate(random_dates(count, start, days))]
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+        print(f"  seeded {rows:,} {table.name} rows")
+
+    insert(Ticket, lambda i, d: {
+        'customer_id': 1 + i % 500, 'agent_id': 1 + i % 50,
+        'status': 'booked' if random.random() < 0.85 else 'cancelled',
+        'date': d, 'ref_no': f"B/T/{i:08d}",
+        'customer_charge': 100.0, 'agent_paid': 80.0, 'profit': 20.0,
+        'customer_payment_mode': random.choice(MODES), 'agent_payment_mode': random.choice(MODES),
+        'created_at': d, 'updated_by': 'bench'
+    })
+    insert(Service, lambda i, d: {
+        'customer_id': 1 + i % 500, 'date': d, 'ref_no': f"B/S/{i:08d}",
+        'status': 'booked' if random.random() < 0.9 else 'cancelled',
+        'customer_charge': 50.0, 'customer_payment_mode': random.choice(MODES),
+        'created_at': d, 'updated_by': 'bench'
+    })
+    insert(Transaction, lambda i, d: {
+        'ref_no': f"B/X/{i:08d}", 'entity_type': random.choice(('customer', 'agent', 'partner')),
+        'entity_id': 1 + i % 500, 'pay_type': 'cash_deposit',
+        'transaction_type': random.choice(TRANSACTION_TYPES), 'mode': random.choice(MODES),
+        'amount': 10.0, 'date': d, 'updated_by': 'bench', 'extra_data': {}
+    })
+    # Ledger rows are appended in time order, like the real ledger
+    ledger_dates = sorted(random_dates(rows, start, days))
+    insert(CompanyAccountBalance, lambda i, d: {
+        'mode': MODES[i % 2], 'credited_amount': 10.0, 'credited_date': ledger_dates[i],
+        'balance': 10.0 * (i // 2 + 1), 'transaction_type': 'ticket', 'action': 'add',
+        'updated_by': 'bench', 'updated_at': ledger_dates[i], 'posted_at': ledger_dates[i]
+    })
+
+
+def hot_queries(start, end):
+    """The access paths the indexes are meant for, as the API builds them"""
+    return {
+        'ticket listing page': db.session.query(Ticket)
+            .filter(Ticket.date >= start, Ticket.date < end)
+            .order_by(Ticket.date, Ticket.id).limit(50),
+        'dashboard ticket sales': db.session.query(func.sum(Ticket.customer_charge))
+            .filter(Ticket.date >= start, Ticket.date < end, Ticket.status == 'booked'),
+        'service listing': db.session.query(Service)
+            .filter(Service.date >= start, Service.date < end).order_by(Service.date).limit(50),
+        'transactions by type': db.session.query(Transaction)
+            .filter(Transaction.transaction_type == 'receipt', Transaction.date >= start, Transaction.date < end)
+            .order_by(Transaction.date).limit(50),
+        'dashboard transaction sums': db.session.query(func.sum(Transaction.amount))
+            .filter(Transaction.date >= start, Transaction.date < end),
+        'last ledger row': db.session.query(CompanyAccountBalance)
+            .filter_by(mode='cash').order_by(CompanyAccountBalance.id.desc()).limit(1),
+        # ledger.get_company_balance_as_of
+        'ledger balance as of': db.session.query(CompanyAccountBalance.balance)
+            .filter(CompanyAccountBalance.mode == 'online', CompanyAccountBalance.posted_at <= end)
+            .order_by(CompanyAccountBalance.posted_at.desc(), CompanyAccountBalance.id.desc()).limit(1),
+    }
+
+
+def explain(label, start, end):
+    print(f"\n=== {label} ===")
+    for name, query in hot_queries(start, end).items():
+        compiled = query.statement.compile(dialect=db.engine.dialect)
+        params = tuple(str(compiled.params[key]) for key in compiled.positiontup)
+        plan = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+
+        began = time.perf_counter()
+        query.all()
+        elapsed = (time.perf_counter() - began) * 1000
+
+        print(f"{name:<28} {elapsed:9.1f} ms")
+        for row in plan:
+            print(f"    {row[-1]}")
+
+
+def bench_indexes():
+    return [
+        index
+        for model in (Ticket, Service, Transaction, CompanyAccountBalance)
+        for index in model.__table__.indexes
+        if index.name.startswith('ix_')
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='rows per table (default 1,000,000)')
+    parser.add_argument('--days', type=int, default=3 * 365, help='spread of the seeded dates')
+    parser.add_argument('--db', help='reuse/keep this database file instead of a temporary one')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    fresh = not os.path.exists(path)
+    app = make_app(path)
+    random.seed(42)
+
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    # A typical one-month dashboard/listing window
+    window = (end - timedelta(days=30), end)
+
+    with app.app_context():
+        db.create_all()
+        if fresh:
+            print(f"Seeding {path}")
+            seed(args.rows, start, args.days)
+
+        indexes = bench_indexes()
+        for index in indexes:
+            index.drop(bind=db.engine, checkfirst=True)
+        db.session.execute(text("ANALYZE"))
+        explain("without composite indexes", *window)
+
+        for index in indexes:
+            index.create(bind=db.engine, checkfirst=True)
+        db.session.execute(text("ANALYZE"))
+        explain("with composite indexes", *window)
+
+    if not args.db:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# benchmarks/load.py
+"""
+Load benchmark: seed a synthetic dataset, drive the API through the Flask
+test client and write p50/p95/p99 latency, throughput and peak RSS per
+scenario as JSON, to be compared between commits.
+
+    cd backend
+    python -m benchmarks.load --scale 0.05 --out before.json
+    ... change something ...
+    python -m benchmarks.load --scale 0.05 --out after.json --compare before.json
+
+--scale 1 seeds ~1M tickets, transactions and ledger rows (see
+benchmarks/dataset.py). Use --db to keep the seeded database between runs;
+scenarios book and cancel tickets, so a reused database slowly grows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_ITERATIONS = 200
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return None
+    rank = max(1, round(pct / 100 * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def reset_peak_rss():
+    """Restart the kernel's high-water mark so each scenario reports its own peak (Linux)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS; a process-wide peak either way
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Scenarios:
+    """Each scenario is one API call; state shared between calls lives here"""
+
+    def __init__(self, client, headers, sizes, rng):
+        self.client = client
+        self.headers = headers
+        self.sizes = sizes
+        self.rng = rng
+        self.booked = []      # ticket ids booked by the run, cancelled later
+        end = datetime.now().date() + timedelta(days=1)
+        self.week = f"start_date={end - timedelta(days=7)}&end_date={end}"
+        self.month = f"start_date={end - timedelta(days=30)}&end_date={end}"
+
+    def _ticket(self):
+        return {
+            'customer_id': self.rng.randint(1, self.sizes['customers']),
+            'agent_id': self.rng.randint(1, self.sizes['agents']),
+            'travel_location_id': self.rng.randint(1, self.sizes['travel_locations']),
+            'particular_id': self.rng.randint(1, self.sizes['particulars']),
+            'customer_charge': 400.0, 'agent_paid': 340.0,
+            'customer_payment_mode': self.rng.choice(('cash', 'online', 'wallet')),
+            'agent_payment_mode': self.rng.choice(('cash', 'online')),
+        }
+
+    def list_tickets_page(self):
+        return self.client.get(f"/api/tickets?status=all&limit=50&{self.month}", headers=self.headers)
+
+    def list_receipts_week(self):
+        return self.client.get(f"/api/transactions/receipt?{self.week}", headers=self.headers)
+
+    def book_ticket(self):
+        response = self.client.post('/api/tickets', json=self._ticket(), headers=self.headers)
+        if response.status_code == 201:
+            self.booked.append(response.json['id'])
+        return response
+
+    def cancel_ticket(self):
+        if not self.booked:
+            self.book_ticket()
+        return self.client.post('/api/tickets?action=cancel', json={
+            'ticket_id': self.booked.pop(),
+            'customer_refund_amount': 300, 'customer_refund_mode': 'cash',
+            'agent_recovery_amount': 250, 'agent_recovery_mode': 'online',
+        }, headers=self.headers)
+
+    def bulk_book_50(self):
+        return self.client.post('/api/tickets/bulk', json=[self._ticket() for _ in range(50)], headers=self.headers)
+
+    def dashboard_month(self):
+        return self.client.get(f"/api/dashboard/metrics?{self.month}", headers=self.headers)
+
+    def export_tickets_week(self):
+        response = self.client.get(f"/api/tickets?export=excel&status=booked&{self.week}", headers=self.headers)
+        response.get_data()  # drain the streamed workbook
+        return response
+
+
+# name -> share of --iterations (exports are much heavier than the rest)
+SCENARIOS = {
+    'list_tickets_page': 1.0,
+    'list_receipts_week': 1.0,
+    'book_ticket': 1.0,
+    'cancel_ticket': 1.0,
+    'bulk_book_50': 0.1,
+    'dashboard_month': 1.0,
+    'export_tickets_week': 0.1,
+}
+
+
+def run_scenario(fn, iterations):
+    reset_peak_rss()
+    latencies, errors = [], 0
+    began = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'throughput_rps': round(iterations / elapsed, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report):
+    """Print each scenario's latency change against a previous report"""
+    print(f"\n{'scenario':<22} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}", file=sys.stderr)
+    for name, result in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            print(f"{name:<22} {metric:<15} {before:>10} {after:>10} {(after - before) / before:>+8.1%}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='dataset size multiplier (default 1 = ~1M tickets)')
+    parser.add_argument('--days', type=int, default=3 * 365, help='spread of the seeded dates')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='requests per scenario')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='run only these (repeatable)')
+    parser.add_argument('--db', help='reuse/keep this database file instead of a temporary one')
+    parser.add_argument('--out', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='previous JSON report to diff against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.abspath(args.db or os.path.join(workdir, 'bench.sqlite3'))
+    fresh = not os.path.exists(path)
+
+    # The app reads these at import time
+    os.environ['DATABASE_URL'] = "sqlite:///" + path
+    os.environ['EXPORT_DIR'] = os.path.join(workdir, 'exports')
+    os.environ.setdefault('SLOW_REQUEST_MS', '0')
+    os.environ.setdefault('SLOW_REQUEST_QUERIES', '0')
+
+    from main import app
+    from applications.model import db
+    from applications.instrumentation import endpoint_stats
+    from benchmarks.dataset import seed_dataset, sizes_for, PARTICULARS
+
+    with app.app_context():
+        if fresh:
+            print(f"Seeding {path} (scale {args.scale})", file=sys.stderr)
+            began = time.perf_counter()
+            sizes = seed_dataset(args.scale, args.days, args.seed, log=lambda m: print(m, file=sys.stderr))
+            seed_seconds = round(time.perf_counter() - began, 1)
+        else:
+            sizes, seed_seconds = {**sizes_for(args.scale), 'particulars': len(PARTICULARS)}, None
+        db.session.remove()
+
+    client = app.test_client()
+    token = client.post('/api/login', json={'name': 'admin', 'password': 'admin'}).json['token']
+    scenarios = Scenarios(client, {'Authorization': 'Bearer ' + token}, sizes, random.Random(args.seed))
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        iterations = max(1, int(args.iterations * SCENARIOS[name]))
+        print(f"  {name} x{iterations}", file=sys.stderr)
+        results[name] = run_scenario(getattr(scenarios, name), iterations)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'seed_seconds': seed_seconds,
+        },
+        'dataset': sizes,
+        'scenarios': results,
+        'endpoints': endpoint_stats(),
+    }
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
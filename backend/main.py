@@ -15,10 +15,19 @@ from applications.setting_api import RoleAPI, RolePermissionAPI, PageAPI
 from applications.generic_api import GenericAPI
 from applications.entity_api import EntityResource
 from applications.transaction_api import TransactionResource,CompanyBalanceResource
-from applications.ticket_api import TicketResource
+from applications.import_api import TransactionImportResource
+from applications.ticket_api import TicketResource, BulkTicketResource
 from applications.service_api import ServiceResource
 from applications.dashboard import CompanyBalancesAPI, DashboardMetricsAPI, CustomerWalletCreditAPI, AgentWalletCreditAPI, PartnerWalletCreditAPI
-from sqlalchemy import text
+from applications.export_api import ExportJobResource
+from applications.tasks import celery, init_celery
+from applications.ledger import verify_ledger_command
+from applications.ledger_audit import checkpoint_ledger_command, audit_ledger_command
+from applications.rollups import rebuild_rollups_command
+from applications.idempotency import purge_idempotency_keys_command
+from applications.entity_cache import init_entity_cache
+from applications.database import database_config, init_sqlite_pragmas
+from applications.instrumentation import init_instrumentation
 
 def create_app():
     app = Flask(__name__)
@@ -26,13 +35,34 @@ def create_app():
     current_dir = os.path.abspath(os.path.dirname(__file__))
 
     # Database
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(current_dir, "ts.sqlite3")
+    # DATABASE_URL / DB_POOL_* / DB_STATEMENT_TIMEOUT_MS, see applications/database.py
+    app.config.update(database_config("sqlite:///" + os.path.join(current_dir, "ts.sqlite3")))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Per-connection SQLite tuning; see applications/database.py for the defaults
+    app.config['SQLITE_PRAGMAS'] = {}
 
     # JWT
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "revive_token_key")
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=10)
 
+    # Background exports: Celery workers when a broker is configured, otherwise
+    # a thread pool in this process. Eager (in the request) only when asked for, e.g. tests
+    app.config['CELERY_BROKER_URL'] = os.getenv('CELERY_BROKER_URL')
+    app.config['CELERY_TASK_ALWAYS_EAGER'] = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true'
+    app.config['EXPORT_THREADS'] = int(os.getenv('EXPORT_THREADS', '2'))
+    app.config['EXPORT_DIR'] = os.getenv('EXPORT_DIR', os.path.join(current_dir, 'exports'))
+
+    # Particular/TravelLocation cache: reloaded when changed; optional max age in seconds
+    app.config['REFERENCE_CACHE_TTL'] = int(os.getenv('REFERENCE_CACHE_TTL', '0')) or None
+
+    # Seconds a POST response stays replayable for retries with the same Idempotency-Key
+    app.config['IDEMPOTENCY_KEY_TTL'] = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+
+    # Request instrumentation: Server-Timing header, slow requests logged with their SQL (0 = off)
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+    app.config['SLOW_REQUEST_MS'] = int(os.getenv('SLOW_REQUEST_MS', '500'))
+    app.config['SLOW_REQUEST_QUERIES'] = int(os.getenv('SLOW_REQUEST_QUERIES', '50'))
+
     # CORS
     CORS(app,
         resources={ r"/api/*": {
@@ -43,22 +73,27 @@ def create_app():
                 "http://83.229.39.190"        # in case it's served without port 5173
             ],
             "supports_credentials": True,
-            "allow_headers": ["Authorization", "Content-Type"],
-            "expose_headers": ["Authorization"],
+            "allow_headers": ["Authorization", "Content-Type", "Idempotency-Key"],
+            "expose_headers": ["Authorization", "X-Total-Count", "X-Next-Cursor", "X-Wallet-Total", "X-Credit-Used-Total",
+                               "Idempotent-Replayed", "Server-Timing"],
             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
         }}
     )
 
     # Extensions
     db.init_app(app)
+    init_sqlite_pragmas(app)
     JWTManager(app)
+    init_celery(app)
+    init_entity_cache(app)
+    init_instrumentation(app)
+    app.cli.add_command(verify_ledger_command)
+    app.cli.add_command(checkpoint_ledger_command)
+    app.cli.add_command(audit_ledger_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(purge_idempotency_keys_command)
     api = Api(app)
 
-    @app.before_request
-    def enable_foreign_keys():
-        if 'sqlite' in db.engine.url.drivername:
-            db.session.execute(text('PRAGMA foreign_keys = ON'))
-
     # Routes
     api.add_resource(LoginAPI,        "/api/login")
     api.add_resource(SignupAPI,       "/api/signup", "/api/signup/<int:user_id>")
@@ -87,11 +122,13 @@ def create_app():
         '/api/transactions/<int:transaction_id>',
         '/api/transactions/refno/<string:transaction_type>'
     )
+    api.add_resource(TransactionImportResource, '/api/transactions/import')
     api.add_resource(
     TicketResource,
     '/api/tickets',
     endpoint='ticket_operations'
     )
+    api.add_resource(BulkTicketResource, '/api/tickets/bulk')
     api.add_resource(ServiceResource, '/api/services')
     api.add_resource(CompanyBalancesAPI, "/api/dashboard/balances")
     api.add_resource(DashboardMetricsAPI, "/api/dashboard/metrics","/api/dashboard/export/pdf")
@@ -99,6 +136,7 @@ def create_app():
     api.add_resource(AgentWalletCreditAPI, "/api/dashboard/agent_balances")
     api.add_resource(PartnerWalletCreditAPI, "/api/dashboard/partner_balances")
     api.add_resource(CompanyBalanceResource, '/api/company_balance/<string:mode>')
+    api.add_resource(ExportJobResource, '/api/exports', '/api/exports/<string:job_id>')
 
     # Create tables & seed
     with app.app_context():
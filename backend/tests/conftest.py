@@ -0,0 +1,138 @@
+# tests/conftest.py
+"""
+Shared fixtures. The app is created once per session against a throwaway
+file-backed SQLite database (threads in the concurrency tests need a real
+file), with background exports run eagerly.
+
+Every test also runs against PostgreSQL when one is available: a database
+given as TEST_POSTGRES_URL (its tables are created and written to), or a
+temporary cluster started with initdb/pg_ctl found on PATH or in PG_BIN.
+Without either, or without psycopg2, that half of the matrix is skipped.
+
+    cd backend && python -m pytest -q
+    TEST_POSTGRES_URL=postgresql://localhost/babal_test python -m pytest -q
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from itertools import count
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# main reads these when it is imported
+_workdir = tempfile.mkdtemp(prefix='babal-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_workdir, 'test.sqlite3')
+os.environ['EXPORT_DIR'] = os.path.join(_workdir, 'exports')
+os.environ['CELERY_TASK_ALWAYS_EAGER'] = 'true'
+os.environ['SLOW_REQUEST_MS'] = '0'
+os.environ['SLOW_REQUEST_QUERIES'] = '0'
+
+from flask import g  # noqa: E402
+
+_names = count(1)
+
+
+@pytest.fixture(scope='session', params=['sqlite', 'postgresql'])
+def app(request):
+    if request.param == 'sqlite':
+        from main import app
+        return app
+
+    import main
+    sqlite_url = os.environ['DATABASE_URL']
+    os.environ['DATABASE_URL'] = request.getfixturevalue('postgres_url')
+    try:
+        return main.create_app()
+    finally:
+        os.environ['DATABASE_URL'] = sqlite_url
+
+
+@pytest.fixture(scope='session')
+def postgres_url(tmp_path_factory):
+    """TEST_POSTGRES_URL, or a throwaway local cluster for the session"""
+    pytest.importorskip('psycopg2', reason='psycopg2 is needed for the PostgreSQL tests')
+    if os.getenv('TEST_POSTGRES_URL'):
+        yield os.environ['TEST_POSTGRES_URL']
+        return
+
+    initdb, pg_ctl = (shutil.which(name, path=os.getenv('PG_BIN')) for name in ('initdb', 'pg_ctl'))
+    if not (initdb and pg_ctl):
+        pytest.skip('no PostgreSQL: set TEST_POSTGRES_URL or put initdb/pg_ctl on PATH')
+
+    # Unix socket in the data directory only, so nothing else can collide with it
+    data = tmp_path_factory.mktemp('pgdata')
+    try:
+        subprocess.run([initdb, '-D', str(data), '-U', 'postgres', '-A', 'trust'], check=True, capture_output=True)
+        subprocess.run([pg_ctl, '-D', str(data), '-l', str(data / 'server.log'), '-w',
+                        '-o', f"-k {data} -c listen_addresses=''", 'start'], check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        pytest.skip(f"could not start PostgreSQL: {e.stderr.decode(errors='replace').strip()}")
+    try:
+        yield f'postgresql://postgres@/postgres?host={data}'
+    finally:
+        subprocess.run([pg_ctl, '-D', str(data), '-m', 'immediate', 'stop'], capture_output=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth_headers(app):
+    response = app.test_client().post('/api/login', json={'name': 'admin', 'password': 'admin'})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return {'Authorization': 'Bearer ' + response.json['token']}
+
+
+@pytest.fixture
+def api(client, auth_headers):
+    """Admin requests that must succeed: api('post', url, json=...) returns the response"""
+    def call(method, url, expect=(200, 201), **kwargs):
+        headers = {**auth_headers, **kwargs.pop('headers', {})}
+        response = getattr(client, method)(url, headers=headers, **kwargs)
+        assert response.status_code in expect, (response.status_code, response.get_data(as_text=True)[:500])
+        return response
+    return call
+
+
+@pytest.fixture
+def make(api):
+    """Create a customer/agent/partner/particular/... through the API; returns its id"""
+    def create(kind, **fields):
+        fields.setdefault('name', f"{kind} {next(_names)}")
+        return api('post', f'/api/manage/{kind}', json=fields).json['id']
+    return create
+
+
+@pytest.fixture
+def booking(make):
+    """Ids for a ticket booking: a fresh customer, agent, particular, location and passenger"""
+    customer = make('customer', wallet_balance=0.0, credit_limit=0.0)
+    return {
+        'customer_id': customer,
+        'agent_id': make('agent', wallet_balance=0.0, credit_limit=0.0),
+        'particular_id': make('particular'),
+        'travel_location_id': make('travel_location'),
+        'passenger_id': make('passenger', customer_id=customer),
+    }
+
+
+def statement_count(response):
+    """SQL statements a request ran, from the Server-Timing header the instrumentation adds"""
+    timing = response.headers['Server-Timing']
+    return int(timing.split('desc="')[1].split(' ')[0])
+
+
+@contextmanager
+def counting_statements(app):
+    """Count the statements run inside the block with the request instrumentation's counter"""
+    with app.test_request_context():
+        g._sql_stats = {'count': 0, 'db_ms': 0.0, 'statements': []}
+        yield g._sql_stats
@@ -0,0 +1,180 @@
+# tests/test_dashboard.py
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, case, and_, or_
+
+from applications.dashboard import _get_dashboard_metrics_data
+from applications.model import db, CompanyAccountBalance, Ticket, Transaction, Service, Particular, Agent, Customer
+from conftest import counting_statements
+
+
+def _metrics_before_rollup(start_date_str, end_date_str):
+    """
+    The dashboard metrics as computed before the aggregate/rollup rewrite:
+    one SUM scan per figure over the raw tables. The JSON LIKE filters on
+    extra_data are replaced by the flag columns that hold the same values.
+    """
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+    end_date_exclusive = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
+
+    ticket_date_filter = and_(Ticket.date >= start_date, Ticket.date < end_date_exclusive)
+    transaction_date_filter = and_(Transaction.date >= start_date, Transaction.date < end_date_exclusive)
+    service_date_filter = and_(Service.date >= start_date, Service.date < end_date_exclusive)
+
+    balance_as_of_date = end_date_exclusive - timedelta(microseconds=1)
+    balances = {}
+    for mode in ('cash', 'online'):
+        row = CompanyAccountBalance.query.filter_by(mode=mode)\
+            .filter(CompanyAccountBalance.updated_at <= balance_as_of_date)\
+            .order_by(CompanyAccountBalance.updated_at.desc())\
+            .first()
+        balances[mode] = row.balance if row else 0.0
+
+    total_ticket_sales = db.session.query(func.sum(Ticket.customer_charge))\
+        .filter(ticket_date_filter, Ticket.status == 'booked').scalar() or 0.0
+    total_agent_charges = db.session.query(func.sum(Ticket.agent_paid))\
+        .filter(ticket_date_filter, Ticket.status == 'booked').scalar() or 0.0
+    profit_from_sales = total_ticket_sales - total_agent_charges
+    other_service_income = db.session.query(func.sum(Service.customer_charge))\
+        .filter(service_date_filter, Service.status == 'booked').scalar() or 0.0
+
+    deducted = Transaction.deduct_from_account == True
+    credited = Transaction.credit_to_account == True
+    total_expenditure = db.session.query(func.sum(Transaction.amount)).filter(
+        transaction_date_filter,
+        Transaction.transaction_type == 'payment',
+        Transaction.pay_type != 'wallet_transfer',
+        or_(
+            Transaction.entity_type == 'others',
+            and_(Transaction.entity_type == 'agent', Transaction.pay_type == 'other_expense', deducted),
+            and_(
+                or_(Transaction.entity_type == 'customer', Transaction.entity_type == 'partner'),
+                or_(Transaction.pay_type == 'cash_withdrawal', and_(Transaction.pay_type == 'other_expense', deducted))
+            )
+        )
+    ).scalar() or 0.0
+    net_profit = profit_from_sales + other_service_income - total_expenditure
+
+    total_agent_deposit = db.session.query(func.sum(Transaction.amount)).filter(
+        transaction_date_filter,
+        Transaction.entity_type == 'agent',
+        Transaction.transaction_type == 'receipt',
+        or_(Transaction.pay_type == 'cash_deposit', and_(Transaction.pay_type == 'other_receipt', credited))
+    ).scalar() or 0.0
+    total_customer_deposit = db.session.query(func.sum(Transaction.amount)).filter(
+        transaction_date_filter,
+        Transaction.entity_type == 'customer',
+        Transaction.transaction_type == 'receipt',
+        or_(Transaction.pay_type == 'cash_deposit', and_(Transaction.pay_type == 'other_receipt', credited))
+    ).scalar() or 0.0
+
+    total_agent_credit = db.session.query(func.sum(Agent.credit_limit - Agent.credit_balance))\
+        .filter(Agent.active == True).scalar() or 0.0
+    total_customer_credit = db.session.query(func.sum(Customer.credit_used))\
+        .filter(Customer.active == True).scalar() or 0.0
+
+    trend = db.session.query(
+        func.date(Ticket.date).label('date'),
+        func.sum(case((Ticket.status == 'booked', Ticket.customer_charge), else_=0)).label('sales'),
+        func.sum(case((Ticket.status == 'booked', Ticket.agent_paid), else_=0)).label('expenses')
+    ).filter(ticket_date_filter).group_by(func.date(Ticket.date)).order_by(func.date(Ticket.date)).all()
+
+    by_particular = db.session.query(Particular.name)\
+        .join(Ticket, Ticket.particular_id == Particular.id)\
+        .filter(ticket_date_filter, Ticket.status == 'booked')\
+        .group_by(Particular.name)
+    sales = by_particular.add_columns(func.sum(Ticket.customer_charge).label('sales'))\
+        .order_by(func.sum(Ticket.customer_charge).desc()).all()
+    profit = by_particular.add_columns(func.sum(Ticket.customer_charge - Ticket.agent_paid).label('profit'))\
+        .order_by(func.sum(Ticket.customer_charge - Ticket.agent_paid).desc()).all()
+
+    return {
+        'cash_balance': balances['cash'],
+        'online_balance': balances['online'],
+        'total_ticket_sales': total_ticket_sales,
+        'total_agent_charges': total_agent_charges,
+        'profit_from_sales': profit_from_sales,
+        'other_service_income': other_service_income,
+        'total_expenditure': total_expenditure,
+        'net_profit': net_profit,
+        'total_agent_deposit': total_agent_deposit,
+        'total_customer_deposit': total_customer_deposit,
+        'total_agent_credit': total_agent_credit,
+        'total_customer_credit': total_customer_credit,
+        'sales_expense_trend': [{'date': str(row.date), 'sales': row.sales, 'expenses': row.expenses} for row in trend],
+        'sales_by_particular': [{'name': row.name, 'sales': row.sales} for row in sales],
+        'profit_by_particular': [{'name': row.name, 'profit': row.profit} for row in profit],
+    }
+
+
+@pytest.fixture
+def activity(api, make, booking):
+    """Today's bookings, a cancellation, services and every transaction kind the metrics count"""
+    customer = make('customer', wallet_balance=1000.0, credit_limit=500.0)
+    agent = make('agent', wallet_balance=500.0, credit_limit=300.0)
+    second_particular = make('particular')
+
+    tickets = []
+    for i, (particular, mode) in enumerate([(booking['particular_id'], 'cash'), (second_particular, 'online'),
+                                            (second_particular, 'wallet'), (booking['particular_id'], 'cash')]):
+        tickets.append(api('post', '/api/tickets', json={
+            **booking, 'customer_id': customer, 'agent_id': agent, 'particular_id': particular,
+            'customer_charge': 300.0 + 17 * i, 'agent_paid': 210.0 + 5 * i,
+            'customer_payment_mode': mode, 'agent_payment_mode': 'cash',
+        }).json['id'])
+    api('post', '/api/tickets?action=cancel', json={
+        'ticket_id': tickets[-1], 'customer_refund_amount': 100, 'customer_refund_mode': 'cash',
+        'agent_recovery_amount': 80, 'agent_recovery_mode': 'cash',
+    })
+    for mode in ('cash', 'wallet'):
+        api('post', '/api/services', json={
+            'customer_id': customer, 'particular_id': second_particular,
+            'customer_charge': 45.0, 'customer_payment_mode': mode,
+        })
+
+    for ttype, body in [
+        ('payment', {'entity_type': 'others', 'pay_type': 'other_expense', 'mode': 'cash', 'amount': 15}),
+        ('payment', {'entity_type': 'agent', 'entity_id': agent, 'pay_type': 'other_expense', 'mode': 'online', 'amount': 25, 'deduct_from_account': True}),
+        ('payment', {'entity_type': 'agent', 'entity_id': agent, 'pay_type': 'other_expense', 'mode': 'online', 'amount': 9}),
+        ('payment', {'entity_type': 'customer', 'entity_id': customer, 'pay_type': 'cash_withdrawal', 'mode': 'cash', 'amount': 40}),
+        ('receipt', {'entity_type': 'agent', 'entity_id': agent, 'pay_type': 'cash_deposit', 'mode': 'cash', 'amount': 70}),
+        ('receipt', {'entity_type': 'agent', 'entity_id': agent, 'pay_type': 'other_receipt', 'mode': 'cash', 'amount': 11, 'credit_to_account': True}),
+        ('receipt', {'entity_type': 'customer', 'entity_id': customer, 'pay_type': 'cash_deposit', 'mode': 'online', 'amount': 200}),
+        ('receipt', {'entity_type': 'customer', 'entity_id': customer, 'pay_type': 'other_receipt', 'mode': 'cash', 'amount': 33, 'credit_to_account': True}),
+        ('receipt', {'entity_type': 'customer', 'entity_id': customer, 'pay_type': 'other_receipt', 'mode': 'cash', 'amount': 7}),
+    ]:
+        api('post', f'/api/transactions/{ttype}', json=body)
+
+
+def _assert_same(new, old):
+    assert new.keys() == old.keys()
+    for key, value in old.items():
+        if isinstance(value, list):
+            assert len(new[key]) == len(value), key
+            for new_row, old_row in zip(new[key], value):
+                assert new_row == pytest.approx(old_row), key
+        else:
+            assert new[key] == pytest.approx(value), key
+
+
+def test_metrics_match_the_per_figure_queries_with_fewer_statements(app, activity):
+    today = date.today().isoformat()
+    with counting_statements(app) as before:
+        expected = _metrics_before_rollup(today, today)
+    with counting_statements(app) as after:
+        metrics = _get_dashboard_metrics_data(today, today)
+
+    assert expected['total_ticket_sales'] > 0 and expected['total_expenditure'] > 0
+    _assert_same(metrics, expected)
+    assert after['count'] < before['count']
+
+
+def test_balance_report_totals_are_readable_cross_origin(api, make):
+    make('customer', wallet_balance=25.0, credit_limit=0.0)
+    response = api('get', '/api/dashboard/customer_balances', headers={'Origin': 'http://localhost:5173'})
+
+    exposed = {name.strip().lower() for name in response.headers['Access-Control-Expose-Headers'].split(',')}
+    for header in ('X-Total-Count', 'X-Wallet-Total', 'X-Credit-Used-Total'):
+        assert header in response.headers
+        assert header.lower() in exposed
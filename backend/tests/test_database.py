@@ -0,0 +1,53 @@
+# tests/test_database.py
+from sqlalchemy import text
+
+from applications.database import database_config
+from applications.model import db
+
+DEFAULT = 'sqlite:///default.sqlite3'
+ENV = ('DATABASE_URL', 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_RECYCLE', 'DB_STATEMENT_TIMEOUT_MS')
+
+
+def _config(monkeypatch, **env):
+    for name in ENV:
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return database_config(DEFAULT)
+
+
+def test_defaults_to_local_sqlite(monkeypatch):
+    config = _config(monkeypatch)
+    assert config['SQLALCHEMY_DATABASE_URI'] == DEFAULT
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_pre_ping': True}
+
+
+def test_old_postgres_scheme_is_normalized(monkeypatch):
+    config = _config(monkeypatch, DATABASE_URL='postgres://user:pw@db/babal')
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'postgresql://user:pw@db/babal'
+
+
+def test_pool_and_statement_timeout_from_env(monkeypatch):
+    config = _config(
+        monkeypatch, DATABASE_URL='postgresql://db/babal', DB_POOL_SIZE='8',
+        DB_MAX_OVERFLOW='4', DB_POOL_RECYCLE='1800', DB_STATEMENT_TIMEOUT_MS='15000'
+    )
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {
+        'pool_pre_ping': True, 'pool_size': 8, 'max_overflow': 4, 'pool_recycle': 1800,
+        'connect_args': {'options': '-c statement_timeout=15000'},
+    }
+
+
+def test_statement_timeout_is_postgresql_only(monkeypatch):
+    config = _config(monkeypatch, DB_STATEMENT_TIMEOUT_MS='15000')
+    assert 'connect_args' not in config['SQLALCHEMY_ENGINE_OPTIONS']
+
+
+def test_connections_are_set_up_for_their_dialect(app):
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 1
+        else:
+            assert db.engine.dialect.name == 'postgresql'
+            assert db.session.execute(text('SELECT 1')).scalar() == 1
@@ -0,0 +1,46 @@
+# tests/test_exports.py
+import time
+
+import pytest
+
+from applications.tasks import celery
+
+DAY = '2001-05-06'
+EXPORT = {'kind': 'tickets', 'format': 'excel', 'params': {'status': 'all', 'start_date': DAY, 'end_date': DAY}}
+
+
+@pytest.fixture
+def ticket(api, booking):
+    return api('post', '/api/tickets', json={
+        **booking, 'date': DAY, 'customer_charge': 120.0, 'agent_paid': 100.0,
+        'customer_payment_mode': 'cash', 'agent_payment_mode': 'cash',
+    }).json['id']
+
+
+def _wait_for(api, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = api('get', f'/api/exports/{job_id}').json
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"export {job_id} still {job['status']} after {timeout}s")
+
+
+def test_eager_export_is_rendered_when_queued(api, ticket):
+    # The suite runs with CELERY_TASK_ALWAYS_EAGER
+    response = api('post', '/api/exports', json=EXPORT, expect=(202,))
+    assert response.json['job']['status'] == 'completed'
+
+    download = api('get', f"/api/exports/{response.json['job_id']}?download=1")
+    assert download.data[:2] == b'PK'  # xlsx is a zip
+
+
+def test_without_broker_export_runs_off_the_request_thread(api, ticket, monkeypatch):
+    monkeypatch.setattr(celery.conf, 'task_always_eager', False)
+
+    response = api('post', '/api/exports', json=EXPORT, expect=(202,))
+    job = _wait_for(api, response.json['job_id'])
+
+    assert job['status'] == 'completed', job
+    assert api('get', f"/api/exports/{job['id']}?download=1").data[:2] == b'PK'
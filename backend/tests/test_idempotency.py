@@ -0,0 +1,50 @@
+# tests/test_idempotency.py
+import uuid
+
+import pytest
+
+from applications.idempotency import HEADER, REPLAY_HEADER
+
+
+@pytest.fixture
+def wallet_ticket(booking):
+    """A 100 booking paid from the customer's (empty) wallet"""
+    return {
+        **booking, 'customer_charge': 100.0, 'agent_paid': 80.0,
+        'customer_payment_mode': 'wallet', 'agent_payment_mode': 'cash',
+    }
+
+
+def _key():
+    return {HEADER: str(uuid.uuid4())}
+
+
+def test_retry_replays_the_stored_response(api, wallet_ticket):
+    wallet_ticket['customer_payment_mode'] = 'cash'
+    key = _key()
+    first = api('post', '/api/tickets', json=wallet_ticket, headers=key, expect=(201,))
+    retry = api('post', '/api/tickets', json=wallet_ticket, headers=key, expect=(201,))
+
+    assert retry.json == first.json
+    assert retry.headers[REPLAY_HEADER] == 'true'
+    assert REPLAY_HEADER not in first.headers
+
+
+def test_failed_request_then_retry_with_same_key_runs_again(api, wallet_ticket):
+    key = _key()
+    failed = api('post', '/api/tickets', json=wallet_ticket, headers=key, expect=(400, 500))
+    assert 'Insufficient' in failed.get_data(as_text=True)
+
+    api('post', '/api/transactions/receipt', json={
+        'entity_type': 'customer', 'entity_id': wallet_ticket['customer_id'],
+        'pay_type': 'cash_deposit', 'mode': 'cash', 'amount': 100,
+    })
+    retry = api('post', '/api/tickets', json=wallet_ticket, headers=key, expect=(201,))
+    assert REPLAY_HEADER not in retry.headers
+
+
+def test_same_key_for_a_different_request_is_rejected(api, wallet_ticket):
+    wallet_ticket['customer_payment_mode'] = 'cash'
+    key = _key()
+    api('post', '/api/tickets', json=wallet_ticket, headers=key, expect=(201,))
+    api('post', '/api/tickets', json={**wallet_ticket, 'customer_charge': 101.0}, headers=key, expect=(422,))
@@ -0,0 +1,12 @@
+# tests/test_instrumentation.py
+from applications.instrumentation import UNMATCHED_ENDPOINT, endpoint_stats
+
+
+def test_unmatched_paths_share_one_endpoint_entry(client):
+    before = endpoint_stats().get(UNMATCHED_ENDPOINT, {}).get('requests', 0)
+    for n in range(5):
+        assert client.get(f'/no/such/path/{n}').status_code == 404
+
+    stats = endpoint_stats()
+    assert stats[UNMATCHED_ENDPOINT]['requests'] == before + 5
+    assert not any(name.startswith('/no/such/path') for name in stats)
@@ -0,0 +1,61 @@
+# tests/test_ledger.py
+from datetime import datetime, timedelta
+
+from applications.ledger import backfill_posted_at, verify_balance_heads
+from applications.ledger_audit import audit_ledger, create_checkpoints
+from applications.model import db, CompanyAccountBalance, LedgerCheckpoint
+
+
+def test_backfill_dates_legacy_rows_by_credited_date(app):
+    credited, edited = datetime(2001, 9, 1, 10), datetime(2001, 9, 20, 16)
+    with app.app_context():
+        rows = [
+            CompanyAccountBalance(mode='cash', credited_amount=0, balance=0, credited_date=credited),
+            CompanyAccountBalance(mode='cash', credited_amount=0, balance=0),
+        ]
+        db.session.add_all(rows)
+        db.session.flush()
+        # rows written before the column existed, the second without a credited_date
+        for row, credited_date in zip(rows, (credited, None)):
+            CompanyAccountBalance.query.filter_by(id=row.id).update({
+                CompanyAccountBalance.posted_at: None,
+                CompanyAccountBalance.credited_date: credited_date,
+                CompanyAccountBalance.updated_at: edited,
+            }, synchronize_session=False)
+        db.session.commit()
+
+        assert backfill_posted_at() >= 2
+        assert [db.session.get(CompanyAccountBalance, r.id, populate_existing=True).posted_at for r in rows] \
+            == [credited, edited]
+
+        db.session.delete(rows[0])
+        db.session.delete(rows[1])
+        db.session.commit()
+
+
+def test_edit_to_a_checkpointed_row_is_caught(app, api, booking):
+    api('post', '/api/tickets', json={
+        **booking, 'customer_charge': 75.0, 'agent_paid': 60.0,
+        'customer_payment_mode': 'cash', 'agent_payment_mode': 'cash',
+    })
+    with app.app_context():
+        # close today so every ledger row so far is behind a checkpoint
+        create_checkpoints('day', now=datetime.now() + timedelta(days=1))
+        checkpoint = LedgerCheckpoint.query.filter_by(mode='cash', period='day')\
+            .order_by(LedgerCheckpoint.last_id.desc()).first()
+        row = db.session.get(CompanyAccountBalance, checkpoint.last_id)
+        assert all(report['ok'] for report in verify_balance_heads())
+
+        row.credited_amount += 7
+        db.session.commit()
+        try:
+            cash = {report['mode']: report for report in verify_balance_heads()}['cash']
+            assert not cash['ok']
+            assert round(cash['ledger_sum'] - cash['head_balance'], 2) == 7
+
+            audit = {report['mode']: report for report in audit_ledger('day', workers=2)}['cash']
+            assert audit['first_divergence']['id'] == row.id
+        finally:
+            row.credited_amount -= 7
+            LedgerCheckpoint.query.delete()
+            db.session.commit()
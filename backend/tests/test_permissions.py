@@ -0,0 +1,78 @@
+# tests/test_permissions.py
+from itertools import count
+
+import pytest
+
+from applications.model import db, Page, Permission, User
+from applications.permissions import bump_permissions_version, effective_permissions
+
+_names = count(1)
+
+
+@pytest.fixture
+def pages(app):
+    """Ids of two seeded pages, with read and write permissions available for both"""
+    with app.app_context():
+        ids = [page.id for page in Page.query.order_by(Page.id).limit(2)]
+        for page_id in ids:
+            for operation in ('read', 'write'):
+                if not Permission.query.filter_by(page_id=page_id, crud_operation=operation).first():
+                    db.session.add(Permission(page_id=page_id, crud_operation=operation))
+        db.session.commit()
+        return ids
+
+
+@pytest.fixture
+def role(api):
+    return api('post', '/api/roles', json={'name': f"role {next(_names)}"}).json['id']
+
+
+def _create_user(api, role):
+    n = next(_names)
+    return api('post', '/api/users', json={
+        'name': f"user{n}", 'full_name': f"User {n}", 'role_id': role, 'password': 'password1',
+    }).json['id']
+
+
+def _permissions(app, user_id):
+    with app.app_context():
+        return sorted(effective_permissions(db.session.get(User, user_id)))
+
+
+def _page_name(app, page_id):
+    with app.app_context():
+        return db.session.get(Page, page_id).name.lower()
+
+
+def test_recreated_user_does_not_inherit_cached_permissions(app, api, role, pages):
+    alice = _create_user(api, role)
+    with app.app_context():
+        # granted the way a script would: unlike the API it leaves session_version alone
+        user = db.session.get(User, alice)
+        user.permissions.append(Permission.query.filter_by(page_id=pages[0], crud_operation='write').one())
+        bump_permissions_version()
+        db.session.commit()
+    assert _permissions(app, alice) == [f"{_page_name(app, pages[0])}.write"]
+
+    api('delete', f'/api/users/{alice}')
+    # SQLite hands the freed id straight to the next user
+    bob = _create_user(api, role)
+    assert _permissions(app, bob) == []
+
+
+def test_role_and_override_edits_are_seen(app, api, role, pages):
+    user = _create_user(api, role)
+    first, second = (_page_name(app, page_id) for page_id in pages)
+    assert _permissions(app, user) == []
+
+    api('put', f'/api/roles/{role}/permissions', json={'permissions': [{'page_id': pages[0], 'crud_operation': 'read'}]})
+    assert _permissions(app, user) == [f"{first}.read"]
+
+    api('put', f'/api/users/{user}/permissions', json={'permissions': [{'page_id': pages[1], 'operation': 'write'}]})
+    assert _permissions(app, user) == sorted([f"{first}.read", f"{second}.write"])
+
+    api('put', f'/api/roles/{role}/permissions', json={'permissions': [{'page_id': pages[0], 'crud_operation': 'write'}]})
+    assert _permissions(app, user) == sorted([f"{first}.write", f"{second}.write"])
+
+    api('delete', f'/api/users/{user}/permissions', json={'page_ids': [pages[1]]})
+    assert _permissions(app, user) == [f"{first}.write"]
@@ -0,0 +1,47 @@
+# tests/test_ticket_api.py
+from conftest import statement_count
+
+# Listing a range runs the same statements whatever it returns: one joined
+# SELECT for the tickets and their names plus the per-request lookups
+MAX_LISTING_STATEMENTS = 5
+DAY = '2001-02-03'
+
+
+def _book(api, make, booking, count):
+    for i in range(count):
+        api('post', '/api/tickets', json={
+            **booking,
+            # a different customer and agent per ticket, so per-row lookups would show
+            'customer_id': make('customer'),
+            'agent_id': make('agent'),
+            'date': DAY,
+            'customer_charge': 100.0 + i,
+            'agent_paid': 80.0,
+            'customer_payment_mode': 'cash',
+            'agent_payment_mode': 'cash',
+        })
+
+
+def _list(api):
+    return api('get', f'/api/tickets?status=all&start_date={DAY}&end_date={DAY}')
+
+
+def test_listing_statement_count_does_not_grow_with_rows(api, make, booking):
+    _book(api, make, booking, 2)
+    _list(api)  # warm the process-wide reference caches
+    few = _list(api)
+
+    _book(api, make, booking, 20)
+    many = _list(api)
+
+    assert len(many.json) == len(few.json) + 20
+    assert statement_count(many) == statement_count(few)
+    assert statement_count(many) <= MAX_LISTING_STATEMENTS
+
+
+def test_listing_serializes_names(api, make, booking):
+    _book(api, make, booking, 1)
+    ticket = _list(api).json[-1]
+    assert ticket['customer_name'].startswith('customer ')
+    assert ticket['agent_name'].startswith('agent ')
+    assert ticket['particular_name'] and ticket['travel_location_name'] and ticket['passenger_name']
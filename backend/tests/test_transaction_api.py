@@ -0,0 +1,77 @@
+# tests/test_transaction_api.py
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import statement_count
+
+# One SELECT for the transactions, one IN query per entity type for the
+# names, plus the per-request lookups; particular names come from the cache
+MAX_LISTING_STATEMENTS = 5
+DAY = '2001-07-08'
+ENTITY_TYPES = ('customer', 'agent', 'partner')
+
+
+def _receive(api, make, count):
+    particular = make('particular')
+    for i in range(count):
+        # a fresh entity per transaction, so per-row name lookups would show
+        entity_type = ENTITY_TYPES[i % len(ENTITY_TYPES)]
+        api('post', '/api/transactions/receipt', json={
+            'entity_type': entity_type,
+            'entity_id': make(entity_type),
+            'pay_type': 'cash_deposit',
+            'mode': 'cash',
+            'amount': 10.0 + i,
+            'particular_id': particular,
+            'transaction_date': DAY,
+        })
+    api('post', '/api/transactions/receipt', json={
+        'entity_type': 'others', 'pay_type': 'other_receipt', 'mode': 'cash',
+        'amount': 5.0, 'particular_id': particular, 'transaction_date': DAY,
+    })
+
+
+def _list(api):
+    return api('get', f'/api/transactions/receipt?start_date={DAY}&end_date={DAY}')
+
+
+def test_listing_statement_count_does_not_grow_with_rows(api, make):
+    _receive(api, make, len(ENTITY_TYPES))
+    _list(api)  # warm the process-wide reference caches
+    few = _list(api)
+
+    _receive(api, make, 30)
+    many = _list(api)
+
+    assert len(many.json['transactions']) == len(few.json['transactions']) + 31
+    assert statement_count(many) == statement_count(few)
+    assert statement_count(many) <= MAX_LISTING_STATEMENTS
+
+
+def test_listing_serializes_names(api, make):
+    _receive(api, make, len(ENTITY_TYPES))
+    transactions = _list(api).json['transactions']
+    for t in transactions[-4:-1]:
+        assert t['entity_name'].startswith(t['entity_type'] + ' ')
+        assert t['particular_name'].startswith('particular ')
+    assert transactions[-1]['entity_type'] == 'others'
+
+
+@pytest.mark.parametrize('raw', ['2001-07-08', '20010708', ' 2001-07-08 '])
+def test_balance_as_of_a_date_means_the_end_of_that_day(api, raw):
+    response = api('get', f'/api/company_balance/cash?as_of={raw}')
+    assert response.json['as_of'] == '2001-07-08T23:59:59.999999'
+
+
+def test_balance_as_of_with_an_offset_is_read_in_local_time(api):
+    response = api('get', '/api/company_balance/cash', query_string={'as_of': '2001-07-08T10:00:00+00:00'})
+    local = datetime(2001, 7, 8, 10, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert response.json['as_of'] == local.isoformat()
+
+    utc = api('get', '/api/company_balance/cash', query_string={'as_of': '2001-07-08T10:00:00Z'})
+    assert utc.json['as_of'] == local.isoformat()
+
+
+def test_balance_as_of_rejects_garbage(api):
+    api('get', '/api/company_balance/cash?as_of=someday', expect=(400,))
@@ -0,0 +1,53 @@
+# tests/test_wallets.py
+import threading
+
+from applications.model import db, Customer
+
+THREADS = 40
+WALLET = 1000.0
+FARE = 50.0
+
+
+def test_concurrent_wallet_bookings_never_overdraw(app, auth_headers, make, booking):
+    """
+    Many threads, each with its own client and app context, book against one
+    customer's wallet at once: exactly as many succeed as the wallet covers.
+    """
+    customer = make('customer', wallet_balance=WALLET, credit_limit=0.0)
+    ticket = {
+        **booking, 'customer_id': customer, 'passenger_id': make('passenger', customer_id=customer),
+        'customer_charge': FARE, 'agent_paid': 40.0,
+        'customer_payment_mode': 'wallet', 'agent_payment_mode': 'cash',
+    }
+    start = threading.Barrier(THREADS)
+    responses = []
+    errors = []
+
+    def book():
+        try:
+            with app.app_context():
+                client = app.test_client()
+                start.wait()
+                response = client.post('/api/tickets', json=ticket, headers=auth_headers)
+                responses.append((response.status_code, response.get_data(as_text=True)))
+        except Exception as exc:  # surfaced by the asserts below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=book) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors
+    assert len(responses) == THREADS
+    booked = [body for status, body in responses if status == 201]
+    refused = [body for status, body in responses if status != 201]
+    assert len(booked) == int(WALLET // FARE)
+    # A booking that loses the race is refused by the debit's funds check
+    assert all('Insufficient' in body for body in refused), refused
+
+    with app.app_context():
+        row = db.session.get(Customer, customer)
+        assert row.wallet_balance == 0
+        assert row.credit_used == 0